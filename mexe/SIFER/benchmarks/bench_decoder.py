@@ -0,0 +1,39 @@
+"""مقارنة مسار eval() القديم مع مفكك utils.telemetry
+
+التشغيل من مجلد SIFER:
+    PYTHONPATH=../shared python -m benchmarks.bench_decoder
+"""
+import json
+import timeit
+from utils import telemetry
+
+SAMPLE = json.dumps({
+    "timestamp": "2025-01-01 12:00:00",
+    "ram": {"total": 15.85, "used": 9.12, "percent": 57.5},
+    "network": [
+        {"local_addr": f"192.168.1.10:{50000 + i}", "remote_addr": f"142.250.74.{i}:443",
+         "status": "ESTABLISHED"}
+        for i in range(5)
+    ],
+})
+
+def old_path(payload):
+    data = eval(payload)
+    return (data["ram"]["total"], data["ram"]["used"], data["ram"]["percent"],
+            json.dumps(data["network"]))
+
+def new_path(payload):
+    sample = telemetry.decode(payload)
+    return (sample.ram_total, sample.ram_used, sample.ram_percent,
+            telemetry.network_json(sample))
+
+def main(number=20000):
+    results = {}
+    for name, func in (("eval", old_path), ("telemetry.decode", new_path)):
+        seconds = min(timeit.repeat(lambda: func(SAMPLE), number=number, repeat=3))
+        results[name] = seconds
+        print(f"{name:18s} {number / seconds:12,.0f} رسالة/ثانية  ({seconds / number * 1e6:.2f} µs)")
+    print(f"التسريع: {results['eval'] / results['telemetry.decode']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""مقارنة محرك القواعد المُجمّع في utils.rules مع المرور الخطي على كل القواعد
+
+التشغيل من مجلد SIFER:
+    PYTHONPATH=../shared python -m benchmarks.bench_rules
+"""
+import time
+import random
+from utils import rules, telemetry
+
+OPS = {">=": lambda a, b: a >= b, ">": lambda a, b: a > b,
+       "<=": lambda a, b: a <= b, "<": lambda a, b: a < b}
+
+def make_rules(count, seed=7):
+    rng = random.Random(seed)
+    specs = []
+    for i in range(count):
+        kind = i % 4
+        spec = {"id": f"r{i}", "severity": rng.choice(list(rules.SEVERITY_RANK))}
+        if kind == 0:
+            spec.update(metric="ram_percent", op=">=", value=rng.uniform(50, 100), window=3)
+        elif kind == 1:
+            spec.update(metric="conn_count", op=">", value=rng.randint(10, 500))
+        elif kind == 2:
+            spec["ports"] = [rng.randint(1, 65535)]
+        else:
+            spec["cidr"] = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.0.0/{rng.choice((16, 24))}"]
+        specs.append(spec)
+    return specs
+
+def make_samples(count, seed=11):
+    rng = random.Random(seed)
+    # العناوين البعيدة تتكرر بين العينات كما في حركة حقيقية
+    remotes = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.1:"
+               f"{rng.choice((443, 80, 22))}" for _ in range(500)]
+    samples = []
+    for i in range(count):
+        network = [telemetry.NetworkConnection(f"192.168.1.10:{50000 + j}", rng.choice(remotes),
+                                               "ESTABLISHED")
+                   for j in range(rng.randint(5, 40))]
+        samples.append(telemetry.TelemetrySample(
+            i * 1000, 16.0, 8.0, rng.uniform(40, 100), network))
+    return samples
+
+class NaiveEngine:
+    """كل قاعدة تُفحص على كل عينة وكل اتصال"""
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.history = {}
+
+    def evaluate(self, device_id, sample):
+        events = []
+        for spec in self.specs:
+            if "metric" in spec:
+                value = rules.METRICS[spec["metric"]](sample)
+                recent = self.history.setdefault((device_id, spec["id"]), [])
+                recent.append(OPS[spec["op"]](value, spec["value"]))
+                del recent[:-spec.get("window", 1)]
+                if all(recent) and len(recent) == spec.get("window", 1):
+                    events.append(spec["id"])
+                continue
+            for conn in sample.network:
+                host, _, port = conn.remote_addr.rpartition(":")
+                if "ports" in spec and int(port) in spec["ports"]:
+                    events.append(spec["id"])
+                elif "cidr" in spec:
+                    prefix = spec["cidr"][0].split(".0.0/")[0] + "."
+                    if host.startswith(prefix):
+                        events.append(spec["id"])
+        return events
+
+def measure(engine, samples):
+    start = time.perf_counter()
+    for sample in samples:
+        engine.evaluate("bench", sample)
+    return len(samples) / (time.perf_counter() - start)
+
+def main(sample_count=2000):
+    samples = make_samples(sample_count)
+    print(f"{'القواعد':>8s} {'خطي':>14s} {'مُجمّع':>14s}  التسريع")
+    for count in (10, 100, 1000, 10000):
+        specs = make_rules(count)
+        naive = measure(NaiveEngine(specs), samples[:max(20, sample_count * 10 // count)])
+        compiled = measure(rules.RuleEngine(specs), samples)
+        print(f"{count:8d} {naive:12,.0f}/ث {compiled:12,.0f}/ث  {compiled / naive:6.1f}x")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
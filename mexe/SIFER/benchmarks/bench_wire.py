@@ -0,0 +1,68 @@
+"""مقارنة حجم وتكلفة تحليل العينة بين JSON والصيغة الثنائية (utils.wire)
+
+التشغيل من مجلد SIFER:
+    PYTHONPATH=../shared python -m benchmarks.bench_wire
+"""
+import json
+import random
+import time
+import timeit
+from utils import telemetry, wire
+
+def make_samples(count=300, connections=5, churn=0.05):
+    """عينات متتالية بنفس شكل ما يرسله العميل كل ثانيتين؛ churn نسبة الاتصالات المتغيرة لكل عينة"""
+    random.seed(1)
+    network = [
+        {"local_addr": f"192.168.1.10:{50000 + i}", "remote_addr": f"142.250.{i // 250}.{i % 250}:443",
+         "status": "ESTABLISHED", "pid": 1000 + i % 40}
+        for i in range(connections)
+    ]
+    start = int(time.time())
+    samples = []
+    used = 9.12
+    port = 52000
+    for i in range(count):
+        used = round(min(15.0, max(2.0, used + random.uniform(-0.05, 0.05))), 2)
+        for _ in range(int(connections * churn) or (i % 20 == 0)):
+            port += 1
+            network[random.randrange(connections)] = dict(
+                network[random.randrange(connections)], local_addr=f"192.168.1.10:{port}")
+        samples.append((start + 2 * i, {"total": 15.85, "used": used,
+                                         "percent": round(used / 15.85 * 100, 1)}, list(network)))
+    return samples
+
+def main():
+    for connections in (5, 200):
+        print(f"--- {connections} اتصال")
+        compare(make_samples(connections=connections))
+
+def compare(samples):
+    json_frames = [json.dumps({"timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+                                            + f".{int(ts * 1000) % 1000:03d}",
+                               "ram": ram, "network": net}).encode()
+                   for ts, ram, net in samples]
+    encoder = wire.WireEncoder()
+    binary_frames = [encoder.encode(ts, ram, net) for ts, ram, net in samples]
+
+    json_size = sum(map(len, json_frames)) / len(json_frames)
+    binary_size = sum(map(len, binary_frames)) / len(binary_frames)
+    print(f"JSON     {json_size:8.1f} بايت/عينة")
+    print(f"ثنائي    {binary_size:8.1f} بايت/عينة  ({json_size / binary_size:.1f}x أصغر)")
+
+    def parse_json():
+        for frame in json_frames:
+            telemetry.decode(frame)
+
+    def parse_binary():
+        decoder = telemetry.new_wire_decoder()
+        for frame in binary_frames:
+            telemetry.decode_frame(frame, decoder)
+
+    json_time = min(timeit.repeat(parse_json, number=20, repeat=3))
+    binary_time = min(timeit.repeat(parse_binary, number=20, repeat=3))
+    per_sample = 20 * len(samples)
+    print(f"تحليل JSON   {json_time / per_sample * 1e6:6.2f} µs/عينة")
+    print(f"تحليل ثنائي  {binary_time / per_sample * 1e6:6.2f} µs/عينة  ({json_time / binary_time:.1f}x أسرع)")
+
+if __name__ == "__main__":
+    main()
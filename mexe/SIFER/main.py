@@ -1,33 +1,31 @@
+import os
 import sys
+import time
 import threading
+import multiprocessing
 import json
-import sqlite3
 import logging
-from datetime import datetime
+# mexe/shared/utils (التشفير وصيغة الإطارات وحالة الشبكة) جزء من حزمة utils نفسها:
+# utils حزمة namespace فتُدمج المجلدات الموجودة في sys.path
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
 from PyQt5.QtWidgets import QApplication
 from ui.terminal import TerminalWindow
 from ui.overlay import HUDOverlay
 from utils.net_monitor import NetworkMonitor
-from utils.emergency import EmergencyHandler
-from utils.encryption import Encryption
-from websocket_server import WebsocketServer
-
-logging.basicConfig(filename="server.log", level=logging.INFO, 
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+from utils.emergency import LivenessTracker, OFFLINE
+from utils.anomaly import AnomalyDetector
+from utils.audio_alerts import AudioAlerts, PRIORITY_CRITICAL, PRIORITY_NORMAL
+from utils.alert_groups import AlertAggregator
+from utils.crypto_session import Keyring
+from utils.ingest_server import IngestServer
+from utils.sessions import SessionCache
+from utils import db_writer, devices, ingest_stages, ingest_workers, rules, telemetry_store
+from utils.logging_setup import setup_logging
+from utils.history import History, HistoryServer
 
 def init_database():
-    conn = sqlite3.connect("database/sifer_data.db")
+    conn = db_writer.connect()
     cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS system_data (
-            id INTEGER PRIMARY KEY,
-            timestamp TEXT,
-            ram_total REAL,
-            ram_used REAL,
-            ram_percent REAL,
-            network_connections TEXT
-        )
-    """)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS network_status (
             id INTEGER PRIMARY KEY,
@@ -54,58 +52,42 @@ def init_database():
         )
     """)
     conn.commit()
+    # جداول القياسات الزمنية وترقية system_data القديم
+    telemetry_store.migrate(conn)
     conn.close()
 
 def load_config():
     with open("config/settings.json", "r") as f:
         return json.load(f)
 
-def start_websocket_server(terminal):
-    def on_message(client, server, message):
-        enc = Encryption()
-        try:
-            logging.info(f"البيانات الخام: {message}")
-            print(f"البيانات الخام: {message}")
-            decrypted = enc.decrypt_data(message)
-            logging.info(f"فك التشفير: {decrypted}")
-            print(f"فك التشفير: {decrypted}")
-            terminal.log_message(f"بيانات من العميل: {decrypted}")
-            
-            # تخزين البيانات في قاعدة البيانات
-            try:
-                data = eval(decrypted)  # تحويل النص إلى قاموس
-                conn = sqlite3.connect("database/sifer_data.db")
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO system_data (timestamp, ram_total, ram_used, ram_percent, network_connections)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    data["ram"]["total"],
-                    data["ram"]["used"],
-                    data["ram"]["percent"],
-                    json.dumps(data["network"])
-                ))
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                error_msg = f"خطأ في تخزين البيانات: {str(e)}"
-                logging.error(error_msg)
-                print(error_msg)
-                terminal.log_message(error_msg)
-            
-            server.send_message(client, enc.encrypt_data("تم الاستلام"))
-        except Exception as e:
-            error_msg = f"خطأ في فك التشفير: {str(e)}"
-            logging.error(error_msg)
-            print(error_msg)
-            terminal.log_message(error_msg)
-
-    server = WebsocketServer(host="0.0.0.0", port=12345)
-    server.set_fn_message_received(on_message)
+def start_websocket_server(terminal, writer, partitions, keyring, config, liveness, alerts,
+                           services=None):
+    # services: يُضاف إليها الخادم أو مجمع العمليات لإيقافه مع التطبيق
+    services = services if services is not None else []
+    store = telemetry_store.TelemetryStore(partitions)
+    registry = devices.DeviceRegistry(writer)
+    detector = AnomalyDetector(**config.get("anomaly", {}))
+    persist = ingest_stages.make_persist(store, alerts.submit, detector)
+    processes = ingest_workers.process_count(config)
     try:
-        logging.info("بدء خادم WebSocket على 0.0.0.0:12345")
-        print("بدء خادم WebSocket على 0.0.0.0:12345")
+        if processes > 1 and ingest_workers.reuse_port_supported():
+            pool = ingest_workers.IngestWorkerPool(config, persist, registry.register,
+                                                   touch=liveness.touch, on_log=terminal.log_message,
+                                                   processes=processes)
+            services.append(pool)
+            pool.run_forever()
+            return
+        if processes > 1:
+            terminal.log_message("SO_REUSEPORT غير مدعوم على هذا النظام، الاستقبال في عملية واحدة")
+        engine = rules.load_engine(config.get("rules_file", rules.RULES_PATH))
+        sessions = SessionCache(ttl=config.get("session_ttl", 600))
+        stages = ingest_stages.make_stages(keyring, persist, terminal.log_message,
+                                           registry.register, engine, sessions,
+                                           config.get("sampling_policies"))
+        server = IngestServer(*stages, on_log=terminal.log_message,
+                              on_alive=lambda conn: liveness.touch(conn.device_id),
+                              **ingest_stages.server_options(config, sessions))
+        services.append(server)
         server.run_forever()
     except Exception as e:
         error_msg = f"خطأ في خادم WebSocket: {str(e)}"
@@ -115,19 +97,87 @@ def start_websocket_server(terminal):
 def main():
     try:
         app = QApplication(sys.argv)
-        init_database()
         config = load_config()
+        log_listener = setup_logging(config)
+        init_database()
+        writer = db_writer.BatchWriter(
+            batch_size=config.get("db_batch_size", 500),
+            flush_interval_ms=config.get("db_flush_interval_ms", 50)
+        ).start()
+        # كتّاب ملفات الأجهزة: كل جهاز يثبت على أحدها فلا تتنافس الأجهزة على قفل واحد
+        partitions = db_writer.ShardedWriter(
+            telemetry_store.open_partition,
+            shards=config.get("db_writer_shards", 4),
+            max_open_files=config.get("db_max_open_files", 256),
+            batch_size=config.get("db_batch_size", 500),
+            flush_interval_ms=config.get("db_flush_interval_ms", 50)
+        ).start()
+        keyring = Keyring.from_config(config)
+        audio = AudioAlerts(backend=config.get("audio_backend", "pyaudio"),
+                            volume=config.get("audio_volume", 1.0),
+                            coalesce_window=config.get("alert_coalesce_seconds", 2.0)).start()
         terminal = TerminalWindow()
         terminal.show()
-        hud = HUDOverlay()
+        net_monitor = NetworkMonitor.shared(interval=config.get("network_check_interval", 5)).start()
+        hud = HUDOverlay(net_monitor)
         hud.show()
-        net_monitor = NetworkMonitor()
-        net_monitor.start()
-        emergency_handler = EmergencyHandler(config["emergency_timeout"])
-        emergency_handler.start()
-        ws_thread = threading.Thread(target=start_websocket_server, args=(terminal,))
+        # أحداث انقطاع كل جهاز تُكتب عبر الكاتب بدل اتصال SQLite لكل حدث
+
+        def deliver_alert(event):
+            # ملخص المجمّع يُكتب صفاً لكل جهاز يغطيه فيبقى سجل إنذارات كل جهاز كاملاً
+            for device_id in event.devices or (event.device_id,):
+                writer.submit(rules.INSERT_ALERT, (event.ts_ms, event.ts_ms, device_id,
+                                                   event.rule_id, event.severity, event.message))
+            terminal.log_message(f"[{event.severity}] {event.device_id}: {event.message}")
+            if rules.SEVERITY_RANK[event.severity] >= rules.SEVERITY_RANK[rules.HIGH]:
+                # لا يحجب المستدعي؛ تكرار نفس القاعدة خلال النافذة يُدمج
+                audio.play_alert(priority=PRIORITY_CRITICAL if event.severity == rules.CRITICAL
+                                 else PRIORITY_NORMAL, key=event.rule_id)
+
+        # الإنذارات من كل الأجهزة تُجمع حسب البصمة قبل الطرفية والصوت وقاعدة البيانات
+        alerts = AlertAggregator(deliver_alert, window=config.get("alert_group_window", 10.0)).start()
+
+        def on_liveness(device_id, state):
+            alerts.submit([rules.RuleEvent(
+                int(time.time() * 1000), device_id, f"device-{state}",
+                rules.HIGH if state == OFFLINE else rules.LOW, f"حالة الجهاز {device_id}: {state}")])
+
+        liveness = LivenessTracker(config["emergency_timeout"], writer=writer, on_event=on_liveness)
+        liveness.watch(devices.load_device_ids())
+        liveness.start()
+        ingest = []
+        ws_thread = threading.Thread(target=start_websocket_server, args=(terminal, writer, partitions, keyring, config, liveness, alerts, ingest))
         ws_thread.daemon = True
         ws_thread.start()
+
+        def stop_ingest():
+            # يفرغ خط المعالجة وقناة العمليات الفرعية إلى الكتّاب
+            for service in ingest:
+                service.stop()
+
+        history_server = HistoryServer(History(), port=config.get("query_port", 8765))
+        try:
+            history_server.start()
+        except OSError as e:
+            # المنفذ مشغول مثلاً: الاستقبال يستمر بدون واجهة الاستعلامات
+            error_msg = f"تعذر تشغيل خادم الاستعلامات: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+
+        def shutdown():
+            # المنتجون أولاً ثم مستهلكوهم: كل خدمة تفرغ ما عندها في خدمة لم تتوقف بعد
+            # (الاستقبال والاتصال ← الإنذارات ← الصوت والكتّاب ← السجل)
+            for stop in (liveness.stop, stop_ingest, alerts.stop, history_server.stop,
+                         net_monitor.stop, audio.stop, partitions.stop, writer.stop,
+                         log_listener.stop):
+                try:
+                    stop()
+                except Exception as e:
+                    error_msg = f"خطأ أثناء الإيقاف: {str(e)}"
+                    logging.error(error_msg)
+                    print(error_msg)
+
+        app.aboutToQuit.connect(shutdown)
         sys.exit(app.exec_())
     except Exception as e:
         error_msg = f"خطأ في التطبيق: {str(e)}"
@@ -136,4 +186,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # لازم لعمليات الاستقبال الفرعية في النسخة المجمعة بـ PyInstaller
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
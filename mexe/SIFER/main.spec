@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['main.py'],
-    pathex=[],
+    pathex=['../shared'],
     binaries=[],
     datas=[('database/sifer_data.db', 'database'), ('assets/sounds/alert.wav', 'assets/sounds')],
     hiddenimports=[],
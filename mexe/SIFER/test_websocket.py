@@ -1,8 +1,13 @@
+import os
+import sys
 import asyncio
 import websockets
 import logging
 from datetime import datetime
-from cryptography.fernet import Fernet
+# mexe/shared/utils (التشفير وصيغة الإطارات وحالة الشبكة) جزء من حزمة utils نفسها:
+# utils حزمة namespace فتُدمج المجلدات الموجودة في sys.path
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from utils.crypto_session import CipherSession, SUBPROTOCOLS
 
 # إعداد السجل
 logging.basicConfig(
@@ -12,20 +17,9 @@ logging.basicConfig(
     encoding="utf-8"
 )
 
-class Encryptor:
-    def __init__(self):
-        self.key = b'uJnmGjIDuQnR_GYZ5uFPGYW5xYAi-JpMO_gwoTqg0EM='
-        self.cipher = Fernet(self.key)
-    
-    def encrypt_data(self, data):
-        return self.cipher.encrypt(data.encode())
-    
-    def decrypt_data(self, encrypted_data):
-        return self.cipher.decrypt(encrypted_data).decode()
-
 async def handle_connection(websocket, path):
     """التعامل مع الاتصال الوارد"""
-    encryptor = Encryptor()
+    encryptor = CipherSession(mode=websocket.subprotocol)
     try:
         logging.info(f"اتصال جديد: {websocket.remote_address}")
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] اتصال جديد من {websocket.remote_address}")
@@ -63,7 +57,8 @@ async def handle_connection(websocket, path):
 async def main():
     """تشغيل الخادم"""
     try:
-        server = await websockets.serve(handle_connection, "localhost", 12345)
+        server = await websockets.serve(handle_connection, "localhost", 12345,
+                                      subprotocols=SUBPROTOCOLS)
         logging.info("الخادم يعمل على ws://localhost:12345")
         print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] الخادم يعمل على ws://localhost:12345")
         await server.wait_closed()
@@ -0,0 +1,59 @@
+import time
+import socket
+import pytest
+from websocket import create_connection
+from utils import wire
+from utils.crypto_session import CipherSession, Keyring, SUBPROTOCOLS
+
+DEVICE_ID = "vm-test-0001"
+
+class Device:
+    """عميل بسيط يرسل دفعات ثنائية مرقمة ويستقبل تأكيداتها"""
+
+    def __init__(self, port, device_id=DEVICE_ID):
+        self.ws = create_connection(
+            f"ws://127.0.0.1:{port}", subprotocols=list(SUBPROTOCOLS), timeout=10,
+            header=[f"{wire.WIRE_HEADER}: {wire.WIRE_VERSION}", f"{wire.DEVICE_HEADER}: {device_id}"])
+        self.cipher = CipherSession(Keyring(), self.ws.getsubprotocol())
+        self.encoder = wire.WireEncoder()
+        self.next_seq = 1
+        self.ts = 1760000000.0
+
+    def send_batch(self, count, connections=3):
+        """دفعة من count عينة؛ ترجع التسلسل المؤكد"""
+        network = [{"local_addr": f"10.0.0.2:{50000 + i}", "remote_addr": "10.0.0.1:443",
+                    "status": "ESTABLISHED"} for i in range(connections)]
+        frames = []
+        for _ in range(count):
+            self.ts += 0.5
+            frames.append(self.encoder.encode(
+                self.ts, {"total": 16.0, "used": 8.0, "percent": 50.0}, network))
+        self.ws.send_binary(self.cipher.encrypt_bytes(wire.encode_batch(self.next_seq, frames)))
+        self.next_seq += count
+        return wire.decode_ack(self.cipher.decrypt_bytes(self.ws.recv()))
+
+    def close(self):
+        self.ws.close()
+
+@pytest.fixture
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def wait_listening():
+    def wait(port, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), 0.2).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"الخادم لا يستمع على {port}")
+    return wait
+
+@pytest.fixture
+def device():
+    return Device
\ No newline at end of file
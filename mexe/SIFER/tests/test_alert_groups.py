@@ -0,0 +1,50 @@
+from utils.alert_groups import AlertAggregator, FLEET
+from utils.rules import RuleEvent, HIGH, LOW
+
+def event(device_id, rule_id="device-offline", severity=HIGH):
+    return RuleEvent(1760000000000, device_id, rule_id, severity, f"{device_id}: {rule_id}")
+
+def test_first_passes_then_fleet_summary_keeps_devices():
+    out = []
+    alerts = AlertAggregator(out.append, window=60)
+    alerts.submit([event(f"vm-{i:02}") for i in range(5)])
+    assert [e.device_id for e in out] == ["vm-00"]
+    alerts.submit([event("vm-01")])
+    alerts.flush(force=True)
+    summary = out[-1]
+    assert summary.device_id == FLEET
+    assert summary.message.startswith("5 جهاز")
+    # كل جهاز مكبوت يبقى في الملخص مرة واحدة
+    assert summary.devices == ("vm-01", "vm-02", "vm-03", "vm-04")
+    assert alerts.suppressed == 5
+    # الملخص التالي يحمل ما كُبت بعده فقط
+    alerts.submit([event("vm-03")])
+    alerts.flush(force=True)
+    assert out[-1].devices == ("vm-03",)
+
+def test_fingerprints_are_independent():
+    out = []
+    alerts = AlertAggregator(out.append, window=60)
+    alerts.submit([event("vm-01"), event("vm-01", severity=LOW), event("vm-01", rule_id="cpu")])
+    assert len(out) == 3
+    alerts.submit([event("vm-01")])
+    alerts.flush(force=True)
+    assert out[-1].device_id == "vm-01"
+    assert out[-1].devices == ("vm-01",)
+    assert "تكرر 1 مرة" in out[-1].message
+
+def test_lru_eviction_flushes_pending_summary():
+    out = []
+    alerts = AlertAggregator(out.append, window=60, max_groups=2)
+    alerts.submit([event("vm-01", rule_id="a"), event("vm-02", rule_id="a")])
+    alerts.submit([event("vm-01", rule_id="b"), event("vm-01", rule_id="c")])
+    assert alerts.evicted == 1
+    summaries = [e for e in out if e.devices]
+    assert [(e.rule_id, e.devices) for e in summaries] == [("a", ("vm-02",))]
+
+def test_stop_flushes_pending():
+    out = []
+    alerts = AlertAggregator(out.append, window=60, tick=0.05).start()
+    alerts.submit([event("vm-01"), event("vm-02")])
+    alerts.stop()
+    assert out[-1].devices == ("vm-02",)
@@ -0,0 +1,48 @@
+import random
+import numpy as np
+from utils.anomaly import AnomalyDetector
+
+def row(device_id, ts_ms, percent, conns=10):
+    return (device_id, ts_ms, 16.0, 8.0, percent, conns, "[]")
+
+def noisy_rows(device_id, count, rng, start=0):
+    return [row(device_id, (start + i) * 1000, 50 + rng.uniform(-1, 1), 10 + rng.randrange(3))
+            for i in range(count)]
+
+def test_spike_fires_once_after_warmup():
+    rng = random.Random(1)
+    detector = AnomalyDetector(warmup=30)
+    # قبل اكتمال الإحماء لا إنذار حتى لقفزة كبيرة
+    assert detector.observe(noisy_rows("vm-01", 5, rng) + [row("vm-01", 5000, 99)]) == []
+    assert detector.observe(noisy_rows("vm-01", 100, rng, start=6)) == []
+    events = detector.observe([row("vm-01", 200000, 95), row("vm-01", 201000, 96)])
+    assert [(e.device_id, e.rule_id, e.severity) for e in events] == [("vm-01", "anomaly-ram_percent", "high")]
+    assert detector.observe(noisy_rows("vm-01", 20, rng, start=202)) == []
+    mean, sigma = detector.snapshot("vm-01")["ram_percent"]
+    assert 45 < mean < 60 and sigma > 0
+
+def test_batch_update_matches_one_row_at_a_time():
+    rng = random.Random(2)
+    rows = []
+    for i in range(300):
+        device_id = f"vm-{rng.randrange(5)}"
+        rows.append(row(device_id, i * 1000, 50 + rng.gauss(0, 2) + (40 if i % 97 == 96 else 0),
+                        rng.randrange(5, 15)))
+    batched, single = AnomalyDetector(capacity=2), AnomalyDetector(capacity=2)
+    batched_events = []
+    for start in range(0, len(rows), 50):
+        batched_events += batched.observe(rows[start:start + 50])
+    single_events = [event for r in rows for event in single.observe([r])]
+    key = lambda e: (e.ts_ms, e.device_id, e.rule_id)
+    assert sorted(map(key, batched_events)) == sorted(map(key, single_events))
+    assert batched_events
+    # السعة تضاعفت من 2 لتسع الأجهزة الخمسة
+    assert len(batched.count) >= 5
+    for device_id in batched.index:
+        slot, other = batched.index[device_id], single.index[device_id]
+        assert np.allclose(batched.mean[slot], single.mean[other])
+        assert np.allclose(batched.var[slot], single.var[other])
+
+def test_unknown_device_snapshot_is_empty():
+    assert AnomalyDetector().snapshot("vm-01") == {}
+    assert AnomalyDetector().observe([]) == []
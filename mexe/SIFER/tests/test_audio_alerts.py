@@ -0,0 +1,89 @@
+import time
+import wave
+import threading
+import pytest
+from utils.audio_alerts import AudioAlerts, NullBackend, PRIORITY_CRITICAL, PRIORITY_NORMAL
+
+class BlockingBackend(NullBackend):
+    """يبقى عالقاً في أول تشغيل حتى يُسمح له"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def play(self, sound):
+        self.started.set()
+        self.release.wait(10)
+        super().play(sound)
+
+@pytest.fixture
+def make_alerts(tmp_path):
+    sounds = {}
+    for name in ("alert", "critical", "first"):
+        path = sounds[name] = str(tmp_path / f"{name}.wav")
+        with wave.open(path, "wb") as wf:
+            wf.setsampwidth(2)
+            wf.setnchannels(1)
+            wf.setframerate(8000)
+            wf.writeframes(b"\0\0" * 80)
+
+    def make(backend, queue_size=32, coalesce_window=0.0):
+        return AudioAlerts(sounds=sounds, backend=backend, coalesce_window=coalesce_window,
+                           queue_size=queue_size, volume=0.5).start()
+    return make
+
+def test_critical_plays_before_queued_normal(make_alerts):
+    backend = BlockingBackend()
+    alerts = make_alerts(backend)
+    alerts.play_alert("first")
+    backend.started.wait(5)
+    alerts.play_alert("alert")
+    alerts.play_alert("critical", priority=PRIORITY_CRITICAL)
+    backend.release.set()
+    alerts.stop()
+    assert backend.played == ["first", "critical", "alert"]
+
+def test_coalesces_repeated_key(make_alerts):
+    backend = NullBackend()
+    alerts = make_alerts(backend, coalesce_window=60)
+    assert alerts.play_alert(key="rule-1")
+    assert not alerts.play_alert(key="rule-1")
+    assert alerts.play_alert(key="rule-2")
+    alerts.stop()
+    assert backend.played == ["alert", "alert"]
+    assert alerts.coalesced == 1
+
+def test_critical_evicts_normal_when_full(make_alerts):
+    backend = BlockingBackend()
+    alerts = make_alerts(backend, queue_size=2)
+    alerts.play_alert("first")
+    backend.started.wait(5)
+    assert alerts.play_alert("alert", key=1)
+    assert alerts.play_alert("alert", key=2)
+    # الطابور ممتلئ: العادي يُسقط والحرج يزيح عادياً
+    assert not alerts.play_alert("alert", key=3)
+    assert alerts.play_alert("critical", priority=PRIORITY_CRITICAL, key=4)
+    assert alerts.play_alert("critical", priority=PRIORITY_CRITICAL, key=5)
+    # لا يبقى ما يُزاح: حرج أمام حرج
+    assert not alerts.play_alert("critical", priority=PRIORITY_CRITICAL, key=6)
+    assert alerts.dropped == 4
+    backend.release.set()
+    alerts.stop()
+    assert backend.played == ["first", "critical", "critical"]
+
+def test_stop_does_not_hang_on_full_queue(make_alerts):
+    backend = BlockingBackend()
+    alerts = make_alerts(backend, queue_size=2)
+    alerts.play_alert("first")
+    backend.started.wait(5)
+    alerts.play_alert("alert", key=1, priority=PRIORITY_NORMAL)
+    alerts.play_alert("alert", key=2, priority=PRIORITY_NORMAL)
+    started = time.monotonic()
+    alerts.stop(timeout=0.3)
+    assert time.monotonic() - started < 2
+    # بعد تحرر المشغل يفرغ الطابور ويتوقف الخيط
+    backend.release.set()
+    alerts.thread.join(5)
+    assert not alerts.thread.is_alive()
+    assert backend.played == ["first", "alert", "alert"]
\ No newline at end of file
@@ -0,0 +1,61 @@
+import time
+import sqlite3
+from utils.db_writer import BatchWriter, PartitionWriter
+
+INSERT = "INSERT INTO t (id, x) VALUES (?, ?)"
+
+def make_db(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY, x NOT NULL)")
+    return path
+
+def stored(path):
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM t ORDER BY id")]
+
+def test_writes_batches_in_order(tmp_path):
+    path = make_db(str(tmp_path / "main.db"))
+    writer = BatchWriter(path, batch_size=50, flush_interval_ms=5).start()
+    for i in range(1000):
+        writer.submit(INSERT, (i, i))
+    writer.stop()
+    assert stored(path) == list(range(1000))
+    stats = writer.stats()
+    assert stats["rows_written"] == 1000
+    assert stats["dropped"] == 0
+
+def test_failed_batch_drops_only_bad_rows(tmp_path):
+    path = make_db(str(tmp_path / "main.db"))
+    writer = BatchWriter(path, batch_size=100, flush_interval_ms=200)
+    # تكرار المفتاح و NOT NULL يفشلان executemany للدفعة كلها
+    for i in range(10):
+        writer.submit(INSERT, (i, i))
+    writer.submit(INSERT, (3, 3))
+    writer.submit(INSERT, (10, None))
+    writer.submit(INSERT, (11, 11))
+    writer.start()
+    writer.stop()
+    assert stored(path) == list(range(10)) + [11]
+    stats = writer.stats()
+    assert stats["rows_written"] == 11
+    assert stats["dropped"] == 2
+    assert stats["errors"] == 1
+
+def test_partition_writer_retries_per_file(tmp_path):
+    paths = [make_db(str(tmp_path / f"d{i}.db")) for i in range(2)]
+    writer = PartitionWriter(lambda path: sqlite3.connect(path, check_same_thread=False),
+                             flush_interval_ms=200)
+    writer.submit(paths[0], INSERT, (1, 1))
+    writer.submit(paths[0], INSERT, (1, 1))
+    writer.submit(paths[1], INSERT, (1, 1))
+    writer.start()
+    writer.stop()
+    assert [stored(path) for path in paths] == [[1], [1]]
+    assert writer.stats()["dropped"] == 1
+
+def test_stop_does_not_block_on_full_queue(tmp_path):
+    writer = BatchWriter(make_db(str(tmp_path / "main.db")), max_queue=1)
+    writer.submit(INSERT, (1, 1))
+    started = time.monotonic()
+    writer.stop(timeout=0.2)
+    assert time.monotonic() - started < 1
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+import pytest
+from utils import devices, history, telemetry_store
+from utils.history import History, QueryError
+
+START_MS = 1760000000000
+
+class SyncWriter:
+    """كاتب متزامن: ينفذ كل (path, sql, params) فوراً في ملف الجهاز"""
+
+    def __init__(self):
+        self.conns = {}
+
+    def submit(self, path, sql, params):
+        conn = self.conns.get(path)
+        if conn is None:
+            conn = self.conns[path] = telemetry_store.open_partition(path)
+        with conn:
+            conn.execute(sql, params)
+
+    def close(self):
+        for conn in self.conns.values():
+            conn.close()
+
+def row(device_id, ts_ms, percent=50.0):
+    return (device_id, ts_ms, 16.0, 8.0, percent, 0, "[]")
+
+@pytest.fixture
+def store(tmp_path):
+    db_path = str(tmp_path / "sifer_data.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(devices.SCHEMA)
+        for device_id in ("vm-01", "vm-02"):
+            conn.execute(devices.UPSERT_DEVICE, (device_id, START_MS, START_MS, "10.0.0.1"))
+    writer = SyncWriter()
+    yield db_path, telemetry_store.TelemetryStore(writer, root=telemetry_store.partition_root(db_path))
+    writer.close()
+
+def test_keyset_pages_cover_equal_timestamps(store):
+    db_path, telemetry = store
+    # ثلاث عينات لكل مللي ثانية: حد الصفحة يقع داخل مجموعة بنفس الوقت
+    telemetry.write([row("vm-01", START_MS + i // 3, i) for i in range(30)])
+    reader = History(db_path)
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = reader.samples("vm-01", START_MS, START_MS + 1000, limit=4, cursor=cursor)
+        seen += [r["ram_percent"] for r in page["rows"]]
+        pages += 1
+        cursor = page["next"]
+        if cursor is None:
+            break
+    assert seen == list(range(30))
+    assert pages == 8
+    assert [r["ram_percent"] for r in reader.iter_samples("vm-01", START_MS, START_MS + 1000, page=7)] == list(range(30))
+    with pytest.raises(QueryError):
+        reader.samples("vm-01", START_MS, START_MS + 1000, cursor="abc")
+    assert reader.samples("vm-02", START_MS, START_MS + 1000) == {"rows": [], "next": None}
+    reader.close()
+
+def test_devices_summary_follows_new_samples(store):
+    db_path, telemetry = store
+    telemetry.write([row("vm-01", START_MS + i * 1000) for i in range(5)])
+    reader = History(db_path)
+    summary = {entry["device_id"]: entry for entry in reader.devices()}
+    assert (summary["vm-01"]["samples"], summary["vm-01"]["first_ms"], summary["vm-01"]["last_ms"]) == \
+        (5, START_MS, START_MS + 4000)
+    assert (summary["vm-02"]["samples"], summary["vm-02"]["last_ms"]) == (0, None)
+    telemetry.write([row("vm-01", START_MS + 10000)])
+    summary = {entry["device_id"]: entry for entry in reader.devices()}
+    assert (summary["vm-01"]["samples"], summary["vm-01"]["last_ms"]) == (6, START_MS + 10000)
+    reader.close()
+
+def test_connections_are_reused_across_threads(store, monkeypatch):
+    db_path, telemetry = store
+    telemetry.write([row("vm-01", START_MS + i) for i in range(10)])
+    opened = []
+    connect = sqlite3.connect
+
+    def counting_connect(*args, **kwargs):
+        opened.append(args[0])
+        return connect(*args, **kwargs)
+
+    monkeypatch.setattr(history.sqlite3, "connect", counting_connect)
+    reader = History(db_path, max_idle=2)
+    # خيط جديد لكل طلب كما في ThreadingHTTPServer
+    for _ in range(20):
+        thread = threading.Thread(target=lambda: (reader.devices(), reader.samples("vm-01", START_MS, START_MS + 100)))
+        thread.start()
+        thread.join()
+    assert len(opened) == 2
+    assert reader._idle_count == 2
+    reader.close()
+    assert reader._idle_count == 0
+
+def test_server_start_on_busy_port_raises_oserror(store):
+    db_path, _ = store
+    first = history.HistoryServer(History(db_path), port=0).start()
+    second = history.HistoryServer(History(db_path), port=first.httpd.server_address[1])
+    with pytest.raises(OSError):
+        second.start()
+    # الإيقاف بعد فشل التشغيل لا يرمي
+    second.stop()
+    first.stop()
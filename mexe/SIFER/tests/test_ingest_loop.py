@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import sqlite3
+import subprocess
+import pytest
+from utils import db_writer, ingest_stages, telemetry_store
+from utils.crypto_session import Keyring
+from utils.ingest_server import IngestServer
+from utils.sessions import SessionCache
+
+CLIENT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "SIFERWindowsClient")
+
+# عميل حقيقي في عملية منفصلة: للمشروعين حزمة utils بنفس الاسم
+CLIENT_SCRIPT = """
+import sys, time
+from main import WebSocketClient
+client = WebSocketClient(sys.argv[1], sample_interval=0.3, spool_dir=sys.argv[2])
+client.start()
+time.sleep(float(sys.argv[3]))
+client.stop()
+print("ACKED", client.spool.stats()["acked"], flush=True)
+"""
+
+@pytest.fixture
+def hub(tmp_path, free_port, wait_listening):
+    writer = db_writer.ShardedWriter(telemetry_store.open_partition, shards=1,
+                                     flush_interval_ms=10).start()
+    store = telemetry_store.TelemetryStore(writer, root=str(tmp_path / "devices"))
+    alerts = []
+    persist = ingest_stages.make_persist(store, alerts.extend)
+    sessions = SessionCache()
+    stages = ingest_stages.make_stages(Keyring(), persist, lambda message: None,
+                                       lambda device_id, address: None, sessions=sessions)
+    port = free_port
+    options = dict(ingest_stages.server_options({}, sessions), host="127.0.0.1", port=port,
+                   ping_interval=1, metrics_interval=3600)
+    server = IngestServer(*stages, **options)
+    server.start()
+    wait_listening(port)
+    yield port, store
+    server.stop()
+    writer.stop()
+
+def stored_rows(root):
+    total = 0
+    for name in os.listdir(root):
+        if name.endswith(".db"):
+            with sqlite3.connect(os.path.join(root, name)) as conn:
+                total += conn.execute("SELECT count(*) FROM telemetry").fetchone()[0]
+    return total
+
+def test_client_hub_loop_with_pings(hub, tmp_path):
+    port, store = hub
+    # عدة فترات ping: التأكيدات يجب أن تستمر رغم إطارات التحكم بينها
+    result = subprocess.run(
+        [sys.executable, "-c", CLIENT_SCRIPT, f"ws://127.0.0.1:{port}",
+         str(tmp_path / "spool"), "4"],
+        cwd=CLIENT_DIR, capture_output=True, text=True, timeout=60,
+        env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert result.returncode == 0, result.stderr[-2000:]
+    acked = int(result.stdout.rsplit("ACKED", 1)[1].split()[0])
+    assert acked >= 8
+    # كل ما أُكد وصل إلى ملف الجهاز
+    deadline = time.monotonic() + 5
+    while stored_rows(store.root) < acked and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert stored_rows(store.root) >= acked
\ No newline at end of file
@@ -0,0 +1,47 @@
+import json
+from types import SimpleNamespace
+from utils import ingest_stages, telemetry, wire
+from utils.crypto_session import CipherSession, Keyring
+
+RAM = {"total": 16.0, "used": 8.0, "percent": 50.0}
+
+def connection(port):
+    return {"local_addr": f"10.0.0.2:{port}", "remote_addr": "10.0.0.1:443", "status": "ESTABLISHED"}
+
+def make_decode(logs):
+    _, _, decode, _ = ingest_stages.make_stages(Keyring(), lambda events: None, logs.append,
+                                                lambda *args: None)
+    return decode
+
+def make_conn():
+    return SimpleNamespace(device_id="vm-test-0001", remote_address=("127.0.0.1", 5000),
+                           decoder=telemetry.new_wire_decoder(), cipher=CipherSession(Keyring()),
+                           session=None, network=None, network_json=None)
+
+def test_every_row_keeps_full_network_json():
+    logs = []
+    decode = make_decode(logs)
+    conn = make_conn()
+    encoder = wire.WireEncoder()
+    first = [connection(50000), connection(50001)]
+    second = first[1:] + [connection(50002)]
+    networks = [first, first, first, second, second]
+    batch = wire.encode_batch(1, [encoder.encode(1760000000 + i, RAM, network)
+                                  for i, network in enumerate(networks)])
+    events, reply = decode(conn, batch)
+    rows = [row for _, row in events]
+    assert [json.loads(row[6]) for row in rows] == networks
+    # بلا تغيير: نفس النص دون إعادة ترميز
+    assert rows[0][6] is rows[1][6] is rows[2][6]
+    assert rows[3][6] is not rows[2][6]
+    assert wire.decode_ack(conn.cipher.decrypt_bytes(reply)) == 5
+
+def test_terminal_log_is_short():
+    logs = []
+    decode = make_decode(logs)
+    conn = make_conn()
+    network = [connection(50000 + i) for i in range(200)]
+    decode(conn, wire.encode_batch(1, [wire.WireEncoder().encode(1760000000, RAM, network)]))
+    assert len(logs) == 1
+    assert "(1 عينة)" in logs[0] and "اتصالات 200" in logs[0]
+    assert "10.0.0.1" not in logs[0]
\ No newline at end of file
@@ -0,0 +1,38 @@
+import time
+import threading
+import pytest
+from utils import ingest_workers, rules
+
+pytestmark = pytest.mark.skipif(not ingest_workers.reuse_port_supported(),
+                                reason="SO_REUSEPORT غير مدعوم")
+
+def test_stop_drains_acked_rows_under_load(free_port, wait_listening, device):
+    stored = []
+
+    def slow_persist(events):
+        # كاتب بطيء: القناة الصغيرة تمتلئ وتحجب العمليات داخل put
+        time.sleep(0.05)
+        stored.extend(event for event in events if type(event) is not rules.RuleEvent)
+
+    pool = ingest_workers.IngestWorkerPool(
+        {"ingest_port": free_port, "ingest_workers": 1}, slow_persist, lambda *args: None,
+        processes=2, channel_size=2, check_interval=0.2)
+    thread = threading.Thread(target=pool.run_forever, daemon=True)
+    thread.start()
+    wait_listening(free_port, timeout=30)
+
+    client = device(free_port)
+    acked = 0
+    for _ in range(40):
+        acked = client.send_batch(10)
+    client.close()
+    assert acked == 400
+    # كثير من الصفوف المؤكدة لا يزال في القنوات والعمليات لحظة الإيقاف
+    assert len(stored) < acked
+
+    started = time.monotonic()
+    pool.stop()
+    assert time.monotonic() - started < 20
+    assert not any(worker.is_alive() for worker in pool.workers)
+    assert len(stored) == acked
+    assert pool.rows_received == pool.rows_sent.value
\ No newline at end of file
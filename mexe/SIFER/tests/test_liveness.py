@@ -0,0 +1,76 @@
+import random
+from utils.timing_wheel import TimingWheel
+from utils.emergency import LivenessTracker, OFFLINE, ONLINE
+
+def test_wheel_matches_reference_across_cascades():
+    rng = random.Random(7)
+    # عجلة صغيرة ليصل الاختبار إلى كل المستويات
+    wheel = TimingWheel(bits=2, levels=3)
+    expected = {}
+    for tick in range(400):
+        for _ in range(3):
+            key = rng.randrange(40)
+            if rng.random() < 0.2:
+                wheel.cancel(key)
+                expected.pop(key, None)
+            else:
+                deadline = wheel.now + rng.randrange(1, 60)
+                wheel.schedule(key, deadline)
+                expected[key] = deadline
+        fired = wheel.advance()
+        due = {key for key, deadline in expected.items() if deadline == wheel.now}
+        assert fired == due
+        for key in due:
+            del expected[key]
+        assert len(wheel) == len(expected)
+
+def test_wheel_clamps_beyond_horizon():
+    wheel = TimingWheel(bits=2, levels=2)
+    wheel.schedule("far", 1000)
+    assert wheel.entries["far"][0] == wheel.horizon
+    fired = set()
+    for _ in range(wheel.horizon):
+        fired |= wheel.advance()
+    assert fired == {"far"}
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+def make_tracker(timeout=5):
+    events = []
+    tracker = LivenessTracker(timeout, on_event=lambda device_id, state: events.append((device_id, state)))
+    tracker._now = clock = Clock()
+    return tracker, clock, events
+
+def advance(tracker, clock, ticks):
+    clock.now += ticks
+    for device_id in tracker._advance():
+        tracker._emit(device_id, OFFLINE)
+
+def test_offline_after_timeout_and_back_online():
+    tracker, clock, events = make_tracker()
+    tracker.watch(["vm-01", "vm-02"])
+    for _ in range(4):
+        advance(tracker, clock, 2)
+        # vm-01 يرسل باستمرار فلا يُعاد جدولته إلا عند انتهاء مؤقته
+        tracker.touch("vm-01")
+    assert events == [("vm-02", OFFLINE)]
+    tracker.touch("vm-02")
+    assert events[-1] == ("vm-02", ONLINE)
+    advance(tracker, clock, 3)
+    tracker.touch("vm-01")
+    advance(tracker, clock, 2)
+    assert events[-1] == ("vm-02", OFFLINE)
+    assert tracker.snapshot() == {"tracked": 2, "offline": 1, "scheduled": 1}
+
+def test_new_device_is_scheduled_on_first_touch():
+    tracker, clock, events = make_tracker(timeout=3)
+    tracker.touch("vm-09")
+    advance(tracker, clock, 2)
+    assert events == []
+    advance(tracker, clock, 1)
+    assert events == [("vm-09", OFFLINE)]
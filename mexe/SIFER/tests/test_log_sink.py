@@ -0,0 +1,58 @@
+import os
+import threading
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication, QPlainTextEdit
+from ui.log_sink import LogSink
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+def lines(widget):
+    text = widget.toPlainText()
+    return text.split("\n") if text else []
+
+def test_pushes_from_threads_arrive_in_one_flush(app):
+    widget = QPlainTextEdit()
+    sink = LogSink(widget, flush_interval_ms=60000, rate_limit=1000)
+    threads = [threading.Thread(target=lambda n=n: [sink.push(f"worker {n} line") for _ in range(50)])
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.flush()
+    assert len(lines(widget)) == 200
+    assert widget.document().blockCount() == 200
+
+def test_similar_messages_are_rate_limited(app):
+    widget = QPlainTextEdit()
+    sink = LogSink(widget, flush_interval_ms=60000, rate_limit=3, rate_window=0)
+    for port in range(10):
+        sink.push(f"اتصال من 10.0.0.1:{port}")
+    sink.push("رسالة أخرى")
+    sink.flush()
+    shown = lines(widget)
+    assert len(shown) == 5
+    assert shown[3].endswith("رسالة أخرى")
+    assert "تم حجب 7 رسالة مماثلة" in shown[4]
+
+def test_overflow_and_caps(app):
+    widget = QPlainTextEdit()
+    sink = LogSink(widget, capacity=10, flush_interval_ms=60000, line_cap=50,
+                   max_per_flush=4, rate_limit=1000)
+    for i in range(15):
+        sink.push(f"line {chr(97 + i)}")
+    sink.flush()
+    shown = lines(widget)
+    # أقدم خمسة أُزيحت، والدفعة محدودة بأربعة أسطر ثم سطر الفقد
+    assert [line.split("] ")[1] for line in shown[:4]] == ["line f", "line g", "line h", "line i"]
+    assert "فُقدت 5 رسالة" in shown[4]
+    assert len(sink.buffer) == 6
+    for _ in range(20):
+        for i in range(10):
+            sink.push(f"more {chr(97 + i)}")
+        sink.flush()
+    assert widget.document().blockCount() <= 50
@@ -0,0 +1,58 @@
+import json
+import queue
+import logging
+import pytest
+from utils import logging_setup
+from utils.logging_setup import DroppingQueueHandler, sampled_logger, setup_logging
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    rates = {name: logger.rate for name, logger in logging_setup._sampled_loggers.items()}
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    # الكائنات نفسها محفوظة في وحدات أخرى فيُعاد معدلها فقط
+    for name, logger in logging_setup._sampled_loggers.items():
+        logger.rate = rates.get(name, 1)
+
+def read_entries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_sampled_json_lines(tmp_path, root_logger):
+    path = str(tmp_path / "server.log")
+    listener = setup_logging({"logging": {"file": path, "sampling": {"test.sampled": 10}}})
+    sampled = sampled_logger("test.sampled")
+    for i in range(95):
+        sampled.info("عينة", seq=i)
+    logging.getLogger("test.plain").warning("تحذير %s", "واحد")
+    listener.stop()
+    entries = read_entries(path)
+    assert [entry["seq"] for entry in entries if entry["logger"] == "test.sampled"] == list(range(0, 95, 10))
+    assert entries[-1]["level"] == "WARNING" and entries[-1]["msg"] == "تحذير واحد"
+    # نفس الكائن لنفس الاسم فالمعدل المضبوط يصل للمستدعين المستوردين مسبقاً
+    assert sampled_logger("test.sampled") is sampled and sampled.rate == 10
+
+def test_sampled_logger_skips_disabled_level(root_logger):
+    sampled = sampled_logger("test.quiet")
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    root_logger.addHandler(handler)
+    root_logger.setLevel(logging.WARNING)
+    sampled.info("لا يظهر")
+    assert records == []
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    logger = logging.Logger("test.dropping")
+    logger.addHandler(handler)
+    for i in range(5):
+        logger.warning("رسالة %d", i)
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
@@ -0,0 +1,73 @@
+import json
+import time
+import sqlite3
+from utils import telemetry_store
+from utils.telemetry_store import MINUTE_MS, HOUR_MS
+
+LEGACY_SCHEMA = """
+    CREATE TABLE system_data (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT,
+        ram_total REAL,
+        ram_used REAL,
+        ram_percent REAL,
+        network_connections TEXT
+    )
+"""
+
+# ثلاث عينات في الدقيقة الأولى وواحدة بعد ساعة، بالتوقيت المحلي كما كتبها الخادم القديم
+LEGACY_ROWS = [
+    ("2025-10-09 10:00:05", 40.0, json.dumps([{"remote_addr": "10.0.0.1:443"}])),
+    ("2025-10-09 10:00:20", 60.0, "[]"),
+    ("2025-10-09 10:00:50", 50.0, "not json"),
+    ("2025-10-09 11:30:00", 70.0, "[]"),
+    (None, 10.0, "[]"),
+]
+
+def epoch_ms(text):
+    return int(time.mktime(time.strptime(text, "%Y-%m-%d %H:%M:%S"))) * 1000
+
+def legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany("""
+        INSERT INTO system_data (timestamp, ram_total, ram_used, ram_percent, network_connections)
+        VALUES (?, 16.0, 8.0, ?, ?)
+    """, LEGACY_ROWS)
+    conn.commit()
+    return conn
+
+def test_v1_moves_system_data_to_telemetry_with_rollups(tmp_path):
+    conn = legacy_db(str(tmp_path / "sifer_data.db"))
+    with conn:
+        telemetry_store.MIGRATIONS[1](conn)
+    rows = conn.execute("""
+        SELECT device_id, ts_ms, ram_percent, conn_count FROM telemetry ORDER BY ts_ms
+    """).fetchall()
+    # الصف بلا وقت يُترك، والشبكة غير الصالحة تُعد صفراً
+    assert rows == [("legacy", epoch_ms(text), percent, count)
+                    for (text, percent, _), count in zip(LEGACY_ROWS[:4], (1, 0, 0, 0))]
+    minute = conn.execute("""
+        SELECT bucket_ms, samples, ram_percent_min, ram_percent_max, ram_percent_sum
+        FROM telemetry_1m ORDER BY bucket_ms
+    """).fetchall()
+    first_ms = epoch_ms(LEGACY_ROWS[0][0])
+    assert minute[0] == (first_ms - first_ms % MINUTE_MS, 3, 40.0, 60.0, 150.0)
+    assert len(minute) == 2
+    hours = conn.execute("SELECT sum(samples) FROM telemetry_1h").fetchone()[0]
+    assert hours == 4
+    assert all(bucket % HOUR_MS == 0 for bucket, in conn.execute("SELECT bucket_ms FROM telemetry_1h"))
+    tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "system_data" not in tables and "system_data_v0" in tables
+    conn.close()
+
+def test_rollup_upsert_merges_with_stored_bucket(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "part.db"))
+    for statement in telemetry_store.SCHEMA:
+        conn.execute(statement)
+    sql, period = telemetry_store.UPSERT_ROLLUPS[0]
+    conn.execute(sql, ("vm-01", 0, 2, 30.0, 50.0, 80.0))
+    conn.execute(sql, ("vm-01", 0, 1, 20.0, 20.0, 20.0))
+    assert conn.execute("SELECT samples, ram_percent_min, ram_percent_max, ram_percent_sum FROM telemetry_1m") \
+        .fetchall() == [(3, 20.0, 50.0, 100.0)]
+    conn.close()
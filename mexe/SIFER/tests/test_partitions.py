@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import pytest
+from utils import db_writer, devices, telemetry_store
+
+class Recorder:
+    """كاتب وهمي يحفظ (path, sql, params) كما تصل"""
+
+    def __init__(self):
+        self.items = []
+
+    def submit(self, path, sql, params):
+        self.items.append((path, sql, params))
+
+def row(device_id, ts_ms, percent=50.0):
+    return (device_id, ts_ms, 16.0, 8.0, percent, 0, "[]")
+
+@pytest.mark.parametrize("address, expected", [
+    (("192.168.1.5", 5000), "192.168.1.5"),
+    (("::1", 5000), "1"),
+    (("fe80::1%eth0", 5000, 0, 2), "fe80__1_eth0"),
+    (None, "unknown"),
+])
+def test_ip_fallback_is_a_valid_device_id(address, expected):
+    device_id = devices.resolve_device_id(None, address)
+    assert device_id == expected
+    assert devices.is_valid_device_id(device_id)
+    telemetry_store.partition_path(device_id)
+
+def test_header_device_id_wins():
+    assert devices.resolve_device_id("vm-01", ("::1", 1)) == "vm-01"
+    # ترويسة غير صالحة: الرجوع إلى العنوان
+    assert devices.resolve_device_id("../etc", ("10.0.0.1", 1)) == "10.0.0.1"
+
+def test_write_rejects_bad_device_rows_only(tmp_path):
+    writer = Recorder()
+    store = telemetry_store.TelemetryStore(writer, root=str(tmp_path))
+    store.write([row("vm-01", 1000), row("::1", 2000), row("vm-02", 3000)])
+    inserted = [params for _, sql, params in writer.items if sql == telemetry_store.INSERT_TELEMETRY]
+    assert [params[0] for params in inserted] == ["vm-01", "vm-02"]
+    paths = {path for path, _, _ in writer.items}
+    assert paths == {os.path.join(str(tmp_path), "vm-01.db"), os.path.join(str(tmp_path), "vm-02.db")}
+
+def test_partition_writer_caps_open_files(tmp_path):
+    def open_db(path):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS t (x)")
+        return conn
+
+    writer = db_writer.ShardedWriter(open_db, shards=2, max_open_files=4, flush_interval_ms=5).start()
+    for i in range(200):
+        writer.submit(str(tmp_path / f"d{i % 20}.db"), "INSERT INTO t VALUES (?)", (i,))
+    writer.stop()
+    stats = writer.stats()
+    assert stats["rows_written"] == 200
+    assert stats["closed_files"] > 0
+    assert all(w.open_files <= 2 for w in writer.writers)
+    total = 0
+    for i in range(20):
+        with sqlite3.connect(str(tmp_path / f"d{i}.db")) as conn:
+            total += conn.execute("SELECT count(*) FROM t").fetchone()[0]
+    assert total == 200
+def test_migrate_moves_legacy_telemetry_to_partitions(tmp_path):
+    db_path = str(tmp_path / "sifer_data.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE system_data (id INTEGER PRIMARY KEY, timestamp TEXT, ram_total REAL,
+                                  ram_used REAL, ram_percent REAL, network_connections TEXT)
+    """)
+    conn.executemany("INSERT INTO system_data (timestamp, ram_total, ram_used, ram_percent, network_connections) "
+                     "VALUES (?, 16.0, 8.0, ?, '[]')",
+                     [(f"2025-10-09 10:00:{i:02}", float(i)) for i in range(20)])
+    conn.commit()
+    telemetry_store.migrate(conn)
+    # إعادة التشغيل لا تعيد الترقية
+    telemetry_store.migrate(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == telemetry_store.SCHEMA_VERSION
+    tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "telemetry" not in tables and "devices" in tables and "alerts" in tables
+    assert conn.execute("SELECT device_id FROM devices").fetchall() == [("legacy",)]
+    conn.close()
+    path = telemetry_store.partition_path("legacy", telemetry_store.partition_root(db_path))
+    with sqlite3.connect(path) as part:
+        assert [row[0] for row in part.execute("SELECT ram_percent FROM telemetry ORDER BY ts_ms")] == \
+            [float(i) for i in range(20)]
+        assert part.execute("SELECT sum(samples) FROM telemetry_1m").fetchone()[0] == 20
@@ -0,0 +1,72 @@
+import random
+import pytest
+from utils import rules
+from utils.rules import RuleEngine, RuleError
+from utils.telemetry import TelemetrySample, NetworkConnection
+
+def sample(ts, percent=50.0, remotes=()):
+    network = [NetworkConnection(f"10.0.0.2:{50000 + i}", remote, "ESTABLISHED")
+               for i, remote in enumerate(remotes)]
+    return TelemetrySample(ts, 16.0, 8.0, percent, network)
+
+def fired(engine, device_id, samples):
+    return [[event.rule_id for event in engine.evaluate(device_id, s)] for s in samples]
+
+def test_threshold_window_fires_on_transition_only():
+    engine = RuleEngine(rules.DEFAULT_RULES)
+    percents = [95, 95, 95, 95, 98, 98, 98, 50, 99, 99, 99]
+    assert fired(engine, "vm-01", [sample(i, p) for i, p in enumerate(percents)]) == [
+        [], [], ["ram-high"], [], [], [], ["ram-critical"], [], [], [], ["ram-high", "ram-critical"]]
+
+def threshold_spec(i, op, value):
+    return {"id": f"r{i}", "severity": rules.LOW, "metric": "ram_percent", "op": op, "value": value}
+
+@pytest.mark.parametrize("op", rules.THRESHOLD_OPS)
+def test_bisect_matches_linear_scan(op):
+    rng = random.Random(op)
+    specs = [threshold_spec(i, op, rng.choice([10, 20, 30, 40, 50, 60])) for i in range(12)]
+    engine = RuleEngine(specs)
+    compare = {">=": float.__ge__, ">": float.__gt__, "<=": float.__le__, "<": float.__lt__}[op]
+    matched = set()
+    for ts in range(200):
+        value = float(rng.choice([5, 10, 20, 25, 30, 50, 60, 70]))
+        now = {spec["id"] for spec in specs if compare(value, float(spec["value"]))}
+        events = {event.rule_id for event in engine.evaluate("vm-01", sample(ts, value))}
+        # الحدث عند بدء التحقق فقط
+        assert events == now - matched
+        matched = now
+
+def test_network_rules_fire_for_new_remotes():
+    engine = RuleEngine(rules.DEFAULT_RULES + [
+        {"id": "bad-host", "severity": rules.HIGH, "addresses": ["203.0.113.9", "2001:db8::1"]},
+        {"id": "bad-net", "severity": rules.MEDIUM, "cidr": ["198.51.100.0/24", "198.51.0.0/16"]},
+    ])
+    first = sample(1, remotes=["203.0.113.9:443", "198.51.100.7:22"])
+    events = engine.evaluate("vm-01", first)
+    assert sorted(e.rule_id for e in events) == ["bad-host", "bad-net", "remote-admin-port"]
+    # الشبكتان المتداخلتان لنفس القاعدة تطلقان حدثاً واحداً
+    assert "اتصال بمنفذ إدارة عن بعد: 198.51.100.7:22" in [e.message for e in events]
+    # نفس الاتصالات لا تطلق مرة أخرى، والجديد وحده يطلق
+    assert engine.evaluate("vm-01", sample(2, remotes=["203.0.113.9:443", "198.51.100.7:22"])) == []
+    assert [e.rule_id for e in engine.evaluate("vm-01", sample(3, remotes=["[2001:db8::1]:4444"]))] == \
+        ["backdoor-port", "bad-host"]
+    # عنوان غير قابل للتحليل لا يوقف التقييم
+    assert engine.evaluate("vm-01", sample(4, remotes=["garbage"])) == []
+
+@pytest.mark.parametrize("spec", [
+    {"severity": rules.LOW, "metric": "ram_percent", "value": 1},
+    {"id": "x", "severity": "urgent", "metric": "ram_percent", "value": 1},
+    {"id": "x", "severity": rules.LOW, "metric": "cpu", "value": 1},
+    {"id": "x", "severity": rules.LOW, "metric": "ram_percent", "op": "==", "value": 1},
+    {"id": "x", "severity": rules.LOW, "metric": "ram_percent", "value": 1, "window": 0},
+    {"id": "x", "severity": rules.LOW, "ports": [1], "cidr": ["10.0.0.0/8"]},
+    {"id": "x", "severity": rules.LOW, "cidr": ["10.0.0.0/33"]},
+])
+def test_invalid_rules_are_rejected(spec):
+    with pytest.raises(RuleError):
+        RuleEngine([spec])
+
+def test_load_engine_falls_back_to_defaults(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"id": "not a list"}', encoding="utf-8")
+    assert rules.load_engine(str(path)).rule_count == len(rules.DEFAULT_RULES)
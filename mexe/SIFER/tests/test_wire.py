@@ -0,0 +1,104 @@
+import pytest
+from utils import telemetry, wire
+
+RAM = {"total": 15.85, "used": 7.1, "percent": 44.8}
+
+def connection(port, status="ESTABLISHED"):
+    return {"local_addr": f"192.168.1.10:{port}", "remote_addr": "10.0.0.1:443", "status": status}
+
+def expected(ts, ram, network):
+    return telemetry.TelemetrySample(
+        round(ts * 1000), ram["total"], ram["used"], ram["percent"],
+        [telemetry.NetworkConnection(c["local_addr"], c["remote_addr"], c["status"]) for c in network])
+
+def samples(start, count, first_port=50000):
+    network = [connection(first_port + i) for i in range(3)]
+    out = []
+    for i in range(count):
+        if i % 3 == 2:
+            # اتصال يُغلق وآخر يُفتح
+            network = network[1:] + [connection(first_port + 3 + i)]
+        ram = dict(RAM, used=round(7.1 + i / 100, 2))
+        out.append((start + i * 0.25, ram, list(network)))
+    return out
+
+def send(encoder, first_seq, batch):
+    return wire.encode_batch(first_seq, [encoder.encode(*sample) for sample in batch])
+
+def test_batch_round_trip():
+    encoder = wire.WireEncoder()
+    decoder = telemetry.new_wire_decoder()
+    batch = samples(1760000000.5, 12)
+    decoded, last_seq = telemetry.decode_message(send(encoder, 7, batch), decoder)
+    assert last_seq == 18
+    assert decoded == [expected(*sample) for sample in batch]
+
+def test_ack_frame():
+    assert wire.decode_ack(wire.encode_ack(123456)) == 123456
+    with pytest.raises(wire.WireError):
+        wire.decode_ack(wire.encode_policy(1, 2))
+
+def test_unchanged_network_reuses_list():
+    encoder = wire.WireEncoder()
+    decoder = telemetry.new_wire_decoder()
+    network = [connection(50000)]
+    first, second = (telemetry.decode_frame(encoder.encode(1760000000 + i, RAM, network), decoder)
+                     for i in range(2))
+    assert second.network is first.network
+
+def test_resume_keeps_interned_strings():
+    encoder = wire.WireEncoder()
+    decoder = telemetry.new_wire_decoder()
+    telemetry.decode_message(send(encoder, 1, samples(1760000000, 6)), decoder)
+    # نقطة التحقق كما يحفظها الخادم بعد التأكيد وكما يحفظها العميل للدفعة
+    strings = decoder.strings[:]
+    interned = len(encoder.strings)
+    assert interned == len(strings)
+
+    # المزيد بعد نقطة التحقق ثم انقطاع قبل التأكيد
+    send(encoder, 7, samples(1760000010, 3, first_port=51000))
+
+    encoder.resume(interned)
+    resumed = telemetry.new_wire_decoder()
+    resumed.resume(strings)
+    batch = samples(1760000020, 6)
+    frames = [encoder.encode(*sample) for sample in batch]
+    assert wire.frame_kind(frames[0]) == wire.FRAME_KEY
+    # بلا تفريغ: نفس العناوين تُرسل بمعرفاتها فقط
+    assert frames[0][2] & wire.FLAG_RESET == 0
+    fresh = wire.WireEncoder().encode(*batch[0])
+    assert len(frames[0]) < len(fresh)
+    decoded, last_seq = telemetry.decode_message(wire.encode_batch(7, frames), resumed)
+    assert last_seq == 12
+    assert decoded == [expected(*sample) for sample in batch]
+
+def test_delta_after_resume_needs_key():
+    encoder = wire.WireEncoder()
+    decoder = telemetry.new_wire_decoder()
+    for sample in samples(1760000000, 2):
+        telemetry.decode_frame(encoder.encode(*sample), decoder)
+    delta = encoder.encode(*samples(1760000001, 1)[0])
+    assert wire.frame_kind(delta) == wire.FRAME_DELTA
+    decoder.resume(decoder.strings[:])
+    with pytest.raises(telemetry.TelemetryError):
+        telemetry.decode_frame(delta, decoder)
+
+def test_timestamps_in_milliseconds():
+    encoder = wire.WireEncoder()
+    decoder = telemetry.new_wire_decoder()
+    decoded = [telemetry.decode_frame(encoder.encode(*sample), decoder)
+               for sample in samples(1760000000.5, 3)]
+    # العينات المتقاربة (أخذ العينات التكيفي) لا تتساوى طوابعها
+    assert [sample.ts_ms for sample in decoded] == [1760000000500, 1760000000750, 1760000001000]
+
+def test_policy_frame():
+    assert wire.decode_policy(wire.encode_policy(0.5, 10)) == (0.5, 10)
+    assert wire.decode_policy(wire.encode_policy(0, 0)) == (0, 0)
+
+def test_json_fallback_milliseconds():
+    payload = (b'{"timestamp": "2026-10-18 12:00:01.250", '
+               b'"ram": {"total": 16, "used": 8, "percent": 50}, "network": []}')
+    whole = telemetry.parse_timestamp("2026-10-18 12:00:01")
+    assert telemetry.decode(payload).ts_ms == whole + 250
+    with pytest.raises(telemetry.TelemetryError):
+        telemetry.parse_timestamp("2026-10-18 12:00:01,250")
\ No newline at end of file
@@ -0,0 +1,75 @@
+import re
+import time
+import datetime
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer
+
+# الأرقام والعناوين تُستبدل لتجميع الرسائل المتشابهة تحت نمط واحد
+_VARIABLE = re.compile(r"\d+(?:[.:]\d+)*")
+
+class LogSink(QObject):
+    """مصرف سجلات آمن بين الخيوط: دفع بدون أقفال ثم تفريغ دفعي إلى الواجهة بمؤقت"""
+
+    def __init__(self, widget, capacity=5000, flush_interval_ms=250, line_cap=2000,
+                 max_per_flush=500, rate_limit=5, rate_window=1.0):
+        super().__init__(widget)
+        self.widget = widget
+        # append و popleft في deque ذرية في CPython لذلك لا حاجة لقفل
+        self.buffer = deque(maxlen=capacity)
+        # عداد تقريبي لما أُزيح من الحلقة قبل تفريغه (للتشخيص فقط)
+        self.overflowed = 0
+        self._reported_overflow = 0
+        self.max_per_flush = max_per_flush
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self._window_start = time.monotonic()
+        self._counts = {}
+        self._suppressed = {}
+        # الحد الأقصى للأسطر المحفوظة في المستند
+        self.widget.setMaximumBlockCount(line_cap)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(flush_interval_ms)
+
+    def push(self, message):
+        """يُستدعى من أي خيط"""
+        if len(self.buffer) == self.buffer.maxlen:
+            self.overflowed += 1
+        self.buffer.append((time.time(), message))
+
+    def _allow(self, message):
+        key = _VARIABLE.sub("#", message)
+        count = self._counts.get(key, 0) + 1
+        self._counts[key] = count
+        if count <= self.rate_limit:
+            return True
+        self._suppressed[key] = self._suppressed.get(key, 0) + 1
+        return False
+
+    def _close_window(self, lines):
+        for key, count in self._suppressed.items():
+            lines.append(f"[{self._format(time.time())}] تم حجب {count} رسالة مماثلة: {key[:120]}")
+        self._counts = {}
+        self._suppressed = {}
+        self._window_start = time.monotonic()
+
+    @staticmethod
+    def _format(timestamp):
+        return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+    def flush(self):
+        """يعمل في خيط الواجهة: إضافة كل الأسطر الجديدة في تحديث واحد"""
+        lines = []
+        buffer = self.buffer
+        while buffer and len(lines) < self.max_per_flush:
+            timestamp, message = buffer.popleft()
+            if self._allow(message):
+                lines.append(f"[{self._format(timestamp)}] {message}")
+        if time.monotonic() - self._window_start >= self.rate_window:
+            self._close_window(lines)
+        overflowed = self.overflowed - self._reported_overflow
+        if overflowed > 0:
+            self._reported_overflow += overflowed
+            lines.append(f"[{self._format(time.time())}] تم تجاوز سعة السجل: فُقدت {overflowed} رسالة")
+        if lines:
+            self.widget.appendPlainText("\n".join(lines))
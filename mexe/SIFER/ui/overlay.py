@@ -3,7 +3,7 @@ from PyQt5.QtCore import Qt
 from utils.net_monitor import NetworkMonitor
 
 class HUDOverlay(QWidget):
-    def __init__(self):
+    def __init__(self, network_monitor=None):
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
@@ -16,8 +16,11 @@ class HUDOverlay(QWidget):
         self.layout.addWidget(self.status_label)
         self.setLayout(self.layout)
         
-        self.network_monitor = NetworkMonitor()
+        # لقطة مشتركة مع باقي المستهلكين؛ التحديث عند تغير الحالة فقط
+        self.network_monitor = network_monitor or NetworkMonitor.shared()
         self.network_monitor.status_changed.connect(self.update_status)
+        state = self.network_monitor.snapshot()
+        self.update_status(state.ssid, state.status)
         
     def update_status(self, ssid, status):
         self.network_label.setText(f"الشبكة: {ssid}")
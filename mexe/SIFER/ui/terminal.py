@@ -1,6 +1,6 @@
-from PyQt5.QtWidgets import QMainWindow, QTextEdit
+from PyQt5.QtWidgets import QMainWindow, QPlainTextEdit
 from PyQt5.QtCore import Qt
-import datetime
+from ui.log_sink import LogSink
 
 class TerminalWindow(QMainWindow):
     def __init__(self):
@@ -8,10 +8,12 @@ class TerminalWindow(QMainWindow):
         self.setWindowTitle("S.I.F.E.R Terminal")
         self.setGeometry(100, 100, 800, 600)
         
-        self.text_area = QTextEdit(self)
+        self.text_area = QPlainTextEdit(self)
         self.text_area.setReadOnly(True)
         self.setCentralWidget(self.text_area)
+        # الرسائل تصل من خيوط الخادم وتُعرض على دفعات في خيط الواجهة
+        self.sink = LogSink(self.text_area)
         
     def log_message(self, message):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.text_area.append(f"[{timestamp}] {message}")
\ No newline at end of file
+        """آمنة للاستدعاء من أي خيط"""
+        self.sink.push(message)
\ No newline at end of file
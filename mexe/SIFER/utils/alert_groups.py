@@ -0,0 +1,135 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from utils.rules import RuleEvent
+
+# device_id لأحداث الملخص التي تخص عدة أجهزة
+FLEET = "fleet"
+
+class _Group:
+    __slots__ = ("event", "last_seen", "flushed_at", "devices", "pending", "pending_devices", "total")
+
+    def __init__(self, event, now):
+        self.event = event
+        self.last_seen = now
+        self.flushed_at = now
+        # كل الأجهزة المتأثرة منذ بداية الحادثة
+        self.devices = {event.device_id}
+        self.pending = 0
+        # الأجهزة المكبوتة منذ آخر ملخص؛ تُحفظ مع الملخص ليبقى سجل كل جهاز كاملاً
+        self.pending_devices = {}
+        self.total = 1
+
+class AlertAggregator:
+    """تجميع الإنذارات المتشابهة من كل الأجهزة قبل الطرفية والصوت وقاعدة البيانات
+
+    البصمة (rule_id, severity). أول إنذار لبصمة يمر فوراً، وما يليه خلال نافذة
+    منزلقة يُعد فقط ثم يخرج ملخص واحد كل window ثانية مثل "37 جهاز: device-offline".
+    الملخص يحمل في devices الأجهزة التي كُبتت إنذاراتها منذ الملخص السابق.
+    الحالة في جدول محدود يُخلي الأقدم استخداماً (LRU) بعد إخراج ملخصه."""
+
+    def __init__(self, emit, window=10.0, max_groups=1024, max_devices=4096, tick=1.0):
+        # emit(event) يُستدعى من خيط المستدعي أو خيط المجمّع، خارج القفل
+        self.emit = emit
+        self.window = window
+        self.max_groups = max_groups
+        self.max_devices = max_devices
+        self.tick = tick
+        self.groups = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+        # عدادات
+        self.received = 0
+        self.suppressed = 0
+        self.summaries = 0
+        self.evicted = 0
+
+    def submit(self, events):
+        """إضافة دفعة RuleEvent؛ آمنة من أي خيط"""
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for event in events:
+                self.received += 1
+                fingerprint = (event.rule_id, event.severity)
+                group = self.groups.get(fingerprint)
+                if group is None or now - group.last_seen > self.window:
+                    if group is not None and group.pending:
+                        out.append(self._summary(group))
+                    self.groups[fingerprint] = _Group(event, now)
+                    self.groups.move_to_end(fingerprint)
+                    out.append(event)
+                    while len(self.groups) > self.max_groups:
+                        _, evicted = self.groups.popitem(last=False)
+                        self.evicted += 1
+                        if evicted.pending:
+                            out.append(self._summary(evicted))
+                    continue
+                self.groups.move_to_end(fingerprint)
+                group.last_seen = now
+                group.pending += 1
+                group.total += 1
+                if len(group.devices) < self.max_devices:
+                    group.devices.add(event.device_id)
+                pending = group.pending_devices
+                if event.device_id in pending:
+                    pending[event.device_id] += 1
+                elif len(pending) < self.max_devices:
+                    pending[event.device_id] = 1
+                group.event = event
+                self.suppressed += 1
+        self._deliver(out)
+
+    def _summary(self, group):
+        event = group.event
+        devices = len(group.devices)
+        message = (f"{devices} جهاز: {event.rule_id} ({group.total} إنذار منذ بداية الحادثة)"
+                   if devices > 1 else f"{event.device_id}: {event.rule_id} تكرر {group.pending} مرة")
+        affected = tuple(group.pending_devices)
+        self.summaries += 1
+        group.pending = 0
+        group.pending_devices = {}
+        return RuleEvent(event.ts_ms, FLEET if devices > 1 else event.device_id,
+                         event.rule_id, event.severity, message, affected)
+
+    def flush(self, force=False):
+        """إخراج ملخصات المجموعات التي مرت نافذتها وحذف الخاملة"""
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for fingerprint, group in list(self.groups.items()):
+                if group.pending and (force or now - group.flushed_at >= self.window):
+                    out.append(self._summary(group))
+                    group.flushed_at = now
+                elif not group.pending and now - group.last_seen > self.window:
+                    del self.groups[fingerprint]
+        self._deliver(out)
+
+    def _deliver(self, events):
+        for event in events:
+            try:
+                self.emit(event)
+            except Exception as e:
+                error_msg = f"خطأ في إخراج الإنذار: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
+
+    def run(self):
+        while not self._stop.wait(self.tick):
+            self.flush()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="alert-groups", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.flush(force=True)
+
+    def snapshot(self):
+        return {"groups": len(self.groups), "received": self.received,
+                "suppressed": self.suppressed, "summaries": self.summaries,
+                "evicted": self.evicted}
\ No newline at end of file
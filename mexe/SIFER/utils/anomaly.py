@@ -0,0 +1,125 @@
+import numpy as np
+from utils.rules import RuleEvent, MEDIUM, HIGH
+
+# المقاييس المراقبة: اسم ← موضع العمود في صف telemetry_store.sample_row
+METRICS = (("ram_percent", 4), ("conn_count", 5))
+# أقل فرق مطلق يُعتبر شذوذاً؛ يمنع الإنذار من تذبذب صغير على جهاز شبه ثابت
+MIN_DELTA = (5.0, 20.0)
+# أقل انحراف معياري في حساب الدرجة لنفس السبب
+MIN_SIGMA = (1.0, 2.0)
+SEASONAL_SLOTS = 24
+HOUR_MS = 3600 * 1000
+
+class AnomalyDetector:
+    """كشف شذوذ تدريجي لكل جهاز ومقياس دون إعادة قراءة السجل
+
+    لكل (جهاز، مقياس) متوسط EWMA وتباين أسي للبواقي وخط أساس موسمي بحسب ساعة
+    اليوم، فالذاكرة ثابتة لكل جهاز. الحالة مصفوفات NumPy مفهرسة بالجهاز، فتُقيّم
+    وتُحدّث دفعة العينات من كل الأجهزة بعمليات متجهة. غير آمن بين الخيوط: يُستدعى
+    من مرحلة التخزين الوحيدة."""
+
+    def __init__(self, alpha=0.05, seasonal_alpha=0.1, threshold=4.0, warmup=30,
+                 seasonal_warmup=10, capacity=64):
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.seasonal_warmup = seasonal_warmup
+        self.min_delta = np.array(MIN_DELTA)
+        self.min_sigma = np.array(MIN_SIGMA)
+        self.index = {}
+        self.device_ids = []
+        metrics = len(METRICS)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.mean = np.zeros((capacity, metrics))
+        self.var = np.zeros((capacity, metrics))
+        self.seasonal = np.zeros((capacity, SEASONAL_SLOTS, metrics))
+        self.seasonal_count = np.zeros((capacity, SEASONAL_SLOTS), dtype=np.int64)
+        # (جهاز، مقياس) في حالة شذوذ حالياً؛ الحدث يُطلق عند الدخول فقط
+        self.active = np.zeros((capacity, metrics), dtype=bool)
+
+    def _grow(self, needed):
+        capacity = len(self.count)
+        while capacity < needed:
+            capacity *= 2
+        for name in ("count", "mean", "var", "seasonal", "seasonal_count", "active"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _slot(self, device_id):
+        slot = self.index.get(device_id)
+        if slot is None:
+            slot = self.index[device_id] = len(self.device_ids)
+            self.device_ids.append(device_id)
+            if slot >= len(self.count):
+                self._grow(slot + 1)
+        return slot
+
+    def observe(self, rows):
+        """تحديث الإحصاءات بدفعة صفوف telemetry_store؛ ترجع قائمة RuleEvent الجديدة"""
+        if not rows:
+            return []
+        slots = np.fromiter((self._slot(row[0]) for row in rows), dtype=np.int64, count=len(rows))
+        ts_ms = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        values = np.array([[row[column] for _, column in METRICS] for row in rows], dtype=float)
+        # التحديث المتجه يتطلب جهازاً واحداً مرة واحدة في كل جولة؛ عادة جولة واحدة
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_slots)) + 1]
+        rank = np.empty(len(rows), dtype=np.int64)
+        rank[order] = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        events = []
+        for round_ in range(int(rank.max()) + 1):
+            chosen = np.flatnonzero(rank == round_)
+            events += self._update(slots[chosen], ts_ms[chosen], values[chosen])
+        return events
+
+    def _update(self, slots, ts_ms, values):
+        hours = (ts_ms // HOUR_MS) % SEASONAL_SLOTS
+        count = self.count[slots]
+        mean = self.mean[slots]
+        seasonal = self.seasonal[slots, hours]
+        seasonal_count = self.seasonal_count[slots, hours]
+
+        # القيمة المتوقعة: خط الأساس لهذه الساعة إن اكتمل، وإلا المتوسط المتحرك
+        expected = np.where((seasonal_count >= self.seasonal_warmup)[:, None], seasonal, mean)
+        residual = values - expected
+        sigma = np.maximum(np.sqrt(self.var[slots]), self.min_sigma)
+        score = residual / sigma
+        magnitude = np.abs(score)
+        flagged = ((count >= self.warmup)[:, None] & (magnitude >= self.threshold)
+                   & (np.abs(residual) >= self.min_delta))
+        previous = self.active[slots]
+        # خروج من حالة الشذوذ عند نصف العتبة لمنع التذبذب حولها
+        self.active[slots] = flagged | (previous & (magnitude >= self.threshold / 2))
+
+        first = (count == 0)[:, None]
+        self.mean[slots] = np.where(first, values, mean + self.alpha * (values - mean))
+        # البواقي تُقص عند العتبة قبل التباين كي لا تضخم قفزة واحدة الانحراف لفترة طويلة
+        clipped = np.clip(residual, -self.threshold * sigma, self.threshold * sigma)
+        self.var[slots] = np.where(first, 0.0, (1 - self.alpha) * self.var[slots] + self.alpha * clipped ** 2)
+        seasonal_first = (seasonal_count == 0)[:, None]
+        self.seasonal[slots, hours] = np.where(
+            seasonal_first, values, seasonal + self.seasonal_alpha * (values - seasonal))
+        self.seasonal_count[slots, hours] = seasonal_count + 1
+        self.count[slots] = count + 1
+
+        events = []
+        for row, column in zip(*np.nonzero(flagged & ~previous)):
+            name = METRICS[column][0]
+            severity = HIGH if magnitude[row, column] >= 2 * self.threshold else MEDIUM
+            events.append(RuleEvent(
+                int(ts_ms[row]), self.device_ids[slots[row]], f"anomaly-{name}", severity,
+                f"قيمة غير معتادة لـ {name}: {values[row, column]:g} "
+                f"(المتوقع {expected[row, column]:.1f}، الانحراف {score[row, column]:+.1f}σ)"))
+        return events
+
+    def snapshot(self, device_id):
+        """الإحصاءات الحالية لجهاز: {المقياس: (المتوسط، الانحراف المعياري)}"""
+        slot = self.index.get(device_id)
+        if slot is None:
+            return {}
+        return {name: (float(self.mean[slot, i]), float(np.sqrt(self.var[slot, i])))
+                for i, (name, _) in enumerate(METRICS)}
\ No newline at end of file
@@ -1,23 +1,225 @@
-import pyaudio
+import time
 import wave
-import os
+import heapq
+import queue
+import logging
+import threading
+from collections import namedtuple
+import numpy as np
+
+# أولوية التشغيل: الأصغر أولاً؛ الإنذار الحرج يتقدم على ما في الطابور
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+
+SOUNDS = {"alert": "assets/sounds/alert.wav"}
+
+# صوت مفكوك مسبقاً إلى PCM مع خصائص الدفق اللازمة لتشغيله
+Sound = namedtuple("Sound", "name sample_width channels rate frames")
+
+def load_sound(name, path, volume=1.0):
+    """فك ملف WAV مرة واحدة إلى ذاكرة مع تطبيق مستوى الصوت"""
+    with wave.open(path, "rb") as wf:
+        sample_width = wf.getsampwidth()
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    if volume != 1.0 and sample_width == 2:
+        pcm = np.frombuffer(frames, dtype="<i2").astype(np.float32) * volume
+        frames = np.clip(pcm, -32768, 32767).astype("<i2").tobytes()
+    return Sound(name, sample_width, channels, rate, frames)
+
+class NullBackend:
+    """بدون صوت: يسجل ما كان سيُشغّل؛ للأجهزة بلا بطاقة صوت"""
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, sound):
+        self.played.append(sound.name)
+
+    def close(self):
+        pass
+
+class FileBackend:
+    """يكتب كل ما يُشغّل في ملف WAV واحد بصيغة أول صوت"""
+
+    def __init__(self, path):
+        self.path = path
+        self.wf = None
+        self.played = []
+
+    def play(self, sound):
+        if self.wf is None:
+            self.wf = wave.open(self.path, "wb")
+            self.wf.setsampwidth(sound.sample_width)
+            self.wf.setnchannels(sound.channels)
+            self.wf.setframerate(sound.rate)
+        elif (sound.sample_width, sound.channels, sound.rate) != (
+                self.wf.getsampwidth(), self.wf.getnchannels(), self.wf.getframerate()):
+            raise ValueError(f"صيغة {sound.name} تختلف عن صيغة الملف {self.path}")
+        self.wf.writeframes(sound.frames)
+        self.played.append(sound.name)
+
+    def close(self):
+        if self.wf is not None:
+            self.wf.close()
+            self.wf = None
+
+class PyAudioBackend:
+    """مثيل PyAudio واحد ودفق خرج مفتوح لكل صيغة طوال عمر الخدمة"""
 
-class AudioAlerts:
     def __init__(self):
-        self.audio_path = "assets/sounds/alert.wav"
-    
-    def play_alert(self):
-        if os.path.exists(self.audio_path):
-            wf = wave.open(self.audio_path, 'rb')
-            p = pyaudio.PyAudio()
-            stream = p.open(format=p.get_format_from_width(wf.getsampwidth()),
-                           channels=wf.getnchannels(),
-                           rate=wf.getframerate(),
-                           output=True)
-            data = wf.readframes(1024)
-            while data:
-                stream.write(data)
-                data = wf.readframes(1024)
+        import pyaudio
+        self.pyaudio = pyaudio.PyAudio()
+        self.streams = {}
+
+    def play(self, sound):
+        key = (sound.sample_width, sound.channels, sound.rate)
+        stream = self.streams.get(key)
+        if stream is None:
+            stream = self.streams[key] = self.pyaudio.open(
+                format=self.pyaudio.get_format_from_width(sound.sample_width),
+                channels=sound.channels, rate=sound.rate, output=True)
+        stream.write(sound.frames)
+
+    def close(self):
+        for stream in self.streams.values():
             stream.stop_stream()
             stream.close()
-            p.terminate()
\ No newline at end of file
+        self.streams.clear()
+        self.pyaudio.terminate()
+
+def make_backend(name):
+    """"pyaudio" أو "null" أو "file:<path>"؛ عند تعذر PyAudio يُستخدم الصامت"""
+    if name == "null":
+        return NullBackend()
+    if name.startswith("file:"):
+        return FileBackend(name[len("file:"):])
+    try:
+        return PyAudioBackend()
+    except Exception as e:
+        error_msg = f"تعذر فتح جهاز الصوت، الإنذارات الصوتية معطلة: {str(e)}"
+        logging.error(error_msg)
+        print(error_msg)
+        return NullBackend()
+
+class AudioAlerts:
+    """خدمة تشغيل الإنذارات في خيط مستقل
+
+    play_alert() لا تحجب أبداً: تضع الطلب في طابور أولويات محدود ويشغّله خيط
+    الصوت، وعند امتلائه يُزيح الإنذار الحرج أدنى طلب عادي بدل أن يُسقط. الأصوات
+    تُفك مرة واحدة عند البدء، والإنذار المكرر بنفس المفتاح خلال coalesce_window
+    يُدمج في الأول."""
+
+    def __init__(self, sounds=None, backend="pyaudio", volume=1.0, coalesce_window=2.0,
+                 queue_size=32):
+        self.sound_paths = sounds or SOUNDS
+        self.backend_name = backend
+        self.backend = None
+        self.volume = volume
+        self.coalesce_window = coalesce_window
+        self.sounds = {}
+        self.queue = queue.PriorityQueue(queue_size)
+        self._last_queued = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.thread = None
+        # عدادات
+        self.played = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def start(self):
+        for name, path in self.sound_paths.items():
+            try:
+                self.sounds[name] = load_sound(name, path, self.volume)
+            except (OSError, EOFError, wave.Error) as e:
+                error_msg = f"تعذر تحميل الصوت {path}: {str(e) or 'ملف فارغ أو غير مكتمل'}"
+                logging.error(error_msg)
+                print(error_msg)
+        if isinstance(self.backend_name, str):
+            self.backend = make_backend(self.backend_name)
+        else:
+            self.backend = self.backend_name
+        self.thread = threading.Thread(target=self.run, name="audio-alerts", daemon=True)
+        self.thread.start()
+        return self
+
+    def play_alert(self, name="alert", priority=PRIORITY_NORMAL, key=None):
+        """طلب تشغيل صوت؛ ترجع False إذا دُمج مع طلب سابق أو أُسقط"""
+        key = name if key is None else key
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_queued.get(key)
+            if last is not None and now - last < self.coalesce_window:
+                self.coalesced += 1
+                return False
+            self._last_queued[key] = now
+            if len(self._last_queued) > 1024:
+                # إزالة المفاتيح التي انتهت نافذتها
+                self._last_queued = {k: t for k, t in self._last_queued.items()
+                                     if now - t < self.coalesce_window}
+            self._seq += 1
+            item = (priority, self._seq, name)
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            if priority == PRIORITY_CRITICAL and self._evict_for(item):
+                return True
+            self.dropped += 1
+            return False
+
+    def _evict_for(self, item):
+        """استبدال أدنى طلب أقل أولوية من item في الطابور الممتلئ بـ item"""
+        with self.queue.mutex:
+            heap = self.queue.queue
+            # علامة الإيقاف (الاسم None) لا تُزاح
+            victim = max((queued for queued in heap if queued[2] is not None), default=None)
+            if victim is None or victim[0] <= item[0]:
+                return False
+            heap.remove(victim)
+            heapq.heapify(heap)
+            heapq.heappush(heap, item)
+            self.queue.not_empty.notify()
+        self.dropped += 1
+        return True
+
+    def run(self):
+        while True:
+            try:
+                _, _, name = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    break
+                continue
+            if name is None:
+                break
+            sound = self.sounds.get(name)
+            if sound is None:
+                continue
+            try:
+                self.backend.play(sound)
+                self.played += 1
+            except Exception as e:
+                error_msg = f"خطأ في تشغيل الصوت {name}: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
+        self.backend.close()
+
+    def stop(self, timeout=2):
+        if self.thread is None:
+            return
+        self._stopping.set()
+        try:
+            # الإيقاف بعد الطلبات الحالية بأولوية أدنى منها
+            self.queue.put((PRIORITY_NORMAL + 1, 0, None), timeout=timeout)
+        except queue.Full:
+            # الطابور ممتلئ والمشغل عالق: الخيط يتوقف عند أول فراغ للطابور
+            pass
+        self.thread.join(timeout)
+
+    def snapshot(self):
+        return {"played": self.played, "coalesced": self.coalesced, "dropped": self.dropped,
+                "queued": self.queue.qsize()}
\ No newline at end of file
@@ -0,0 +1,272 @@
+import zlib
+import queue
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+import logging
+
+DB_PATH = "database/sifer_data.db"
+
+# إعدادات SQLite للكتابة الكثيفة: WAL يسمح بالقراءة أثناء الكتابة
+# و synchronous=NORMAL يكتفي بـ fsync عند نقاط التفتيش بدل كل عملية
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA wal_autocheckpoint=4000",
+)
+
+def connect(db_path=DB_PATH):
+    """فتح اتصال بقاعدة البيانات مع إعدادات الأداء"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class BatchWriter:
+    """كاتب وحيد لقاعدة البيانات: يفرغ طابوراً ويلتزم على دفعات"""
+
+    def __init__(self, db_path=DB_PATH, batch_size=500, flush_interval_ms=50, max_queue=100000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.running = False
+        self.thread = None
+        self._lock = threading.Lock()
+        # عدادات الإنتاجية
+        self.rows_written = 0
+        self.commits = 0
+        self.errors = 0
+        self.dropped = 0
+        self._rate = 0.0
+        self._rate_rows = 0
+        self._rate_time = time.monotonic()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="db-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """إيقاف الكاتب بعد تفريغ ما تبقى في الطابور؛ لا يحجب أكثر من timeout"""
+        deadline = time.monotonic() + timeout
+        self.running = False
+        try:
+            # None يوقظ الخيط فقط؛ الخروج يعتمد على running فالطابور الممتلئ لا يحجب
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        if self.thread:
+            self.thread.join(max(0, deadline - time.monotonic()))
+
+    def submit(self, sql, params):
+        """إضافة صف للكتابة؛ يُستدعى من أي خيط"""
+        self.queue.put((sql, params))
+
+    def run(self):
+        conn = connect(self.db_path)
+        try:
+            while True:
+                batch = self._collect()
+                if batch:
+                    self._write(conn, batch)
+                if not self.running and self.queue.empty():
+                    break
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """جمع دفعة حتى batch_size صف أو انقضاء flush_interval أيهما أسبق"""
+        batch = []
+        try:
+            item = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        # تجميع الصفوف المتتالية لنفس الاستعلام في executemany واحد
+        try:
+            groups = []
+            for sql, params in batch:
+                if groups and groups[-1][0] == sql:
+                    groups[-1][1].append(params)
+                else:
+                    groups.append((sql, [params]))
+            with conn:
+                for sql, rows in groups:
+                    conn.executemany(sql, rows)
+            self._count(len(batch))
+        except Exception as e:
+            self.errors += 1
+            error_msg = f"خطأ في كتابة دفعة ({len(batch)} صف)، إعادة المحاولة صفاً صفاً: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+            self._write_rows(conn, batch)
+
+    def _write_rows(self, conn, batch):
+        """كتابة الدفعة صفاً صفاً في معاملة واحدة؛ الصف الفاشل وحده يُسقط"""
+        failed = 0
+        try:
+            with conn:
+                for sql, params in batch:
+                    try:
+                        conn.execute(sql, params)
+                    except Exception as e:
+                        if not failed:
+                            error_msg = f"إسقاط صف فاشل: {str(e)}"
+                            logging.error(error_msg)
+                            print(error_msg)
+                        failed += 1
+        except Exception as e:
+            # فشل الالتزام نفسه: الدفعة كلها مفقودة
+            failed = len(batch)
+            error_msg = f"خطأ في كتابة دفعة ({len(batch)} صف): {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+        if failed < len(batch):
+            self._count(len(batch) - failed)
+        if failed:
+            with self._lock:
+                self.dropped += failed
+            error_msg = f"أُسقط {failed} من {len(batch)} صف"
+            logging.error(error_msg)
+            print(error_msg)
+
+    def _count(self, rows):
+        with self._lock:
+            self.rows_written += rows
+            self.commits += 1
+            self._rate_rows += rows
+            now = time.monotonic()
+            elapsed = now - self._rate_time
+            if elapsed >= 1.0:
+                self._rate = self._rate_rows / elapsed
+                self._rate_rows = 0
+                self._rate_time = now
+
+    def stats(self):
+        """لقطة من عدادات الإنتاجية"""
+        with self._lock:
+            rate = self._rate
+            if not rate and self._rate_rows:
+                # لم تكتمل نافذة القياس الأولى بعد
+                rate = self._rate_rows / max(time.monotonic() - self._rate_time, 1e-6)
+            return {
+                "rows_written": self.rows_written,
+                "commits": self.commits,
+                "errors": self.errors,
+                "dropped": self.dropped,
+                "queued": self.queue.qsize(),
+                "rows_per_sec": round(rate, 1),
+            }
+
+
+class PartitionWriter(BatchWriter):
+    """كاتب لعدة ملفات قواعد بيانات: كل عنصر (path, sql, params) ويُلتزم لكل ملف على حدة
+
+    الاتصالات المفتوحة محدودة بـ max_open (كل ملف WAL يستهلك 3 واصفات تقريباً)
+    ويُغلق الأقدم استخداماً عند تجاوزها."""
+
+    def __init__(self, open_db=connect, name="db-partition", max_open=64, **options):
+        super().__init__(db_path=None, **options)
+        # open_db(path) يفتح الملف ويهيئ مخططه عند أول استخدام
+        self.open_db = open_db
+        self.name = name
+        self.max_open = max(1, max_open)
+        self.open_files = 0
+        self.closed_files = 0
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, path, sql, params):
+        self.queue.put((path, sql, params))
+
+    def _open(self, conns, path):
+        conn = conns.get(path)
+        if conn is not None:
+            conns.move_to_end(path)
+        else:
+            try:
+                conn = conns[path] = self.open_db(path)
+                while len(conns) > self.max_open:
+                    # كل دفعة مُلتزمة في _write فالإغلاق لا يفقد شيئاً
+                    _, oldest = conns.popitem(last=False)
+                    oldest.close()
+                    self.closed_files += 1
+                self.open_files = len(conns)
+            except Exception as e:
+                self.errors += 1
+                error_msg = f"خطأ في فتح قاعدة البيانات {path}: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
+        return conn
+
+    def run(self):
+        conns = OrderedDict()
+        try:
+            while True:
+                batch = self._collect()
+                groups = {}
+                for path, sql, params in batch:
+                    groups.setdefault(path, []).append((sql, params))
+                for path, items in groups.items():
+                    conn = self._open(conns, path)
+                    if conn is not None:
+                        self._write(conn, items)
+                if not self.running and self.queue.empty():
+                    break
+        finally:
+            for conn in conns.values():
+                conn.close()
+
+class ShardedWriter:
+    """عدة كتّاب مستقلين لملفات مختلفة؛ كل ملف يثبت على كاتب واحد فيبقى ترتيب صفوفه
+    ولا يتنافس كاتبان على قفل نفس الملف"""
+
+    def __init__(self, open_db=connect, shards=4, max_open_files=256, **options):
+        # الحد الكلي للملفات المفتوحة يُقسم على الكتّاب
+        shards = max(1, shards)
+        self.writers = [PartitionWriter(open_db, name=f"db-partition-{index}",
+                                        max_open=max_open_files // shards, **options)
+                        for index in range(shards)]
+
+    def start(self):
+        for writer in self.writers:
+            writer.start()
+        return self
+
+    def stop(self, timeout=5):
+        for writer in self.writers:
+            writer.stop(timeout)
+
+    def submit(self, path, sql, params):
+        # crc32 بدل hash لأن hash للنصوص يتغير بين التشغيلات
+        self.writers[zlib.crc32(path.encode()) % len(self.writers)].submit(path, sql, params)
+
+    def stats(self):
+        shards = [writer.stats() for writer in self.writers]
+        total = {key: sum(shard[key] for shard in shards) for key in shards[0]}
+        total["rows_per_sec"] = round(total["rows_per_sec"], 1)
+        total["open_files"] = sum(writer.open_files for writer in self.writers)
+        total["closed_files"] = sum(writer.closed_files for writer in self.writers)
+        total["shards"] = shards
+        return total
\ No newline at end of file
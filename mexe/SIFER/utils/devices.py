@@ -0,0 +1,60 @@
+import re
+import time
+import logging
+from utils.db_writer import DB_PATH, connect
+
+# المعرف يصبح اسم ملف التخزين الخاص بالجهاز لذلك يُقيد بأحرف آمنة
+DEVICE_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS devices (
+        device_id TEXT PRIMARY KEY,
+        first_seen_ms INTEGER NOT NULL,
+        last_connected_ms INTEGER NOT NULL,
+        last_address TEXT,
+        connections INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+UPSERT_DEVICE = """
+    INSERT INTO devices (device_id, first_seen_ms, last_connected_ms, last_address, connections)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT (device_id) DO UPDATE SET
+        last_connected_ms = excluded.last_connected_ms,
+        last_address = excluded.last_address,
+        connections = connections + 1
+"""
+
+def is_valid_device_id(device_id):
+    return isinstance(device_id, str) and DEVICE_ID_PATTERN.match(device_id) is not None
+
+def resolve_device_id(header_value, remote_address):
+    """معرف الجهاز من ترويسة الاتصال؛ العملاء القدامى يُعرفون بعنوان IP"""
+    if header_value and is_valid_device_id(header_value):
+        return header_value
+    host = str(remote_address[0]) if remote_address else ""
+    # عناوين IPv6 تحتوي ":" و"%" فتُستبدل، ولا يبدأ المعرف إلا بحرف أو رقم ("::1" ← "1")
+    device_id = _UNSAFE_CHARS.sub("_", host).lstrip("_.-")[:64]
+    return device_id if is_valid_device_id(device_id) else "unknown"
+
+def load_device_ids(db_path=DB_PATH):
+    """الأجهزة المسجلة سابقاً؛ لبدء تتبع اتصالها عند تشغيل الخادم"""
+    conn = connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT device_id FROM devices")]
+    finally:
+        conn.close()
+
+class DeviceRegistry:
+    """سجل الأجهزة في قاعدة البيانات الرئيسية؛ الكتابة عبر الكاتب الوحيد"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def register(self, device_id, address):
+        """يُستدعى عند كل اتصال؛ يُنشئ سجل الجهاز أو يحدث آخر اتصال له"""
+        now_ms = int(time.time() * 1000)
+        host = address[0] if address else None
+        self.writer.submit(UPSERT_DEVICE, (device_id, now_ms, now_ms, host))
+        logging.info(f"تسجيل الجهاز {device_id} من {host}")
\ No newline at end of file
@@ -1,41 +1,115 @@
-from PyQt5.QtCore import QThread
-import sqlite3
-import datetime
+import math
 import time
+import logging
+import datetime
+import threading
+from utils.timing_wheel import TimingWheel
+
+ONLINE = "online"
+OFFLINE = "offline"
+
+INSERT_EMERGENCY = """
+    INSERT INTO emergency_trigger (timestamp, reason, status, device_id)
+    VALUES (?, ?, ?, ?)
+"""
+
+class LivenessTracker:
+    """تتبع آخر ظهور لكل جهاز على عجلة توقيت بدل فحص دوري لكل اتصال
+
+    touch() تُستدعى من مسار الاستقبال ومن pong؛ كلفتها كتابة في قاموس فقط لأن
+    المؤقت لا يُعاد ضبطه مع كل عينة: عند انتهائه يُقارن بآخر ظهور ويُؤجل إن لزم.
+    بعد emergency_timeout بلا أي إشارة يُطلق حدث OFFLINE، وعند عودة الجهاز حدث ONLINE."""
+
+    def __init__(self, timeout, writer=None, on_event=None, tick=1.0):
+        self.tick = tick
+        self.timeout_ticks = max(1, math.ceil(timeout / tick))
+        self.writer = writer
+        # on_event(device_id, state) يُستدعى من خيط المتتبع
+        self.on_event = on_event
+        self.wheel = TimingWheel()
+        self.last_seen = {}
+        self.offline = set()
+        self._epoch = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def _now(self):
+        return int((time.monotonic() - self._epoch) / self.tick)
+
+    def watch(self, device_ids):
+        """بدء التتبع لأجهزة معروفة عند التشغيل حتى لو لم تتصل بعد"""
+        now = self._now()
+        with self._lock:
+            for device_id in device_ids:
+                if device_id not in self.last_seen:
+                    self.last_seen[device_id] = now
+                    self.wheel.schedule(device_id, now + self.timeout_ticks)
+
+    def touch(self, device_id):
+        """إشارة حياة من الجهاز؛ آمنة من أي خيط"""
+        now = self._now()
+        known = device_id in self.last_seen
+        self.last_seen[device_id] = now
+        if known and device_id not in self.offline:
+            return
+        with self._lock:
+            recovered = device_id in self.offline
+            self.offline.discard(device_id)
+            if device_id not in self.wheel:
+                self.wheel.schedule(device_id, now + self.timeout_ticks)
+        if recovered:
+            self._emit(device_id, ONLINE)
+
+    def _advance(self):
+        """تقديم العجلة حتى الوقت الحالي؛ ترجع الأجهزة التي انقطعت"""
+        target = self._now()
+        lost = []
+        with self._lock:
+            while self.wheel.now < target:
+                for device_id in self.wheel.advance():
+                    deadline = self.last_seen.get(device_id, 0) + self.timeout_ticks
+                    if deadline > self.wheel.now:
+                        self.wheel.schedule(device_id, deadline)
+                    else:
+                        self.offline.add(device_id)
+                        lost.append(device_id)
+        return lost
+
+    def _emit(self, device_id, state):
+        if state == OFFLINE:
+            reason, status = f"فقدان الاتصال: {device_id}", "نشط"
+        else:
+            reason, status = f"عودة الاتصال: {device_id}", "منتهي"
+        logging.warning(reason)
+        print(reason)
+        if self.writer:
+            self.writer.submit(INSERT_EMERGENCY, (
+                datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), reason, status, device_id))
+        if self.on_event:
+            try:
+                self.on_event(device_id, state)
+            except Exception as e:
+                error_msg = f"خطأ في معالج حدث الاتصال: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
 
-class EmergencyHandler(QThread):
-    def __init__(self, timeout):
-        super().__init__()
-        self.timeout = timeout
-        self.running = True
-    
     def run(self):
-        start_time = None
-        while self.running:
-            # فحص فقدان الاتصال
-            if self.connection_lost():
-                if not start_time:
-                    start_time = time.time()
-                
-                if time.time() - start_time >= self.timeout:
-                    self.activate_emergency()
-            
-            else:
-                start_time = None
-            time.sleep(1)
-    
-    def connection_lost(self):
-        # بديل: تنفيذ فحص فعلي للاتصال
-        return False
-    
-    def activate_emergency(self):
-        conn = sqlite3.connect("database/sifer_data.db")
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO emergency_trigger (timestamp, reason, status)
-            VALUES (?, ?, ?)
-        """, (datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "فقدان الاتصال", "نشط"))
-        conn.commit()
-        conn.close()
-        # بديل: تنفيذ منع الإغلاق وإرسال الموقع
-        print("تم تفعيل وضع الطوارئ")
\ No newline at end of file
+        while not self._stop.wait(self.tick):
+            for device_id in self._advance():
+                self._emit(device_id, OFFLINE)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="liveness", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        # انتظار الدورة الجارية حتى تصل انتقالاتها الأخيرة قبل إيقاف مستهلكيها
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def snapshot(self):
+        return {"tracked": len(self.last_seen), "offline": len(self.offline),
+                "scheduled": len(self.wheel)}
\ No newline at end of file
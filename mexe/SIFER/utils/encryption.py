@@ -1,13 +1,7 @@
-from cryptography.fernet import Fernet
+from utils.crypto_session import CipherSession, Keyring, MODE_FERNET
 
-class Encryption:
-    def __init__(self):
-        # استخدم المفتاح الذي قدمته
-        self.key = b'uJnmGjIDuQnR_GYZ5uFPGYW5xYAi-JpMO_gwoTqg0EM='
-        self.cipher = Fernet(self.key)
-    
-    def encrypt_data(self, data):
-        return self.cipher.encrypt(data.encode())
-    
-    def decrypt_data(self, encrypted_data):
-        return self.cipher.decrypt(encrypted_data).decode()
\ No newline at end of file
+class Encryption(CipherSession):
+    """جلسة Fernet بالمفتاح الافتراضي؛ يُفضل إنشاء CipherSession لكل اتصال"""
+
+    def __init__(self, keyring=None):
+        super().__init__(keyring or Keyring(), MODE_FERNET)
\ No newline at end of file
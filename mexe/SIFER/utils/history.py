@@ -0,0 +1,412 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from utils.db_writer import DB_PATH
+from utils.telemetry_store import MINUTE_MS, HOUR_MS, EVENT_TABLES, partition_root, partition_path
+
+DEFAULT_PAGE = 500
+MAX_PAGE = 5000
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+# اتصالات قراءة خاملة تبقى مفتوحة بين الطلبات (لكل الملفات معاً)
+MAX_IDLE_CONNECTIONS = 16
+
+# مستويات الدقة من الأخشن إلى الأدق: (الجدول، طول الفترة)
+ROLLUP_LEVELS = (("telemetry_1h", HOUR_MS), ("telemetry_1m", MINUTE_MS))
+
+# الأعمدة الموجودة في الفهرس المغطي؛ الأعمدة الأخرى تتطلب قراءة الصف نفسه
+SAMPLE_COLUMNS = ("id", "device_id", "ts_ms", "ram_used", "ram_percent", "conn_count")
+FULL_COLUMNS = SAMPLE_COLUMNS + ("ram_total", "network_connections")
+
+class QueryError(ValueError):
+    """معاملات استعلام غير صالحة"""
+
+def encode_cursor(*values):
+    return ".".join(str(value) for value in values)
+
+def decode_cursor(cursor, count):
+    try:
+        values = [int(value) for value in cursor.split(".")]
+    except ValueError:
+        raise QueryError(f"مؤشر صفحة غير صالح: {cursor!r}") from None
+    if len(values) != count:
+        raise QueryError(f"مؤشر صفحة غير صالح: {cursor!r}")
+    return values
+
+def _file_stamp(path):
+    # الكتابة في وضع WAL تغير ملف -wal قبل الملف الرئيسي
+    stamp = []
+    for name in (path, path + "-wal"):
+        try:
+            info = os.stat(name)
+            stamp.append((info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def _event_time(ms):
+    # جداول الأحداث تحفظ الوقت نصاً محلياً؛ المقارنة النصية تحفظ الترتيب الزمني
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ms / 1000))
+
+class History:
+    """واجهة قراءة فقط للبيانات التاريخية
+
+    الأحداث وسجل الأجهزة في قاعدة البيانات الرئيسية، والقياسات في ملف لكل جهاز.
+    خادم HTTP يشغل خيطاً لكل طلب، فالاتصالات تُستعار من مخزن مشترك وتُعاد إليه
+    بدل ربطها بالخيط؛ الزائد عن max_idle يُغلق."""
+
+    def __init__(self, db_path=DB_PATH, max_idle=MAX_IDLE_CONNECTIONS):
+        self.db_path = db_path
+        self.root = partition_root(db_path)
+        self.max_idle = max_idle
+        self._idle = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        # ملخص كل ملف جهاز مع بصمة الملف: يُعاد حسابه فقط إذا تغير الملف
+        self._summaries = {}
+
+    @contextmanager
+    def _connect(self, path=None):
+        path = path or self.db_path
+        with self._lock:
+            conns = self._idle.get(path)
+            conn = conns.pop() if conns else None
+            if conn is not None:
+                self._idle_count -= 1
+                if not conns:
+                    del self._idle[path]
+        if conn is None:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        self._release(path, conn)
+
+    def _release(self, path, conn):
+        closing = []
+        with self._lock:
+            self._idle.setdefault(path, []).append(conn)
+            self._idle.move_to_end(path)
+            self._idle_count += 1
+            # الأقدم استخداماً يُغلق أولاً
+            while self._idle_count > self.max_idle:
+                oldest, conns = next(iter(self._idle.items()))
+                closing.append(conns.pop(0))
+                self._idle_count -= 1
+                if not conns:
+                    del self._idle[oldest]
+        for conn in closing:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            conns = [conn for pooled in self._idle.values() for conn in pooled]
+            self._idle.clear()
+            self._idle_count = 0
+        for conn in conns:
+            conn.close()
+
+    def _partition(self, device_id):
+        """مسار ملف الجهاز أو None إذا لم تصل منه عينات بعد"""
+        if device_id is None:
+            raise QueryError("device مطلوب")
+        try:
+            path = partition_path(device_id, self.root)
+        except ValueError as e:
+            raise QueryError(str(e)) from None
+        if not os.path.exists(path):
+            return None
+        return path
+
+    def device_ids(self):
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT device_id FROM devices ORDER BY device_id")]
+
+    @staticmethod
+    def _range(start_ms, end_ms):
+        if end_ms is None:
+            end_ms = int(time.time() * 1000)
+        if start_ms is None:
+            start_ms = end_ms - HOUR_MS
+        if start_ms >= end_ms:
+            raise QueryError("بداية المدى يجب أن تسبق نهايته")
+        return start_ms, end_ms
+
+    def devices(self):
+        """سجل الأجهزة مع عدد العينات ووقت أول وآخر عينة لكل جهاز"""
+        with self._connect() as conn:
+            registry = conn.execute("""
+                SELECT device_id, first_seen_ms, last_connected_ms, last_address, connections
+                FROM devices ORDER BY device_id
+            """).fetchall()
+        result = []
+        for device_id, first_seen, last_connected, address, connections in registry:
+            entry = {"device_id": device_id, "first_seen_ms": first_seen,
+                     "last_connected_ms": last_connected, "last_address": address,
+                     "connections": connections}
+            entry.update(self._summary(device_id))
+            result.append(entry)
+        return result
+
+    def _summary(self, device_id):
+        path = self._partition(device_id)
+        if path is None:
+            return {"samples": 0, "first_ms": None, "last_ms": None}
+        stamp = _file_stamp(path)
+        with self._lock:
+            cached = self._summaries.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with self._connect(path) as conn:
+            summary = {
+                "samples": conn.execute("SELECT sum(samples) FROM telemetry_1h").fetchone()[0] or 0,
+                # min و max في استعلامين منفصلين ليقرأ كل منهما طرف الفهرس فقط
+                "first_ms": conn.execute("SELECT min(ts_ms) FROM telemetry").fetchone()[0],
+                "last_ms": conn.execute("SELECT max(ts_ms) FROM telemetry").fetchone()[0],
+            }
+        with self._lock:
+            self._summaries[path] = (stamp, summary)
+        return summary
+
+    def samples(self, device_id, start_ms=None, end_ms=None, limit=DEFAULT_PAGE,
+                cursor=None, with_network=False):
+        """صفحة من العينات الخام لجهاز بترتيب (ts_ms, id)؛ next يُمرر كـ cursor للصفحة التالية"""
+        path = self._partition(device_id)
+        start_ms, end_ms = self._range(start_ms, end_ms)
+        limit = max(1, min(int(limit), MAX_PAGE))
+        columns = FULL_COLUMNS if with_network else SAMPLE_COLUMNS
+        if path is None:
+            return {"rows": [], "next": None}
+        # شرط device_id يبقي الاستعلام على الفهرس المغطي داخل ملف الجهاز
+        where = ["device_id = ?", "ts_ms >= ?", "ts_ms < ?"]
+        params = [device_id, start_ms, end_ms]
+        if cursor:
+            # keyset: البحث في الفهرس يبدأ من آخر صف بدل OFFSET الذي يعيد مسح ما سبق
+            last_ts, last_id = decode_cursor(cursor, 2)
+            params[1] = max(start_ms, last_ts)
+            where.append("(ts_ms > ? OR id > ?)")
+            params += [last_ts, last_id]
+        with self._connect(path) as conn:
+            rows = conn.execute(f"""
+                SELECT {", ".join(columns)} FROM telemetry
+                WHERE {" AND ".join(where)}
+                ORDER BY ts_ms, id LIMIT ?
+            """, params + [limit + 1]).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+        return {"rows": [dict(zip(columns, row)) for row in rows], "next": next_cursor}
+
+    def iter_samples(self, device_id, start_ms=None, end_ms=None, with_network=False,
+                     page=MAX_PAGE):
+        """كل العينات في المدى صفاً صفاً؛ كل صفحة استعلام قصير فلا تبقى معاملة قراءة مفتوحة"""
+        start_ms, end_ms = self._range(start_ms, end_ms)
+        cursor = None
+        while True:
+            result = self.samples(device_id, start_ms, end_ms, page, cursor, with_network)
+            yield from result["rows"]
+            cursor = result["next"]
+            if cursor is None:
+                return
+
+    def aggregate(self, device_id=None, start_ms=None, end_ms=None, points=DEFAULT_POINTS):
+        """min/max/avg لنسبة RAM على فترات متساوية؛ يختار أخشن جدول تجميع يناسب طول الفترة
+
+        بدون device تُدمج نتائج كل الأجهزة. الفترة الأولى قد تشمل بيانات قبل start_ms
+        لأنها تُحاذى على حدود جدول التجميع."""
+        start_ms, end_ms = self._range(start_ms, end_ms)
+        points = max(1, min(int(points), MAX_POINTS))
+        bucket = max(1, math.ceil((end_ms - start_ms) / points))
+        for table, period in ROLLUP_LEVELS:
+            if bucket >= period:
+                bucket = math.ceil(bucket / period) * period
+                params = [start_ms - start_ms % period, end_ms]
+                sql = f"""
+                    SELECT (bucket_ms / {bucket}) * {bucket} AS bucket, sum(samples),
+                           min(ram_percent_min), max(ram_percent_max), sum(ram_percent_sum)
+                    FROM {table} WHERE device_id = ? AND bucket_ms >= ? AND bucket_ms < ?
+                    GROUP BY bucket
+                """
+                break
+        else:
+            # مدى قصير: التجميع مباشرة من الجدول الخام
+            table = "telemetry"
+            params = [start_ms, end_ms]
+            sql = f"""
+                SELECT (ts_ms / {bucket}) * {bucket} AS bucket, count(*),
+                       min(ram_percent), max(ram_percent), sum(ram_percent)
+                FROM telemetry WHERE device_id = ? AND ts_ms >= ? AND ts_ms < ?
+                GROUP BY bucket
+            """
+        merged = {}
+        for device in ([device_id] if device_id is not None else self.device_ids()):
+            path = self._partition(device)
+            if path is None:
+                continue
+            with self._connect(path) as conn:
+                rows = conn.execute(sql, [device] + params).fetchall()
+            for ts, samples, low, high, total in rows:
+                current = merged.get(ts)
+                if current is None:
+                    merged[ts] = [samples, low, high, total]
+                else:
+                    current[0] += samples
+                    current[1] = min(current[1], low)
+                    current[2] = max(current[2], high)
+                    current[3] += total
+        return {
+            "level": table,
+            "bucket_ms": bucket,
+            "rows": [{"bucket_ms": ts, "samples": samples, "ram_percent_min": low,
+                      "ram_percent_max": high, "ram_percent_avg": total / samples}
+                     for ts, (samples, low, high, total) in sorted(merged.items())],
+        }
+
+    def export(self, device_id, dest_path):
+        """نسخة متسقة من ملف جهاز واحد (SQLite backup) دون إيقاف الكتابة"""
+        path = self._partition(device_id)
+        if path is None:
+            raise QueryError(f"لا توجد بيانات للجهاز: {device_id}")
+        dest = sqlite3.connect(dest_path)
+        try:
+            with self._connect(path) as conn:
+                conn.backup(dest)
+        finally:
+            dest.close()
+
+    def events(self, table, start_ms=None, end_ms=None, limit=DEFAULT_PAGE, cursor=None):
+        """صفحة من جدول أحداث (network_status, permissions_log, ...) بترتيب id"""
+        if table not in EVENT_TABLES:
+            raise QueryError(f"جدول غير معروف: {table}")
+        start_ms, end_ms = self._range(start_ms, end_ms)
+        limit = max(1, min(int(limit), MAX_PAGE))
+        where = ["timestamp >= ?", "timestamp < ?"]
+        params = [_event_time(start_ms), _event_time(end_ms)]
+        if cursor:
+            where.append("id > ?")
+            params += decode_cursor(cursor, 1)
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                            (table,)).fetchone() is None:
+                raise QueryError(f"الجدول غير موجود في قاعدة البيانات: {table}")
+            result = conn.execute(f"""
+                SELECT * FROM {table} WHERE {" AND ".join(where)} ORDER BY id LIMIT ?
+            """, params + [limit + 1])
+            columns = [column[0] for column in result.description]
+            rows = result.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0])
+        return {"rows": [dict(zip(columns, row)) for row in rows], "next": next_cursor}
+
+def _int_param(params, name, default=None):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"{name}: يجب أن يكون عدداً صحيحاً") from None
+
+class _Handler(BaseHTTPRequestHandler):
+    """GET فقط؛ الأوقات بالمللي ثانية منذ epoch في from/to"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        history = self.server.history
+        try:
+            device_id = params.get("device")
+            start_ms = _int_param(params, "from")
+            end_ms = _int_param(params, "to")
+            if url.path == "/devices":
+                self._send_json(history.devices())
+            elif url.path == "/telemetry":
+                self._send_json(history.samples(
+                    device_id, start_ms, end_ms, _int_param(params, "limit", DEFAULT_PAGE),
+                    params.get("cursor"), params.get("network") == "1"))
+            elif url.path == "/telemetry/aggregate":
+                self._send_json(history.aggregate(
+                    device_id, start_ms, end_ms, _int_param(params, "points", DEFAULT_POINTS)))
+            elif url.path == "/telemetry/stream":
+                rows = history.iter_samples(device_id, start_ms, end_ms,
+                                            params.get("network") == "1")
+                self._send_stream(rows)
+            elif url.path.startswith("/events/"):
+                self._send_json(history.events(
+                    url.path[len("/events/"):], start_ms, end_ms,
+                    _int_param(params, "limit", DEFAULT_PAGE), params.get("cursor")))
+            else:
+                self._send_json({"error": "مسار غير معروف"}, 404)
+        except QueryError as e:
+            self._send_json({"error": str(e)}, 400)
+        except Exception as e:
+            error_msg = f"خطأ في استعلام البيانات التاريخية: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+            self._send_json({"error": error_msg}, 500)
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, rows):
+        # JSON سطر لكل صف؛ بدون Content-Length فنهاية الاستجابة هي إغلاق الاتصال
+        first = next(rows, None)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        if first is None:
+            return
+        lines = [json.dumps(first, ensure_ascii=False)]
+        for row in rows:
+            lines.append(json.dumps(row, ensure_ascii=False))
+            if len(lines) >= 1000:
+                self.wfile.write(("\n".join(lines) + "\n").encode())
+                lines = []
+        if lines:
+            self.wfile.write(("\n".join(lines) + "\n").encode())
+
+    def log_message(self, format, *args):
+        logging.debug("history %s - %s", self.address_string(), format % args)
+
+class HistoryServer:
+    """خادم HTTP/JSON محلي فوق History؛ يعمل في خيط خاص به"""
+
+    def __init__(self, history, host="127.0.0.1", port=8765):
+        self.history = history
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.history = self.history
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logging.info(f"خادم الاستعلامات على http://{self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        self.history.close()
\ No newline at end of file
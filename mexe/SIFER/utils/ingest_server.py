@@ -0,0 +1,175 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import websockets
+from utils.pipeline import IngestPipeline
+
+class Connection:
+    """حالة اتصال جهاز واحد داخل خط المعالجة (جلسة التشفير، مفكك الترميز...)"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.remote_address = websocket.remote_address
+        self.device_id = None
+        # آخر إشارة حياة أُبلغ عنها (monotonic)؛ لتقليل الإبلاغ مع كل رسالة
+        self.alive_at = 0.0
+        self.cipher = None
+        self.decoder = None
+        # utils.sessions.Session عند دعم الاستئناف
+        self.session = None
+        # آخر قائمة اتصالات وتمثيلها JSON؛ المفكك يعيد نفس الكائن إذا لم تتغير
+        self.network = None
+        self.network_json = None
+
+    async def send(self, data):
+        try:
+            await self.websocket.send(data)
+        except websockets.ConnectionClosed:
+            pass
+
+class IngestServer:
+    """خادم استقبال غير متزامن: حلقة أحداث واحدة لكل الأجهزة المتصلة"""
+
+    def __init__(self, on_connect, decrypt, decode, persist, host="0.0.0.0", port=12345,
+                 workers=4, on_log=None, max_size=2 ** 20, max_queue=16, subprotocols=None,
+                 extra_headers=None, pipeline_options=None, metrics_interval=60, reuse_port=False,
+                 on_alive=None, alive_interval=1.0, ping_interval=20, ping_timeout=20):
+        # on_connect(conn) : يُستدعى مرة لكل اتصال لبناء حالته، ويرجع رسالة أولى اختيارية للعميل
+        # decrypt و decode و persist مراحل خط المعالجة وتعمل داخل المنفذ (executor)
+        self.on_connect = on_connect
+        self.stage_funcs = (decrypt, decode, persist)
+        self.pipeline_options = pipeline_options or {}
+        self.pipeline = None
+        self.metrics_interval = metrics_interval
+        self.subprotocols = subprotocols
+        self.extra_headers = extra_headers
+        # SO_REUSEPORT: عدة عمليات تستمع على نفس المنفذ والنواة توزع الاتصالات بينها
+        self.reuse_port = reuse_port
+        # on_alive(conn) : إشارة حياة من رسالة أو pong، بحد أقصى مرة كل alive_interval ثانية
+        self.on_alive = on_alive
+        self.alive_interval = alive_interval
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.on_log = on_log
+        self.max_size = max_size
+        self.max_queue = max_queue
+        self.executor = None
+        self.loop = None
+        self.clients = set()
+        self._stop = None
+        self._stopped = threading.Event()
+
+    def log(self, message):
+        logging.info(message)
+        print(message)
+        if self.on_log:
+            self.on_log(message)
+
+    def alive(self, conn):
+        now = time.monotonic()
+        if self.on_alive and now - conn.alive_at >= self.alive_interval:
+            conn.alive_at = now
+            self.on_alive(conn)
+
+    async def keepalive(self, conn):
+        """ping دوري؛ كل pong إشارة حياة للجهاز حتى إن لم يرسل بيانات"""
+        websocket = conn.websocket
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                pong = await websocket.ping()
+                await asyncio.wait_for(pong, self.ping_timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"انتهت مهلة ping للجهاز {conn.device_id} {conn.remote_address}")
+                await websocket.close(1011, "ping timeout")
+                return
+            except websockets.ConnectionClosed:
+                return
+            self.alive(conn)
+
+    async def handle_connection(self, websocket, path=None):
+        """التعامل مع اتصال جهاز واحد"""
+        self.clients.add(websocket)
+        conn = Connection(websocket)
+        pinger = None
+        try:
+            greeting = self.on_connect(conn)
+            if greeting is not None:
+                await conn.send(greeting)
+            self.alive(conn)
+            if self.ping_interval:
+                pinger = asyncio.create_task(self.keepalive(conn))
+            async for message in websocket:
+                self.alive(conn)
+                # عند امتلاء طابور فك التشفير ننتظر هنا فيتوقف سحب الرسائل
+                # ويمتلئ max_queue ثم نافذة TCP فيبطئ العميل نفسه
+                await self.pipeline.receive(conn, message)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            error_msg = f"خطأ في الاتصال {websocket.remote_address}: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+        finally:
+            if pinger:
+                pinger.cancel()
+            self.clients.discard(websocket)
+            self.pipeline.disconnected(conn)
+
+    async def report_metrics(self):
+        """تسجيل عمق الطوابير والإسقاط دورياً"""
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            logging.info(f"مقاييس خط الاستقبال: اتصالات={len(self.clients)} {self.pipeline.metrics()}")
+
+    async def serve(self):
+        """تشغيل الخادم حتى يُطلب الإيقاف"""
+        self._stop = asyncio.Event()
+        self.pipeline = IngestPipeline(*self.stage_funcs, self.executor, **self.pipeline_options)
+        self.pipeline.start()
+        reporter = asyncio.create_task(self.report_metrics())
+        async with websockets.serve(self.handle_connection, self.host, self.port,
+                                    max_size=self.max_size, max_queue=self.max_queue,
+                                    subprotocols=self.subprotocols,
+                                    extra_headers=self.extra_headers,
+                                    reuse_port=self.reuse_port,
+                                    # ping يُدار في keepalive ليصل pong إلى متتبع الاتصال
+                                    ping_interval=None):
+            self.log(f"بدء خادم WebSocket على {self.host}:{self.port}")
+            await self._stop.wait()
+        # المنفذ مغلق الآن؛ ما دخل خط المعالجة يُكمل طريقه إلى الكاتب
+        await self.pipeline.drain()
+        reporter.cancel()
+        self.pipeline.stop()
+
+    def run_forever(self):
+        """تشغيل حلقة الأحداث في الخيط الحالي"""
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.serve())
+        finally:
+            self.executor.shutdown(wait=False)
+            self.loop.close()
+            self._stopped.set()
+
+    def start(self):
+        """تشغيل الخادم في خيط خلفي"""
+        thread = threading.Thread(target=self.run_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def metrics(self):
+        return self.pipeline.metrics() if self.pipeline else {}
+
+    def stop(self, timeout=15):
+        """إيقاف الاستقبال وانتظار تفريغ خط المعالجة؛ قبل إيقاف الكتّاب"""
+        if self.loop and self._stop:
+            self.loop.call_soon_threadsafe(self._stop.set)
+            self._stopped.wait(timeout)
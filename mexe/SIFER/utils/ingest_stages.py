@@ -0,0 +1,150 @@
+import logging
+from utils.crypto_session import CipherSession, SUBPROTOCOLS
+from utils.pipeline import PRIORITY_LOW, PRIORITY_ALERT, PRIORITY_ACKED
+from utils import devices, rules, telemetry, telemetry_store, wire
+from utils.logging_setup import sampled_logger
+
+# سجلات المسار الساخن تمر عبر مرشح عينات (انظر utils.logging_setup)
+raw_log = sampled_logger("sifer.raw")
+decoded_log = sampled_logger("sifer.decoded")
+
+def make_stages(keyring, persist, log, register, engine=None, sessions=None, policies=None):
+    """بناء مراحل الاستقبال (on_connect, decrypt, decode, persist)
+
+    تُستخدم كما هي في العملية الرئيسية وفي عمليات الاستقبال الفرعية؛
+    persist يستقبل دفعة أحداث (صفوف telemetry_store و rules.RuleEvent) و log يوصل
+    الرسائل للطرفية و register(device_id, address) يسجل الجهاز عند الاتصال.
+    engine محرك القواعد الذي يقيّم كل عينة داخل مرحلة فك الترميز، و sessions
+    (utils.sessions.SessionCache) يستعيد حالة الجهاز عند إعادة اتصاله.
+    policies سياسات أخذ العينات لكل جهاز (انظر sampling_policy)."""
+
+    def on_connect(conn):
+        """تحديد الجهاز وبناء جلسة التشفير وحالة فك الترميز مرة واحدة لكل اتصال
+
+        ترجع إطار سياسة أخذ العينات مشفراً للعملاء الذين يعلنون دعمه، وإلا None"""
+        conn.device_id = devices.resolve_device_id(
+            conn.websocket.request_headers.get(wire.DEVICE_HEADER), conn.remote_address)
+        conn.decoder = telemetry.new_wire_decoder()
+        conn.session, resume = sessions.attach(conn) if sessions else (None, None)
+        session = conn.session
+        if resume is not None and session.cipher and session.cipher.mode == conn.websocket.subprotocol:
+            # نفس الخوارزمية والمفاتيح المشتقة؛ لا حاجة لبنائها من جديد
+            conn.cipher = session.cipher
+        else:
+            conn.cipher = CipherSession(keyring, conn.websocket.subprotocol)
+        if session is not None:
+            session.cipher = conn.cipher
+        register(conn.device_id, conn.remote_address)
+        if resume is not None:
+            acked, strings = resume
+            conn.decoder.resume(strings)
+            log(f"استئناف جلسة {conn.device_id} {conn.remote_address} بعد #{acked} ({conn.cipher.mode})")
+        else:
+            log(f"اتصال جديد من {conn.device_id} {conn.remote_address} ({conn.cipher.mode})")
+        if conn.websocket.request_headers.get(wire.SAMPLING_HEADER) == wire.SAMPLING_ADAPTIVE:
+            # يُرسل دائماً حتى يعود الجهاز لإعداداته إذا أُزيلت سياسته
+            return conn.cipher.encrypt_bytes(
+                wire.encode_policy(*sampling_policy(policies, conn.device_id)))
+        return None
+
+    def decrypt(conn, message):
+        """مرحلة فك التشفير"""
+        try:
+            raw_log.info("البيانات الخام", peer=conn.remote_address, size=len(message),
+                         head=message[:48])
+            return conn.cipher.decrypt_bytes(message)
+        except Exception as e:
+            error_msg = f"خطأ في فك التشفير: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+            log(error_msg)
+            return None
+
+    def decode(conn, decrypted):
+        """مرحلة فك الترميز: ترجع (الأحداث، الرد على العميل)"""
+        try:
+            samples, last_seq = telemetry.decode_message(decrypted, conn.decoder)
+        except telemetry.TelemetryError as e:
+            error_msg = f"إطار بيانات مرفوض: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+            log(error_msg)
+            if wire.frame_kind(decrypted) == wire.FRAME_BATCH:
+                # بدون تأكيد: العميل يعيد إرسال الدفعة بعد انتهاء المهلة
+                return [], None
+            return [], conn.cipher.encrypt_data("تم الاستلام")
+
+        device_id = conn.device_id
+        # صفوف الدفعات المرقمة يغطيها التأكيد فلا يجوز تقليلها تحت الضغط
+        priority = PRIORITY_LOW if last_seq is None else PRIORITY_ACKED
+        events = []
+        for sample in samples:
+            if sample.network is not conn.network:
+                # المفكك يعيد نفس القائمة إذا لم تتغير الاتصالات؛ JSON يُبنى مرة لكل تغيير
+                conn.network = sample.network
+                conn.network_json = telemetry.network_json(sample)
+            events.append((priority, telemetry_store.sample_row(device_id, sample, conn.network_json)))
+            if engine is not None:
+                for event in engine.evaluate(device_id, sample):
+                    events.append((PRIORITY_ALERT, event))
+        if samples:
+            decoded_log.info("فك التشفير", peer=conn.remote_address, count=len(samples),
+                             last=samples[-1]._asdict())
+            last = samples[-1]
+            log(f"بيانات من العميل ({len(samples)} عينة): RAM {last.ram_used}/{last.ram_total} "
+                f"({last.ram_percent}%)، اتصالات {len(last.network)}")
+        if last_seq is not None:
+            if sessions:
+                sessions.checkpoint(conn, last_seq, conn.decoder.strings)
+            # تأكيد تراكمي واحد للدفعة بدل رد لكل عينة
+            return events, conn.cipher.encrypt_bytes(wire.encode_ack(last_seq))
+        return events, conn.cipher.encrypt_data("تم الاستلام")
+
+    return on_connect, decrypt, decode, persist
+
+def sampling_policy(policies, device_id):
+    """(الأدنى، الأقصى) بالثواني من sampling_policies في الإعدادات
+
+    {"device-id": {"min_interval": 0.5, "max_interval": 2}, "*": {...}}؛ "*" لكل
+    الأجهزة الأخرى، وبدون سياسة (0, 0) فيعمل العميل بإعداداته."""
+    policies = policies or {}
+    policy = policies.get(device_id) or policies.get("*")
+    if not policy:
+        return 0, 0
+    return policy.get("min_interval", 0), policy.get("max_interval", 0)
+
+def make_persist(store, on_alerts, detector=None):
+    """مرحلة التخزين في العملية الرئيسية: العينات لملفات الأجهزة والإنذارات لـ on_alerts
+
+    detector (utils.anomaly.AnomalyDetector) يرى دفعات كل الأجهزة معاً ويضيف
+    أحداث الشذوذ إلى الإنذارات."""
+
+    def persist(events):
+        rows = []
+        alerts = []
+        for event in events:
+            (alerts if type(event) is rules.RuleEvent else rows).append(event)
+        if rows:
+            store.write(rows)
+            if detector is not None:
+                alerts += detector.observe(rows)
+        if alerts:
+            on_alerts(alerts)
+
+    return persist
+
+def server_options(config, sessions=None):
+    """خيارات IngestServer المشتركة بين الوضع الأحادي وعمليات الاستقبال"""
+    return {
+        "host": "0.0.0.0",
+        "port": config.get("ingest_port", 12345),
+        "workers": config.get("ingest_workers", 4),
+        "subprotocols": SUBPROTOCOLS,
+        # مع الجلسات تُبنى الترويسات لكل اتصال (رمز الجلسة وآخر تسلسل مؤكد)
+        "extra_headers": sessions.handshake if sessions else {wire.WIRE_HEADER: wire.WIRE_VERSION},
+        "pipeline_options": {
+            "shards": config.get("ingest_workers", 4),
+            "queue_size": config.get("ingest_queue_size", 256),
+            "persist_queue_size": config.get("persist_queue_size", 10000),
+        },
+    }
\ No newline at end of file
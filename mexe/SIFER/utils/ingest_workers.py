@@ -0,0 +1,226 @@
+import os
+import time
+import queue
+import socket
+import logging
+import threading
+import multiprocessing
+from logging.handlers import QueueHandler
+from utils.crypto_session import Keyring
+from utils.rules import RULES_PATH, load_engine
+from utils.ingest_server import IngestServer
+from utils.sessions import SessionCache
+from utils.ingest_stages import make_stages, server_options
+from utils.logging_setup import setup_worker_logging
+
+# رسائل قناة IPC من عمليات الاستقبال إلى العملية الرئيسية
+MSG_ROWS = "rows"        # دفعة صفوف telemetry_store وأحداث القواعد للكاتب الوحيد
+MSG_LOG = "log"          # رسالة للطرفية
+MSG_RECORD = "record"    # سجل logging يكتبه ملف السجل في العملية الرئيسية
+MSG_DEVICE = "device"    # (device_id, address) لسجل الأجهزة عند كل اتصال
+MSG_ALIVE = "alive"      # device_id: إشارة حياة لمتتبع الاتصال
+
+def reuse_port_supported():
+    """SO_REUSEPORT غير متوفر على Windows؛ هناك يبقى الاستقبال في عملية واحدة"""
+    return os.name != "nt" and hasattr(socket, "SO_REUSEPORT")
+
+def process_count(config):
+    """ingest_processes من الإعدادات؛ 0 تعني عدد الأنوية
+
+    استئناف الجلسات يتطلب عملية واحدة (الافتراضي): جلسات SessionCache لا تُشارك بين
+    العمليات والنواة توزع إعادة الاتصال على أي منها."""
+    count = int(config.get("ingest_processes", 1))
+    return count if count > 0 else (os.cpu_count() or 1)
+
+class _ChannelLogHandler(QueueHandler):
+    """لا يحجب العملية الفرعية: عند امتلاء القناة يُسقط السجل"""
+
+    def prepare(self, record):
+        # نسخة بالحقول الأساسية فقط؛ بعض المكتبات تضيف كائنات غير قابلة للتسلسل عبر extra
+        record = super().prepare(record)
+        return logging.makeLogRecord({
+            "name": record.name,
+            "levelno": record.levelno,
+            "levelname": record.levelname,
+            "msg": record.msg,
+            "created": record.created,
+            "process": record.process,
+            "fields": getattr(record, "fields", None),
+        })
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait((MSG_RECORD, record))
+        except queue.Full:
+            pass
+
+def _worker_main(index, config, channel, stop_event, rows_sent):
+    """نقطة دخول عملية الاستقبال: نفس مراحل الوضع الأحادي لكن التخزين عبر القناة"""
+    setup_worker_logging(config, _ChannelLogHandler(channel))
+
+    def persist(rows):
+        # put الحاجب هنا يعيد الضغط إلى طوابير العملية ثم إلى العميل عبر TCP
+        channel.put((MSG_ROWS, rows))
+        with rows_sent.get_lock():
+            rows_sent.value += len(rows)
+
+    def log(message):
+        try:
+            channel.put_nowait((MSG_LOG, f"[ingest-{index}] {message}"))
+        except queue.Full:
+            pass
+
+    def register(device_id, address):
+        channel.put((MSG_DEVICE, (device_id, address)))
+
+    def alive(conn):
+        try:
+            channel.put_nowait((MSG_ALIVE, conn.device_id))
+        except queue.Full:
+            pass
+
+    engine = load_engine(config.get("rules_file", RULES_PATH))
+    sessions = SessionCache(ttl=config.get("session_ttl", 600))
+    stages = make_stages(Keyring.from_config(config), persist, log, register, engine, sessions,
+                         config.get("sampling_policies"))
+    server = IngestServer(*stages, on_log=log, on_alive=alive, reuse_port=True,
+                          **server_options(config, sessions))
+
+    def wait_for_stop():
+        stop_event.wait()
+        server.stop()
+
+    threading.Thread(target=wait_for_stop, daemon=True).start()
+    try:
+        server.run_forever()
+    except Exception as e:
+        error_msg = f"خطأ في عملية الاستقبال {index}: {str(e)}"
+        logging.error(error_msg)
+        print(error_msg)
+
+class IngestWorkerPool:
+    """عمليات استقبال تتشارك المنفذ عبر SO_REUSEPORT
+
+    فك التشفير والترميز يتوزع على الأنوية، بينما يبقى الكاتب الوحيد لقاعدة البيانات
+    والطرفية في العملية الرئيسية وتصلهما الصفوف والرسائل عبر قناة واحدة."""
+
+    def __init__(self, config, persist, register, touch=None, on_log=None, processes=4,
+                 channel_size=1024, check_interval=1.0):
+        # spawn بدل fork: العملية الرئيسية تحمل خيوط Qt والكاتب ولا يصح نسخها
+        self.ctx = multiprocessing.get_context("spawn")
+        self.config = config
+        self.persist = persist
+        self.register = register
+        self.touch = touch
+        self.on_log = on_log
+        self.processes = processes
+        self.check_interval = check_interval
+        self.channel = self.ctx.Queue(channel_size)
+        self.stop_event = self.ctx.Event()
+        # صفوف دفعتها كل العمليات إلى القناة؛ الفرق عن rows_received عند الإيقاف هو المفقود
+        self.rows_sent = self.ctx.Value("q", 0)
+        self.workers = []
+        self.running = False
+        self._drained = threading.Event()
+        # عدادات لتحديد حجم الخادم
+        self.rows_received = 0
+        self.restarts = 0
+
+    def log(self, message):
+        logging.info(message)
+        print(message)
+        if self.on_log:
+            self.on_log(message)
+
+    def _spawn(self, index):
+        worker = self.ctx.Process(target=_worker_main, name=f"sifer-ingest-{index}",
+                                  args=(index, self.config, self.channel, self.stop_event,
+                                        self.rows_sent),
+                                  daemon=True)
+        worker.start()
+        return worker
+
+    def start(self):
+        self.running = True
+        self.workers = [self._spawn(index) for index in range(self.processes)]
+        self.log(f"بدء {self.processes} عمليات استقبال على المنفذ المشترك "
+                 "(استئناف الجلسات يعمل فقط داخل نفس العملية)")
+        return self
+
+    def _check_workers(self):
+        """إعادة تشغيل أي عملية توقفت بشكل غير متوقع"""
+        for index, worker in enumerate(self.workers):
+            if not worker.is_alive() and self.running:
+                self.restarts += 1
+                self.log(f"عملية الاستقبال {index} توقفت (الرمز {worker.exitcode})، إعادة التشغيل")
+                self.workers[index] = self._spawn(index)
+
+    def drain(self):
+        """تفريغ القناة في الخيط الحالي حتى الإيقاف"""
+        self._drained.clear()
+        try:
+            while self.running:
+                if not self._receive(self.check_interval):
+                    self._check_workers()
+        finally:
+            self._drained.set()
+
+    def _receive(self, timeout):
+        """رسالة واحدة من القناة إن وصلت خلال timeout"""
+        try:
+            kind, payload = self.channel.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        self._handle(kind, payload)
+        return True
+
+    def _handle(self, kind, payload):
+        try:
+            if kind == MSG_ROWS:
+                self.rows_received += len(payload)
+                self.persist(payload)
+            elif kind == MSG_ALIVE:
+                if self.touch:
+                    self.touch(payload)
+            elif kind == MSG_DEVICE:
+                self.register(*payload)
+            elif kind == MSG_LOG:
+                if self.on_log:
+                    self.on_log(payload)
+            elif kind == MSG_RECORD:
+                logging.getLogger(payload.name).handle(payload)
+        except Exception as e:
+            error_msg = f"خطأ في معالجة رسالة من عمليات الاستقبال: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+
+    def run_forever(self):
+        self.start()
+        self.drain()
+
+    def stop(self, timeout=20):
+        """إيقاف العمليات مع الاستمرار في تفريغ القناة؛ يُستدعى قبل إيقاف الكتّاب
+
+        العملية لا تخرج قبل أن تدفع ما في خط معالجتها ومخزن قناتها، والقناة محدودة،
+        فالقراءة يجب أن تستمر حتى تخرج كلها. الإنهاء القسري آخر حل فقط."""
+        self.running = False
+        self.stop_event.set()
+        # خيط drain يتوقف عن إعادة تشغيل العمليات ونكمل القراءة هنا
+        self._drained.wait(self.check_interval + 1)
+        deadline = time.monotonic() + timeout
+        while any(worker.is_alive() for worker in self.workers) and time.monotonic() < deadline:
+            self._receive(0.1)
+        terminated = 0
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.terminate()
+                terminated += 1
+            worker.join(1)
+        while self._receive(0.1):
+            pass
+        lost = self.rows_sent.value - self.rows_received
+        if terminated or lost:
+            error_msg = (f"إيقاف عمليات الاستقبال: أُنهيت {terminated} عملية قسرياً وفُقد {lost} صف "
+                         "في القناة (وما بقي في خطوط معالجتها)")
+            logging.error(error_msg)
+            print(error_msg)
\ No newline at end of file
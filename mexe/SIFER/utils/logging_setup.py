@@ -0,0 +1,113 @@
+import json
+import queue
+import logging
+import itertools
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+DEFAULTS = {
+    "file": "server.log",
+    "level": "INFO",
+    "rotate": "size",           # size أو time
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "when": "midnight",
+    "queue_size": 10000,
+    # اسم السجل: سطر واحد من كل N
+    "sampling": {"sifer.raw": 1000, "sifer.decoded": 100},
+}
+
+class JsonFormatter(logging.Formatter):
+    """سطر JSON لكل سجل؛ الحقول الإضافية تُمرر عبر extra={"fields": {...}}"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SampledLogger:
+    """يقرر العينة قبل إنشاء LogRecord لأن إنشاء السجل نفسه هو الكلفة الكبرى"""
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+        self.rate = 1
+        self._counter = itertools.count()
+
+    def info(self, msg, **fields):
+        if next(self._counter) % self.rate:
+            return
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(msg, extra={"fields": fields})
+
+_sampled_loggers = {}
+
+def sampled_logger(name):
+    """سجل بمعدل عينات يُضبط من settings.json عبر setup_logging"""
+    logger = _sampled_loggers.get(name)
+    if logger is None:
+        logger = _sampled_loggers.setdefault(name, SampledLogger(name))
+    return logger
+
+class DroppingQueueHandler(QueueHandler):
+    """لا يحجب خيط الاستقبال أبداً: عند امتلاء الطابور يُسقط السجل ويُعد"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _file_handler(options):
+    if options["rotate"] == "time":
+        return TimedRotatingFileHandler(options["file"], when=options["when"],
+                                        backupCount=options["backup_count"], encoding="utf-8")
+    return RotatingFileHandler(options["file"], maxBytes=options["max_bytes"],
+                               backupCount=options["backup_count"], encoding="utf-8")
+
+def _options(config):
+    options = dict(DEFAULTS)
+    options.update((config or {}).get("logging", {}))
+    return options
+
+def _install(handler, options):
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(options["level"])
+
+    for name, rate in options["sampling"].items():
+        sampled_logger(name).rate = max(1, int(rate))
+
+def setup_logging(config=None):
+    """تهيئة السجل: الخيوط تضع السجلات في طابور وخيط واحد يكتبها إلى الملف
+
+    ترجع QueueListener ويجب إيقافه عند الخروج لتفريغ ما تبقى."""
+    options = _options(config)
+
+    log_queue = queue.Queue(options["queue_size"])
+    handler = _file_handler(options)
+    handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+
+    _install(DroppingQueueHandler(log_queue), options)
+
+    listener.start()
+    return listener
+
+def setup_worker_logging(config, handler):
+    """تهيئة السجل في عملية فرعية: السجلات تُرسل عبر handler إلى العملية الرئيسية
+    التي تملك ملف السجل وحدها"""
+    _install(handler, _options(config))
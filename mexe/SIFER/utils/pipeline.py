@@ -0,0 +1,174 @@
+import asyncio
+import logging
+
+# سياسات الامتلاء لكل مرحلة
+BLOCK = "block"            # انتظار مكان فارغ: يبطئ القراءة حتى يصل الضغط إلى العميل عبر TCP
+SHED = "shed"              # تقليل العينات منخفضة الأولوية ثم إسقاطها عند الامتلاء
+
+PRIORITY_LOW = 0           # قياسات دورية يمكن تقليلها (JSON بلا تسلسل ولا تأكيد)
+PRIORITY_ALERT = 1         # أحداث إنذار لا تُسقط أبداً
+PRIORITY_ACKED = 2         # صفوف دفعة مرقمة يغطيها تأكيد؛ العميل يحذفها بعده فلا تُسقط
+
+class Stage:
+    """مرحلة معالجة بطوابير محدودة؛ التقسيم (shards) يحفظ ترتيب رسائل كل اتصال"""
+
+    def __init__(self, name, func, executor, maxsize=256, shards=1, batch=1, policy=BLOCK,
+                 downsample_at=0.75, downsample_every=4, on_result=None):
+        self.name = name
+        self.func = func
+        self.executor = executor
+        self.maxsize = maxsize
+        self.shards = shards
+        self.batch = batch
+        self.policy = policy
+        self.downsample_at = int(maxsize * downsample_at)
+        self.downsample_every = downsample_every
+        self.on_result = on_result
+        self.queues = []
+        self.tasks = []
+        self._sample_counters = {}
+        # عدادات لتحديد حجم الخادم
+        self.processed = 0
+        self.dropped = 0
+        self.downsampled = 0
+        self.max_depth = 0
+        self.errors = 0
+        # عناصر أُخذت من الطابور ولم تنته معالجتها بعد
+        self.active = 0
+
+    def start(self):
+        self.queues = [asyncio.Queue(self.maxsize) for _ in range(self.shards)]
+        self.tasks = [asyncio.create_task(self._consume(queue), name=f"{self.name}-{i}")
+                      for i, queue in enumerate(self.queues)]
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def _queue_for(self, key):
+        return self.queues[hash(key) % self.shards]
+
+    async def put(self, item, key=0, priority=PRIORITY_LOW):
+        """إضافة عنصر؛ ترجع False إذا أُسقط بسبب الحمل"""
+        queue = self._queue_for(key)
+        depth = queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.policy == SHED and priority == PRIORITY_LOW:
+            if queue.full():
+                self.dropped += 1
+                return False
+            if depth >= self.downsample_at:
+                # تحت الضغط: الاحتفاظ بعينة واحدة من كل downsample_every لكل جهاز
+                count = self._sample_counters.get(key, 0) + 1
+                self._sample_counters[key] = count
+                if count % self.downsample_every:
+                    self.downsampled += 1
+                    return False
+            queue.put_nowait(item)
+            return True
+        # BLOCK أو حدث إنذار: الانتظار حتى يتوفر مكان
+        await queue.put(item)
+        return True
+
+    def forget(self, key):
+        self._sample_counters.pop(key, None)
+
+    async def _consume(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await queue.get()]
+            while len(items) < self.batch and not queue.empty():
+                items.append(queue.get_nowait())
+            self.active += len(items)
+            try:
+                arg = items if self.batch > 1 else items[0]
+                result = await loop.run_in_executor(self.executor, self.func, arg)
+                self.processed += len(items)
+                if self.on_result:
+                    await self.on_result(arg, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                error_msg = f"خطأ في مرحلة {self.name}: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
+            finally:
+                self.active -= len(items)
+
+    def idle(self):
+        return self.active == 0 and all(queue.empty() for queue in self.queues)
+
+    def snapshot(self):
+        return {
+            "depth": sum(queue.qsize() for queue in self.queues),
+            "capacity": self.maxsize * self.shards,
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "downsampled": self.downsampled,
+            "errors": self.errors,
+        }
+
+class IngestPipeline:
+    """استقبال ← فك التشفير ← فك الترميز ← التخزين والإنذار، لكل مرحلة طابور محدود
+
+    decrypt(conn, message) -> plaintext
+    decode(conn, plaintext) -> (events, reply) ؛ events قائمة (priority, event)
+    persist(events) : يستقبل دفعة من الأحداث
+    """
+
+    def __init__(self, decrypt, decode, persist, executor, shards=4, queue_size=256,
+                 persist_queue_size=10000, persist_batch=500):
+        self.received = 0
+        self.decrypt_stage = Stage("decrypt", lambda item: decrypt(*item), executor,
+                                   maxsize=queue_size, shards=shards, on_result=self._decrypted)
+        self.decode_stage = Stage("decode", lambda item: decode(*item), executor,
+                                  maxsize=queue_size, shards=shards, on_result=self._decoded)
+        self.persist_stage = Stage("persist", persist, executor, maxsize=persist_queue_size,
+                                   batch=persist_batch, policy=SHED)
+        self.stages = (self.decrypt_stage, self.decode_stage, self.persist_stage)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    async def receive(self, conn, message):
+        """يُستدعى من حلقة القراءة؛ الانتظار هنا هو ما يبطئ قراءة الاتصال"""
+        self.received += 1
+        await self.decrypt_stage.put((conn, message), key=id(conn))
+
+    async def _decrypted(self, item, plaintext):
+        conn = item[0]
+        if plaintext is not None:
+            await self.decode_stage.put((conn, plaintext), key=id(conn))
+
+    async def _decoded(self, item, result):
+        conn = item[0]
+        events, reply = result
+        # التأكيد بعد دخول الصفوف طابور التخزين؛ PRIORITY_ACKED ينتظر المكان بدل الإسقاط
+        for priority, event in events:
+            await self.persist_stage.put(event, key=id(conn), priority=priority)
+        if reply is not None:
+            await conn.send(reply)
+
+    async def drain(self, timeout=10.0, poll=0.05):
+        """انتظار تفريغ كل المراحل قبل الإيقاف حتى لا تضيع صفوف أُكدت للعميل"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not all(stage.idle() for stage in self.stages) and loop.time() < deadline:
+            await asyncio.sleep(poll)
+
+    def disconnected(self, conn):
+        self.persist_stage.forget(id(conn))
+
+    def metrics(self):
+        """عمق الطوابير وعدادات الإسقاط لكل مرحلة"""
+        snapshot = {stage.name: stage.snapshot() for stage in self.stages}
+        snapshot["received"] = self.received
+        return snapshot
@@ -0,0 +1,256 @@
+import os
+import json
+import bisect
+import socket
+import logging
+import ipaddress
+from collections import deque, namedtuple
+
+LOW = "low"
+MEDIUM = "medium"
+HIGH = "high"
+CRITICAL = "critical"
+SEVERITY_RANK = {LOW: 1, MEDIUM: 2, HIGH: 3, CRITICAL: 4}
+
+RULES_PATH = "config/rules.json"
+
+# حدث ناتج عن قاعدة؛ يمر في خط المعالجة بأولوية الإنذار فلا يُسقط
+# devices: الأجهزة التي يغطيها ملخص المجمّع (فارغ للحدث العادي)
+RuleEvent = namedtuple("RuleEvent", "ts_ms device_id rule_id severity message devices",
+                       defaults=((),))
+
+# المقاييس المتاحة لقواعد العتبات: اسم ← دالة على TelemetrySample
+METRICS = {
+    "ram_percent": lambda sample: sample.ram_percent,
+    "ram_used": lambda sample: sample.ram_used,
+    "conn_count": lambda sample: len(sample.network),
+}
+
+# عتبات: القاعدة تطابق إذا تحقق الشرط في آخر window عينة متتالية
+THRESHOLD_OPS = (">=", ">", "<=", "<")
+# مطابقات العنوان البعيد: مفتاح واحد في كل قاعدة
+MATCH_KEYS = ("ports", "addresses", "cidr")
+
+DEFAULT_RULES = [
+    {"id": "ram-high", "severity": HIGH, "metric": "ram_percent", "op": ">=", "value": 90,
+     "window": 3, "message": "استهلاك الذاكرة مرتفع: {value}%"},
+    {"id": "ram-critical", "severity": CRITICAL, "metric": "ram_percent", "op": ">=", "value": 97,
+     "window": 3, "message": "الذاكرة شبه ممتلئة: {value}%"},
+    {"id": "conn-flood", "severity": MEDIUM, "metric": "conn_count", "op": ">=", "value": 300,
+     "message": "عدد اتصالات غير معتاد: {value}"},
+    {"id": "remote-admin-port", "severity": MEDIUM, "ports": [22, 23, 3389, 5900],
+     "message": "اتصال بمنفذ إدارة عن بعد: {remote}"},
+    {"id": "backdoor-port", "severity": HIGH, "ports": [1337, 4444, 31337],
+     "message": "اتصال بمنفذ مشبوه: {remote}"},
+]
+
+class RuleError(ValueError):
+    """قاعدة غير صالحة في ملف القواعد"""
+
+def load_rules(path=RULES_PATH):
+    """قراءة القواعد من JSON؛ القواعد الافتراضية إذا لم يوجد الملف"""
+    if not os.path.exists(path):
+        return DEFAULT_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise RuleError(f"{path}: يجب أن يكون قائمة قواعد")
+    return rules
+
+class _Rule:
+    __slots__ = ("rule_id", "severity", "message", "threshold")
+
+    def __init__(self, spec, threshold=None):
+        self.rule_id = spec["id"]
+        self.severity = spec["severity"]
+        self.message = spec.get("message", spec["id"])
+        self.threshold = threshold
+
+    def event(self, sample, device_id, **values):
+        try:
+            message = self.message.format(**values)
+        except (KeyError, IndexError, ValueError):
+            message = self.message
+        return RuleEvent(sample.ts_ms, device_id, self.rule_id, self.severity, message)
+
+class _ThresholdList:
+    """قواعد نفس (المقياس، الاتجاه، النافذة) مرتبة بالعتبة
+
+    القواعد المطابقة لقيمة واحدة دائماً بادئة من القائمة المرتبة، فالتقييم bisect
+    واحد بدل المرور على كل القواعد. مع نافذة N تكون البادئة المطابقة لكل العينات
+    الأخيرة هي أصغر بادئة بينها."""
+
+    def __init__(self, metric, op, window, rules):
+        self.metric = METRICS[metric]
+        self.window = window
+        upward = op in (">=", ">")
+        # الترتيب بحيث تكون القواعد الأسهل تحققاً أولاً
+        rules.sort(key=lambda rule: rule.threshold, reverse=not upward)
+        self.rules = rules
+        keys = [rule.threshold if upward else -rule.threshold for rule in rules]
+        self.keys = keys
+        strict = op in (">", "<")
+        if upward:
+            self.count = (lambda value: bisect.bisect_left(keys, value)) if strict else \
+                         (lambda value: bisect.bisect_right(keys, value))
+        else:
+            self.count = (lambda value: bisect.bisect_left(keys, -value)) if strict else \
+                         (lambda value: bisect.bisect_right(keys, -value))
+
+class _DeviceState:
+    __slots__ = ("recent", "matched", "network", "remotes")
+
+    def __init__(self, lists):
+        # لكل قائمة عتبات: أطوال البادئات في آخر window عينة، والبادئة المطابقة حالياً
+        self.recent = [deque(maxlen=item.window) for item in lists]
+        self.matched = [0] * len(lists)
+        self.network = None
+        self.remotes = frozenset()
+
+class RuleEngine:
+    """محرك قواعد مُجمّع مرة واحدة إلى فهارس: قوائم عتبات مرتبة، وقاموس منافذ،
+    وقاموس عناوين، وجداول CIDR حسب طول البادئة. الأحداث تُطلق عند التحول فقط
+    (بدء تحقق الشرط أو ظهور اتصال مطابق جديد) وليس مع كل عينة."""
+
+    def __init__(self, rules):
+        grouped = {}
+        self.ports = {}
+        self.addresses = {}
+        # (الإصدار، طول البادئة) ← {الشبكة مزاحة: [قواعد]}
+        self.networks = {}
+        self.rule_count = 0
+        for spec in rules:
+            self._compile(spec, grouped)
+            self.rule_count += 1
+        self.thresholds = [_ThresholdList(metric, op, window, items)
+                           for (metric, op, window), items in grouped.items()]
+        self.network_tables = sorted(self.networks.items(), key=lambda item: -item[0][1])
+        self.has_network_rules = bool(self.ports or self.addresses or self.networks)
+        self.devices = {}
+        self._parsed = {}
+
+    def _compile(self, spec, grouped):
+        rule_id = spec.get("id")
+        if not rule_id:
+            raise RuleError(f"قاعدة بدون id: {spec}")
+        if spec.get("severity") not in SEVERITY_RANK:
+            raise RuleError(f"{rule_id}: درجة خطورة غير معروفة {spec.get('severity')!r}")
+        if "metric" in spec:
+            if spec["metric"] not in METRICS:
+                raise RuleError(f"{rule_id}: مقياس غير معروف {spec['metric']!r}")
+            if spec.get("op", ">=") not in THRESHOLD_OPS:
+                raise RuleError(f"{rule_id}: عملية غير معروفة {spec.get('op')!r}")
+            window = int(spec.get("window", 1))
+            if window < 1:
+                raise RuleError(f"{rule_id}: window يجب أن تكون 1 أو أكثر")
+            key = (spec["metric"], spec.get("op", ">="), window)
+            grouped.setdefault(key, []).append(_Rule(spec, float(spec["value"])))
+            return
+        keys = [key for key in MATCH_KEYS if key in spec]
+        if len(keys) != 1:
+            raise RuleError(f"{rule_id}: يجب تحديد metric أو واحد فقط من {MATCH_KEYS}")
+        rule = _Rule(spec)
+        try:
+            if "ports" in spec:
+                for port in spec["ports"]:
+                    self.ports.setdefault(int(port), []).append(rule)
+            elif "addresses" in spec:
+                for address in spec["addresses"]:
+                    ip = ipaddress.ip_address(address)
+                    self.addresses.setdefault((ip.version, int(ip)), []).append(rule)
+            else:
+                for cidr in spec["cidr"]:
+                    network = ipaddress.ip_network(cidr, strict=False)
+                    bits = network.max_prefixlen - network.prefixlen
+                    table = self.networks.setdefault((network.version, network.prefixlen), {})
+                    table.setdefault(int(network.network_address) >> bits, []).append(rule)
+        except ValueError as e:
+            raise RuleError(f"{rule_id}: {str(e)}") from None
+
+    def _parse_remote(self, remote):
+        """'ip:port' ← (version, ip_int, max_prefixlen, port) مع ذاكرة للعناوين المتكررة"""
+        parsed = self._parsed.get(remote)
+        if parsed is None:
+            host, _, port = remote.rpartition(":")
+            host = host.strip("[]")
+            # inet_pton أسرع بكثير من ipaddress في المسار الساخن
+            try:
+                if ":" in host:
+                    parsed = (6, int.from_bytes(socket.inet_pton(socket.AF_INET6, host), "big"), 128, int(port))
+                else:
+                    parsed = (4, int.from_bytes(socket.inet_pton(socket.AF_INET, host), "big"), 32, int(port))
+            except (OSError, ValueError):
+                parsed = (0, 0, 0, -1)
+            if len(self._parsed) >= 65536:
+                self._parsed.clear()
+            self._parsed[remote] = parsed
+        return parsed
+
+    def _match_remote(self, remote):
+        version, ip, width, port = self._parse_remote(remote)
+        matched = list(self.ports.get(port, ()))
+        if version:
+            matched += self.addresses.get((version, ip), ())
+            for (table_version, prefixlen), table in self.network_tables:
+                if table_version == version:
+                    matched += table.get(ip >> (width - prefixlen), ())
+        # قاعدة بعدة شبكات متداخلة تُحتسب مرة واحدة
+        return dict.fromkeys(matched) if len(matched) > 1 else matched
+
+    def evaluate(self, device_id, sample):
+        """تقييم عينة واحدة؛ ترجع قائمة RuleEvent الجديدة"""
+        state = self.devices.get(device_id)
+        if state is None:
+            state = self.devices[device_id] = _DeviceState(self.thresholds)
+        events = []
+        for index, item in enumerate(self.thresholds):
+            value = item.metric(sample)
+            recent = state.recent[index]
+            recent.append(item.count(value))
+            matched = min(recent) if len(recent) == item.window else 0
+            previous = state.matched[index]
+            if matched > previous:
+                for rule in item.rules[previous:matched]:
+                    events.append(rule.event(sample, device_id, value=value))
+            state.matched[index] = matched
+
+        network = sample.network
+        if self.has_network_rules and network is not state.network:
+            state.network = network
+            remotes = frozenset(conn[1] for conn in network)
+            # الاتصالات الجديدة فقط؛ الاتصال المستمر لا يطلق الحدث مرة أخرى
+            for remote in remotes - state.remotes:
+                for rule in self._match_remote(remote):
+                    events.append(rule.event(sample, device_id, remote=remote))
+            state.remotes = remotes
+        return events
+
+    def forget(self, device_id):
+        self.devices.pop(device_id, None)
+
+ALERTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT,
+        ts_ms INTEGER NOT NULL,
+        device_id TEXT NOT NULL,
+        rule_id TEXT NOT NULL,
+        severity TEXT NOT NULL,
+        message TEXT
+    )
+"""
+
+INSERT_ALERT = """
+    INSERT INTO alerts (timestamp, ts_ms, device_id, rule_id, severity, message)
+    VALUES (datetime(? / 1000, 'unixepoch', 'localtime'), ?, ?, ?, ?, ?)
+"""
+
+def load_engine(path=RULES_PATH):
+    """تحميل القواعد وتجميعها؛ عند الخطأ يُسجل ويُرجع محرك القواعد الافتراضية"""
+    try:
+        return RuleEngine(load_rules(path))
+    except (OSError, ValueError) as e:
+        error_msg = f"خطأ في ملف القواعد {path}: {str(e)}، استخدام القواعد الافتراضية"
+        logging.error(error_msg)
+        print(error_msg)
+        return RuleEngine(DEFAULT_RULES)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from utils import devices, wire
+
+class Session:
+    """حالة جهاز قابلة للاستئناف: آخر تسلسل مؤكد وجدول النصوص عنده وجلسة التشفير"""
+
+    __slots__ = ("token", "device_id", "seen", "owner", "acked", "strings", "interned",
+                 "cipher", "resume")
+
+    def __init__(self, token, device_id, now):
+        self.token = token
+        self.device_id = device_id
+        self.seen = now
+        # الاتصال الوحيد الذي يحق له تحديث نقطة التحقق
+        self.owner = None
+        self.acked = 0
+        # قائمة نصوص المفكك وعدد النصوص المعروفة عند آخر تأكيد
+        self.strings = None
+        self.interned = 0
+        self.cipher = None
+        # (التسلسل، النصوص) مجمدة عند المصافحة حتى يستلمها الاتصال الجديد
+        self.resume = None
+
+class SessionCache:
+    """رموز الجلسات الصادرة عن هذه العملية، محدودة العدد (LRU) والعمر
+
+    المصافحة (handshake) تصدر رمزاً جديداً أو تستعيد جلسة معروفة وتعلن آخر تسلسل
+    مؤكد فيها، فيكمل العميل بعده بنفس النصوص المسجلة وجلسة التشفير بدل البدء من
+    الصفر. نقطة التحقق تُحدث مع كل تأكيد (checkpoint) فتطابق ما يعرفه العميل.
+    الجلسات لا تُشارك بين عمليات الاستقبال؛ الاتصال بعملية أخرى يبدأ جلسة جديدة،
+    لذلك الاستئناف مضمون فقط مع "ingest_processes": 1 (الافتراضي)."""
+
+    def __init__(self, ttl=600.0, capacity=4096):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+        # عدادات
+        self.issued = 0
+        self.resumed = 0
+
+    def handshake(self, path, request_headers):
+        """ترويسات الرد لكل اتصال (extra_headers في websockets.serve)"""
+        headers = {wire.WIRE_HEADER: wire.WIRE_VERSION}
+        token = request_headers.get(wire.SESSION_HEADER)
+        device_id = request_headers.get(wire.DEVICE_HEADER)
+        if not token or not devices.is_valid_device_id(device_id):
+            return headers
+        now = time.monotonic()
+        with self._lock:
+            session = self.sessions.get(token)
+            if (session is not None and session.device_id == device_id
+                    and now - session.seen <= self.ttl and session.strings is not None):
+                # إيقاف تحديثات الاتصال القديم إن كان لا يزال مفتوحاً
+                session.owner = None
+                session.resume = (session.acked, session.strings[:session.interned])
+                session.seen = now
+                self.sessions.move_to_end(token)
+                self.resumed += 1
+                headers[wire.SESSION_HEADER] = token
+                headers[wire.RESUME_HEADER] = str(session.acked)
+                return headers
+            token = secrets.token_urlsafe(18)
+            self.sessions[token] = Session(token, device_id, now)
+            self.issued += 1
+            while len(self.sessions) > self.capacity:
+                self.sessions.popitem(last=False)
+        headers[wire.SESSION_HEADER] = token
+        return headers
+
+    def attach(self, conn):
+        """ربط الاتصال بجلسته بعد المصافحة؛ ترجع (الجلسة، حالة الاستئناف أو None)"""
+        response = conn.websocket.response_headers
+        with self._lock:
+            session = self.sessions.get(response.get(wire.SESSION_HEADER))
+            if session is None or session.device_id != conn.device_id:
+                return None, None
+            session.owner = conn
+            resume = session.resume if wire.RESUME_HEADER in response else None
+            session.resume = None
+            return session, resume
+
+    def checkpoint(self, conn, seq, strings):
+        """بعد كل تأكيد: العميل يعرف الآن كل النصوص حتى هذا التسلسل"""
+        session = conn.session
+        if session is None or session.owner is not conn:
+            return
+        session.acked = seq
+        session.strings = strings
+        session.interned = len(strings)
+        session.seen = time.monotonic()
+
+    def snapshot(self):
+        return {"sessions": len(self.sessions), "issued": self.issued, "resumed": self.resumed}
\ No newline at end of file
@@ -0,0 +1,126 @@
+import json
+import time
+from collections import namedtuple
+from utils import wire
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = lambda obj: orjson.dumps(obj).decode()
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
+
+class TelemetryError(ValueError):
+    """إطار بيانات غير صالح؛ يُرفض قبل أي عمل على قاعدة البيانات"""
+
+# ts_ms: وقت أخذ العينة على الجهاز بالمللي ثانية منذ epoch
+TelemetrySample = namedtuple("TelemetrySample", "ts_ms ram_total ram_used ram_percent network")
+NetworkConnection = namedtuple("NetworkConnection", "local_addr remote_addr status")
+
+# شكل الحمولة التي يرسلها SIFERWindowsClient
+NUMBER = "number"
+STRING = "string"
+
+TELEMETRY_SCHEMA = {
+    "timestamp": STRING,
+    "ram": {"total": NUMBER, "used": NUMBER, "percent": NUMBER},
+    "network": [{"local_addr": STRING, "remote_addr": STRING, "status": STRING}],
+}
+
+def _compile(schema, path):
+    """تحويل وصف المخطط إلى دالة تحقق تُبنى مرة واحدة عند التحميل"""
+    if schema == NUMBER:
+        def check_number(value):
+            if type(value) in (float, int):
+                return float(value)
+            raise TelemetryError(f"{path}: يجب أن يكون رقماً")
+        return check_number
+
+    if schema == STRING:
+        def check_string(value):
+            if type(value) is str:
+                return value
+            raise TelemetryError(f"{path}: يجب أن يكون نصاً")
+        return check_string
+
+    if isinstance(schema, list):
+        check_item = _compile(schema[0], f"{path}[]")
+        def check_list(value):
+            if type(value) is not list:
+                raise TelemetryError(f"{path}: يجب أن يكون قائمة")
+            return [check_item(item) for item in value]
+        return check_list
+
+    fields = tuple((name, _compile(sub, f"{path}.{name}" if path else name))
+                   for name, sub in schema.items())
+    def check_object(value):
+        if type(value) is not dict:
+            raise TelemetryError(f"{path or 'الجذر'}: يجب أن يكون كائناً")
+        try:
+            return [check(value[name]) for name, check in fields]
+        except KeyError as e:
+            raise TelemetryError(f"{path or 'الجذر'}: الحقل {e} مفقود") from None
+    return check_object
+
+_check_telemetry = _compile(TELEMETRY_SCHEMA, "")
+
+_minute_cache = {}
+
+def parse_timestamp(text):
+    """'YYYY-mm-dd HH:MM:SS[.mmm]' بالتوقيت المحلي ← مللي ثانية؛ mktime مرة واحدة لكل دقيقة"""
+    if (len(text) not in (19, 23) or text[4] != "-" or text[13] != ":" or text[16] != ":"
+            or (len(text) == 23 and text[19] != ".")):
+        raise TelemetryError(f"timestamp: صيغة غير صالحة: {text!r}")
+    try:
+        minute_base = _minute_cache.get(text[:16])
+        if minute_base is None:
+            fields = (int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                      int(text[11:13]), int(text[14:16]), 0, 0, 0, -1)
+            if len(_minute_cache) > 1024:
+                _minute_cache.clear()
+            minute_base = _minute_cache[text[:16]] = int(time.mktime(fields)) * 1000
+        millis = int(text[20:23]) if len(text) == 23 else 0
+        return minute_base + int(text[17:19]) * 1000 + millis
+    except (ValueError, OverflowError):
+        raise TelemetryError(f"timestamp: صيغة غير صالحة: {text!r}") from None
+
+def decode(payload):
+    """تحليل حمولة JSON والتحقق منها وإرجاع TelemetrySample"""
+    try:
+        data = _loads(payload)
+    except ValueError as e:
+        raise TelemetryError(f"JSON غير صالح: {str(e)}") from None
+    timestamp, (total, used, percent), network = _check_telemetry(data)
+    return TelemetrySample(parse_timestamp(timestamp), total, used, percent,
+                           [NetworkConnection(*conn) for conn in network])
+
+def decode_frame(payload, wire_decoder):
+    """اختيار المسار حسب أول بايت: إطار ثنائي (utils.wire) أو JSON احتياطي"""
+    if wire.is_binary(payload):
+        try:
+            return TelemetrySample._make(wire_decoder.decode(payload))
+        except wire.WireError as e:
+            raise TelemetryError(str(e)) from None
+    return decode(payload)
+
+def decode_message(payload, wire_decoder):
+    """فك رسالة كاملة: (قائمة العينات، آخر تسلسل للتأكيد أو None للرسائل غير المرقمة)
+
+    الدفعة تُقبل كلها أو تُرفض كلها؛ العميل يعيد إرسال ما لم يُؤكد."""
+    if wire.frame_kind(payload) != wire.FRAME_BATCH:
+        return [decode_frame(payload, wire_decoder)], None
+    try:
+        first_seq, frames = wire.split_batch(payload)
+    except wire.WireError as e:
+        raise TelemetryError(str(e)) from None
+    samples = [decode_frame(frame, wire_decoder) for frame in frames]
+    return samples, first_seq + len(samples) - 1
+
+def new_wire_decoder():
+    """مفكك إطارات ثنائية لاتصال واحد يُنتج سجلات NetworkConnection مباشرة"""
+    return wire.WireDecoder(NetworkConnection._make)
+
+def network_json(sample):
+    """تمثيل الاتصالات بنفس شكل عمود network_connections"""
+    return _dumps([conn._asdict() for conn in sample.network])
@@ -0,0 +1,261 @@
+import os
+import logging
+from utils import db_writer, devices, rules
+
+SCHEMA_VERSION = 5
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+
+# جداول التجميع: (اسم الجدول، طول الفترة بالمللي ثانية)
+ROLLUPS = (("telemetry_1m", MINUTE_MS), ("telemetry_1h", HOUR_MS))
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS telemetry (
+        id INTEGER PRIMARY KEY,
+        device_id TEXT NOT NULL,
+        ts_ms INTEGER NOT NULL,
+        ram_total REAL,
+        ram_used REAL,
+        ram_percent REAL,
+        conn_count INTEGER,
+        network_connections TEXT
+    )
+    """,
+    # فهرس مغطٍ لاستعلامات الفترة الزمنية لجهاز واحد دون الرجوع للجدول
+    """
+    CREATE INDEX IF NOT EXISTS idx_telemetry_device_ts
+        ON telemetry (device_id, ts_ms, ram_percent, ram_used, conn_count)
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry (ts_ms)",
+] + [
+    f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        device_id TEXT NOT NULL,
+        bucket_ms INTEGER NOT NULL,
+        samples INTEGER NOT NULL,
+        ram_percent_min REAL,
+        ram_percent_max REAL,
+        ram_percent_sum REAL,
+        PRIMARY KEY (device_id, bucket_ms)
+    ) WITHOUT ROWID
+    """
+    for table, _ in ROLLUPS
+]
+
+INSERT_TELEMETRY = """
+    INSERT INTO telemetry (device_id, ts_ms, ram_total, ram_used, ram_percent, conn_count, network_connections)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# دمج تجميع الدفعة مع ما هو مخزن مسبقاً لنفس الفترة
+UPSERT_ROLLUP = """
+    INSERT INTO {table} (device_id, bucket_ms, samples, ram_percent_min, ram_percent_max, ram_percent_sum)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (device_id, bucket_ms) DO UPDATE SET
+        samples = samples + excluded.samples,
+        ram_percent_min = min(ram_percent_min, excluded.ram_percent_min),
+        ram_percent_max = max(ram_percent_max, excluded.ram_percent_max),
+        ram_percent_sum = ram_percent_sum + excluded.ram_percent_sum
+"""
+UPSERT_ROLLUPS = [(UPSERT_ROLLUP.format(table=table), period) for table, period in ROLLUPS]
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (name,)).fetchone() is not None
+
+def _migrate_v1(conn):
+    """system_data (نص زمني بدون جهاز) ← telemetry بطابع زمني صحيح وجداول تجميع"""
+    for statement in SCHEMA:
+        conn.execute(statement)
+    if _table_exists(conn, "system_data"):
+        # الطوابع القديمة بالتوقيت المحلي؛ المعدل utc يحولها قبل حساب epoch
+        conn.execute("""
+            INSERT INTO telemetry (device_id, ts_ms, ram_total, ram_used, ram_percent,
+                                   conn_count, network_connections)
+            SELECT 'legacy', CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000,
+                   ram_total, ram_used, ram_percent,
+                   CASE WHEN json_valid(network_connections)
+                        THEN json_array_length(network_connections) ELSE 0 END,
+                   network_connections
+            FROM system_data
+            WHERE timestamp IS NOT NULL
+            ORDER BY id
+        """)
+        for table, period in ROLLUPS:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {table}
+                    (device_id, bucket_ms, samples, ram_percent_min, ram_percent_max, ram_percent_sum)
+                SELECT device_id, (ts_ms / {period}) * {period}, count(*),
+                       min(ram_percent), max(ram_percent), sum(ram_percent)
+                FROM telemetry
+                GROUP BY device_id, ts_ms / {period}
+            """)
+        # الإبقاء على الجدول القديم باسم جديد بدل حذفه
+        conn.execute("ALTER TABLE system_data RENAME TO system_data_v0")
+
+# جداول الأحداث القديمة: تُقرأ بمدى زمني نصي من واجهة الاستعلام
+EVENT_TABLES = ("network_status", "permissions_log", "emergency_trigger", "locations", "alerts")
+
+def _migrate_v2(conn):
+    """فهارس زمنية للاستعلام عبر كل الأجهزة وعلى جداول الأحداث"""
+    for table, _ in ROLLUPS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket_ms)")
+    for table in EVENT_TABLES:
+        if _table_exists(conn, table):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)")
+
+# ملف SQLite مستقل لكل جهاز بجانب قاعدة البيانات الرئيسية: الاستعلام والحذف والتصدير
+# لجهاز واحد لا يلمس صفحات الأجهزة الأخرى، والكتابة لأجهزة مختلفة لا تتنافس على قفل واحد
+PARTITION_SCHEMA = SCHEMA + [
+    f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket_ms)" for table, _ in ROLLUPS
+]
+
+def partition_root(db_path=db_writer.DB_PATH):
+    return os.path.join(os.path.dirname(db_path) or ".", "devices")
+
+PARTITION_DIR = partition_root()
+
+def partition_path(device_id, root=PARTITION_DIR):
+    if not devices.is_valid_device_id(device_id):
+        raise ValueError(f"معرف جهاز غير صالح: {device_id!r}")
+    return os.path.join(root, f"{device_id}.db")
+
+def open_partition(path):
+    """فتح ملف جهاز للكتابة وإنشاء مخططه عند أول استخدام"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = db_writer.connect(path)
+    with conn:
+        for statement in PARTITION_SCHEMA:
+            conn.execute(statement)
+    return conn
+
+def _migrate_v3(conn):
+    """سجل الأجهزة ونقل القياسات من الجداول المشتركة إلى ملف لكل جهاز"""
+    conn.execute(devices.SCHEMA)
+    if not _table_exists(conn, "telemetry"):
+        return
+    main_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    root = partition_root(main_file)
+    conn.execute("""
+        INSERT OR IGNORE INTO devices (device_id, first_seen_ms, last_connected_ms, connections)
+        SELECT device_id, min(ts_ms), max(ts_ms), 0 FROM telemetry GROUP BY device_id
+    """)
+    device_ids = [row[0] for row in conn.execute("SELECT device_id FROM devices")]
+    for device_id in device_ids:
+        path = partition_path(device_id, root)
+        open_partition(path).close()
+        # ATTACH و DETACH غير مسموحين داخل معاملة مفتوحة
+        conn.commit()
+        conn.execute("ATTACH DATABASE ? AS part", (path,))
+        try:
+            # الحذف أولاً يجعل إعادة الترقية بعد انقطاع آمنة
+            for table in ("telemetry",) + tuple(table for table, _ in ROLLUPS):
+                conn.execute(f"DELETE FROM part.{table}")
+            conn.execute("""
+                INSERT INTO part.telemetry (device_id, ts_ms, ram_total, ram_used, ram_percent,
+                                            conn_count, network_connections)
+                SELECT device_id, ts_ms, ram_total, ram_used, ram_percent,
+                       conn_count, network_connections
+                FROM main.telemetry WHERE device_id = ? ORDER BY ts_ms, id
+            """, (device_id,))
+            for table, _ in ROLLUPS:
+                conn.execute(f"INSERT INTO part.{table} SELECT * FROM main.{table} WHERE device_id = ?",
+                             (device_id,))
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE part")
+    # الحذف ورفع user_version في معاملة واحدة حتى لا تبقى الجداول نصف محذوفة
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    for table in ("telemetry",) + tuple(table for table, _ in ROLLUPS):
+        conn.execute(f"DROP TABLE {table}")
+
+def _migrate_v4(conn):
+    """أحداث الطوارئ تخص جهازاً بعينه"""
+    if _table_exists(conn, "emergency_trigger"):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(emergency_trigger)")]
+        if "device_id" not in columns:
+            conn.execute("ALTER TABLE emergency_trigger ADD COLUMN device_id TEXT")
+
+def _migrate_v5(conn):
+    """أحداث محرك القواعد المصنفة حسب الخطورة"""
+    conn.execute(rules.ALERTS_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_device_ts ON alerts (device_id, ts_ms)")
+
+MIGRATIONS = {1: _migrate_v1, 2: _migrate_v2, 3: _migrate_v3, 4: _migrate_v4, 5: _migrate_v5}
+
+def migrate(conn):
+    """ترقية قاعدة البيانات إلى SCHEMA_VERSION؛ كل ترقية في معاملة واحدة"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    while version < SCHEMA_VERSION:
+        version += 1
+        with conn:
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        logging.info(f"تمت ترقية قاعدة البيانات إلى الإصدار {version}")
+
+def sample_row(device_id, sample, network_json):
+    """صف INSERT_TELEMETRY من عينة مفكوكة؛ صف بسيط يُنقل بين العمليات دون كلفة"""
+    return (device_id, sample.ts_ms, sample.ram_total, sample.ram_used, sample.ram_percent,
+            len(sample.network), network_json)
+
+class TelemetryStore:
+    """كتابة العينات في ملف كل جهاز وتحديث جداول التجميع تدريجياً مع كل دفعة
+
+    writer كاتب ملفات (db_writer.ShardedWriter) يستقبل (path, sql, params)."""
+
+    def __init__(self, writer, root=PARTITION_DIR):
+        self.writer = writer
+        self.root = root
+        self._paths = {}
+
+    def path(self, device_id):
+        path = self._paths.get(device_id)
+        if path is None:
+            path = self._paths[device_id] = partition_path(device_id, self.root)
+        return path
+
+    def write(self, rows):
+        """rows: قائمة صفوف sample_row"""
+        rollups = [{} for _ in UPSERT_ROLLUPS]
+        submit = self.writer.submit
+        rejected = {}
+        for row in rows:
+            device_id, ts_ms, percent = row[0], row[1], row[4]
+            try:
+                path = self.path(device_id)
+            except ValueError:
+                # صفوف جهاز بمعرف غير صالح تُرفض وحدها؛ بقية الدفعة تُكتب
+                rejected[device_id] = rejected.get(device_id, 0) + 1
+                continue
+            submit(path, INSERT_TELEMETRY, row)
+            # تجميع الدفعة في الذاكرة أولاً: صف واحد لكل (جهاز، فترة) بدل صف لكل عينة
+            for buckets, (_, period) in zip(rollups, UPSERT_ROLLUPS):
+                key = (device_id, ts_ms - ts_ms % period)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [1, percent, percent, percent]
+                else:
+                    bucket[0] += 1
+                    bucket[1] = min(bucket[1], percent)
+                    bucket[2] = max(bucket[2], percent)
+                    bucket[3] += percent
+        for buckets, (sql, _) in zip(rollups, UPSERT_ROLLUPS):
+            for (device_id, bucket_ms), values in buckets.items():
+                submit(self.path(device_id), sql, (device_id, bucket_ms, *values))
+        for device_id, count in rejected.items():
+            error_msg = f"رفض {count} عينة بمعرف جهاز غير صالح: {device_id!r}"
+            logging.error(error_msg)
+            print(error_msg)
+
+    def retain(self, device_id, before_ms):
+        """حذف بيانات جهاز واحد الأقدم من before_ms؛ لا يلمس ملفات الأجهزة الأخرى"""
+        path = self.path(device_id)
+        self.writer.submit(path, "DELETE FROM telemetry WHERE ts_ms < ?", (before_ms,))
+        for table, period in ROLLUPS:
+            # الفترة التي تحتوي before_ms تبقى لأنها تشمل عينات لم تُحذف
+            self.writer.submit(path, f"DELETE FROM {table} WHERE bucket_ms < ?",
+                               (before_ms - before_ms % period,))
\ No newline at end of file
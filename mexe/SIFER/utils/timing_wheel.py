@@ -0,0 +1,64 @@
+class TimingWheel:
+    """عجلة توقيت متدرجة لعدد كبير من المؤقتات
+
+    الإضافة والإلغاء O(1)، والتقدم نبضة واحدة يفرغ خانة واحدة في المستوى الأول؛
+    المستويات الأعلى تُنزل خانة واحدة كل slots نبضة. الوقت بوحدة النبضات (أعداد صحيحة)."""
+
+    def __init__(self, bits=6, levels=4):
+        self.bits = bits
+        self.levels = levels
+        self.mask = (1 << bits) - 1
+        # أبعد موعد ممكن؛ ما بعده يُقص ويعاد جدولته عند انتهائه
+        self.horizon = (1 << (bits * levels)) - 1
+        self.wheels = [[set() for _ in range(1 << bits)] for _ in range(levels)]
+        # key -> (deadline, level, slot) للإلغاء المباشر
+        self.entries = {}
+        self.now = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _place(self, key, deadline):
+        now = self.now
+        level = 0
+        # المستوى هو أعلى رقم (بأساس 2^bits) يختلف فيه الموعد عن الوقت الحالي
+        while level < self.levels - 1 and (deadline >> (self.bits * (level + 1))) != (now >> (self.bits * (level + 1))):
+            level += 1
+        slot = (deadline >> (self.bits * level)) & self.mask
+        self.wheels[level][slot].add(key)
+        self.entries[key] = (deadline, level, slot)
+
+    def schedule(self, key, deadline):
+        """جدولة key لينتهي عند النبضة deadline (تستبدل أي جدولة سابقة)"""
+        self.cancel(key)
+        deadline = min(max(deadline, self.now + 1), self.now + self.horizon)
+        self._place(key, deadline)
+
+    def cancel(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            _, level, slot = entry
+            self.wheels[level][slot].discard(key)
+
+    def advance(self):
+        """التقدم نبضة واحدة؛ ترجع المفاتيح المنتهية عند هذه النبضة"""
+        self.now += 1
+        now = self.now
+        # عند اكتمال دورة مستوى أدنى تُنزل خانة المستوى الأعلى التالية
+        for level in range(1, self.levels):
+            if now & ((1 << (self.bits * level)) - 1):
+                break
+            slot = (now >> (self.bits * level)) & self.mask
+            cascading = self.wheels[level][slot]
+            self.wheels[level][slot] = set()
+            for key in cascading:
+                self._place(key, self.entries[key][0])
+        slot = now & self.mask
+        expired = self.wheels[0][slot]
+        self.wheels[0][slot] = set()
+        for key in expired:
+            del self.entries[key]
+        return expired
\ No newline at end of file
@@ -1,121 +1,348 @@
+import os
+import re
 import sys
+import uuid
+import socket
+import select
 import threading
 import time
 import json
 import logging
-import psutil
 from datetime import datetime
+from collections import deque
+# mexe/shared/utils (التشفير وصيغة الإطارات وحالة الشبكة) جزء من حزمة utils نفسها:
+# utils حزمة namespace فتُدمج المجلدات الموجودة في sys.path
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import QObject, pyqtSignal
-from websocket import WebSocket, create_connection
-from cryptography.fernet import Fernet
+from websocket import ABNF, WebSocket, create_connection
 from ui.main_window import MainWindow
+from utils.crypto_session import CipherSession, Keyring, SUBPROTOCOLS
+from utils import wire
+from utils.metrics import MetricsCollector, AdaptiveSampler
+from utils.spool import Spool, FSYNC_INTERVAL
+from utils.reconnect import Backoff
 
 logging.basicConfig(filename="client.log", level=logging.INFO, 
                     format="%(asctime)s - %(levelname)s - %(message)s")
 
-class Encryptor:
-    def __init__(self):
-        self.key = b'uJnmGjIDuQnR_GYZ5uFPGYW5xYAi-JpMO_gwoTqg0EM='
-        self.cipher = Fernet(self.key)
-    
-    def encrypt_data(self, data):
-        return self.cipher.encrypt(data.encode())
-    
-    def decrypt_data(self, encrypted_data):
-        return self.cipher.decrypt(encrypted_data).decode()
+def default_device_id():
+    """معرف ثابت للجهاز من اسمه وعنوان MAC؛ لا يتغير بين التشغيلات ولا يحتاج ملفاً"""
+    host = re.sub(r"[^A-Za-z0-9_.-]", "-", socket.gethostname()).strip("-.") or "device"
+    return f"{host[:48]}-{uuid.getnode():012x}"
 
 class WebSocketClient(QObject):
     message_received = pyqtSignal(str)
     connection_status = pyqtSignal(bool)
 
-    def __init__(self, url):
+    def __init__(self, url, keyring=None, subprotocols=SUBPROTOCOLS, binary_wire=True,
+                 sample_interval=2, batch_size=50, max_in_flight=4, ack_timeout=15,
+                 device_id=None, collector=None, spool_dir="spool", spool_max_bytes=64 << 20,
+                 spool_fsync=FSYNC_INTERVAL, replay_batch_size=200, replay_rate=500,
+                 reconnect_base=1.0, reconnect_cap=60.0):
         super().__init__()
         self.url = url
-        self.encryptor = Encryptor()
+        self.device_id = device_id or default_device_id()
+        self.keyring = keyring or Keyring()
+        # أنماط التشفير المقبولة بترتيب التفضيل؛ الخادم يختار أحدها عند الاتصال
+        self.subprotocols = list(subprotocols)
+        self.encryptor = None
+        self.binary_wire = binary_wire
+        self.encoder = wire.WireEncoder()
+        self.sample_interval = sample_interval
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        # العينات غير المؤكدة على القرص بالترتيب؛ تبقى عبر الانقطاع وإعادة التشغيل
+        self.spool = Spool(spool_dir, max_bytes=spool_max_bytes, fsync=spool_fsync)
+        # الدفعات المرسلة بانتظار التأكيد (آخر تسلسل، وقت الإرسال، جيل النصوص، عددها)
+        self.in_flight = deque()
+        self.send_seq = self.spool.first_seq
+        # رمز الجلسة من الخادم وآخر دفعة مؤكدة بنفس الشكل؛ يكفيان لاستئناف الترميز
+        self.session_token = None
+        self.checkpoint = None
+        # إعادة الإرسال بعد الانقطاع: دفعات كبيرة بمعدل أقصى replay_rate عينة/ثانية
+        self.replay_batch_size = replay_batch_size
+        self.replay_rate = replay_rate
+        self.replay_tokens = float(replay_batch_size)
+        self.replay_refill = time.monotonic()
         self.running = True
+        # خيط اتصال واحد لكل عميل؛ reconnect و stop يوقظانه من انتظار التأخير
+        self.backoff = Backoff(reconnect_base, reconnect_cap)
+        self.thread = None
+        self.ws = None
+        self._wake = threading.Event()
+        # كل لقطة من الجامع تُكتب في الطابور من خيط الجامع، متصلاً كان العميل أم لا
+        self.collector = collector or MetricsCollector.shared(interval=sample_interval)
+        self.collector.subscribe(self.spool_snapshot)
+
+    def collect_sample(self, snapshot):
+        """تحويل لقطة الجامع إلى عينة: (الوقت، الرامات، الاتصالات)"""
+        memory = snapshot.memory
+        ram_data = {
+            "total": round(memory.total / (1024 ** 3), 2),  # GB
+            "used": round(memory.used / (1024 ** 3), 2),    # GB
+            "percent": memory.percent
+        }
+        # الجدول كاملاً؛ الصيغة الثنائية ترسل الفروق فقط (wire.ConnectionTable)
+        net_data = [
+            {
+                "local_addr": f"{conn.laddr.ip}:{conn.laddr.port}",
+                "remote_addr": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A",
+                "status": conn.status,
+                "pid": conn.pid
+            } for conn in snapshot.connections
+        ]
+        return snapshot.ts, ram_data, net_data
+
+    def spool_snapshot(self, snapshot):
+        try:
+            self.spool.append(self.collect_sample(snapshot))
+        except (OSError, ValueError) as e:
+            error_msg = f"خطأ في حفظ العينة في الطابور المحلي: {str(e)}"
+            logging.error(error_msg)
+            print(error_msg)
+
+    def wait_time(self):
+        """المهلة حتى اللقطة التالية من الجامع"""
+        return max(0.0, self.collector.next_due - time.time()) + 0.05
+
+    def send(self, ws, payload):
+        encrypted_data = self.encryptor.encrypt_bytes(payload)
+        if self.encryptor.is_aead:
+            ws.send_binary(encrypted_data)
+        else:
+            ws.send(encrypted_data)
+
+    def take_replay(self, count):
+        """دلو الرموز لإعادة الإرسال: كم عينة يمكن إرسالها الآن من count"""
+        now = time.monotonic()
+        self.replay_tokens = min(float(self.replay_batch_size),
+                                 self.replay_tokens + (now - self.replay_refill) * self.replay_rate)
+        self.replay_refill = now
+        taken = min(count, int(self.replay_tokens))
+        self.replay_tokens -= taken
+        return taken
+
+    def send_batches(self, ws):
+        """إرسال ما لم يُرسل بعد على دفعات حتى امتلاء نافذة التأكيد
+
+        ترجع المهلة حتى يسمح المعدل بدفعة إعادة إرسال أخرى، أو None"""
+        # عينات قديمة حُذفت من الطابور عند امتلائه
+        self.send_seq = max(self.send_seq, self.spool.first_seq)
+        while len(self.in_flight) < self.max_in_flight and self.send_seq < self.spool.next_seq:
+            backlog = self.spool.next_seq - self.send_seq
+            if backlog > self.batch_size:
+                size = self.take_replay(min(backlog, self.replay_batch_size))
+                if size == 0:
+                    return (1.0 - self.replay_tokens) / self.replay_rate
+            else:
+                size = backlog
+            batch = self.spool.read(self.send_seq, size)
+            if not batch:
+                break
+            frames = [self.encoder.encode(*sample) for _, sample in batch]
+            self.send(ws, wire.encode_batch(batch[0][0], frames))
+            self.send_seq = batch[-1][0] + 1
+            self.in_flight.append((batch[-1][0], time.time(), self.encoder.generation,
+                                   len(self.encoder.strings)))
+        return None
+
+    def handle_ack(self, seq):
+        self.spool.ack(seq)
+        self.backoff.reset()
+        while self.in_flight and self.in_flight[0][0] <= seq:
+            entry = self.in_flight.popleft()
+            if entry[0] == seq:
+                self.checkpoint = entry
+
+    def start_session(self, headers):
+        """بداية كل اتصال: استئناف الجلسة إن أعلن الخادم آخر تسلسل مؤكد لديه
+
+        الخادم يحفظ جدول النصوص كما كان بعد تلك الدفعة؛ إن كانت من الدفعات التي
+        نعرف حالتها نكمل بعدها بنفس النصوص، وإلا ترميز جديد بالكامل."""
+        token = headers.get(wire.SESSION_HEADER.lower())
+        resumed = headers.get(wire.RESUME_HEADER.lower())
+        entry = None
+        if token and token == self.session_token and resumed and resumed.isdigit():
+            acked = int(resumed)
+            entry = next((candidate for candidate in (self.checkpoint, *self.in_flight)
+                          if candidate and candidate[0] == acked
+                          and candidate[2] == self.encoder.generation), None)
+        self.session_token = token
+        if entry is None:
+            self.in_flight.clear()
+            self.checkpoint = None
+            self.encoder.reset()
+            return False
+        # ما أكده الخادم قبل الانقطاع ولم يصلنا تأكيده لا يُعاد إرساله
+        self.handle_ack(entry[0])
+        self.in_flight.clear()
+        self.encoder.resume(entry[3])
+        return True
+
+    def receive_acks(self, ws, timeout):
+        """انتظار التأكيدات حتى موعد العينة التالية دون حجب الإرسال"""
+        if self.in_flight and time.time() - self.in_flight[0][1] > self.ack_timeout:
+            raise TimeoutError("انتهت مهلة انتظار التأكيد")
+        if not select.select([ws.sock], [], [], timeout)[0]:
+            return
+        # ping/pong تُعاد هنا كـ"لا بيانات" بدل أن يحجب recv() حتى إطار بيانات قد لا يأتي
+        opcode, data = ws.recv_data(control_frame=True)
+        if opcode in (ABNF.OPCODE_PING, ABNF.OPCODE_PONG):
+            return
+        if opcode == ABNF.OPCODE_CLOSE:
+            raise ConnectionError("أغلق الخادم الاتصال")
+        decrypted = self.encryptor.decrypt_bytes(data)
+        kind = wire.frame_kind(decrypted)
+        if kind == wire.FRAME_ACK:
+            seq = wire.decode_ack(decrypted)
+            self.handle_ack(seq)
+            self.message_received.emit(f"رسالة من الخادم: تأكيد الاستلام حتى #{seq}")
+        elif kind == wire.FRAME_POLICY:
+            min_interval, max_interval = wire.decode_policy(decrypted)
+            self.collector.set_policy(min_interval, max_interval)
+            if min_interval or max_interval:
+                self.message_received.emit(
+                    f"سياسة أخذ العينات من الخادم: {min_interval}-{max_interval} ثانية")
+        else:
+            self.message_received.emit(f"رسالة من الخادم: {decrypted.decode()}")
+
+    def send_json(self, ws, latest):
+        """المسار الاحتياطي: أحدث عينة JSON فقط ثم انتظار الرد"""
+        seq, (timestamp, ram_data, net_data) = latest
+        data = {
+            # بالمللي ثانية مثل الصيغة الثنائية
+            "timestamp": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "ram": ram_data,
+            "network": net_data
+        }
+        payload = json.dumps(data).encode()
+        logging.info(f"البيانات قبل التشفير: {payload}")
+        print(f"البيانات قبل التشفير: {payload}")
+        self.send(ws, payload)
+        message = ws.recv()
+        decrypted = self.encryptor.decrypt_data(message)
+        print(f"استقبال: {decrypted}")
+        self.message_received.emit(f"رسالة من الخادم: {decrypted}")
+        self.handle_ack(seq)
+
+    def start(self):
+        """تشغيل خيط الاتصال إن لم يكن يعمل"""
+        if self.thread is None or not self.thread.is_alive():
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name="uplink", daemon=True)
+            self.thread.start()
+        return self
+
+    def _abort(self):
+        ws = self.ws
+        if ws is not None:
+            try:
+                ws.abort()
+            except Exception:
+                pass
+
+    def reconnect(self):
+        """إعادة اتصال فورية (زر الواجهة) على نفس الخيط"""
+        self.backoff.reset()
+        self._abort()
+        self._wake.set()
+        self.start()
+
+    def stop(self):
+        self.running = False
+        self._abort()
+        self._wake.set()
+
+    def wait_reconnect(self):
+        delay = self.backoff.next()
+        message = f"إعادة المحاولة بعد {delay:.1f} ثانية (المحاولة {self.backoff.attempts})"
+        logging.info(message)
+        self.message_received.emit(message)
+        self._wake.wait(delay)
+        self._wake.clear()
 
     def run(self):
+        self.collector.start()
         while self.running:
             ws = WebSocket()
+            self.ws = ws
             try:
                 logging.info(f"الاتصال بـ {self.url}")
                 print(f"الاتصال بـ {self.url}")
-                ws.connect(self.url)
+                header = [f"{wire.WIRE_HEADER}: {wire.WIRE_VERSION}",
+                          f"{wire.DEVICE_HEADER}: {self.device_id}"]
+                if self.binary_wire:
+                    header.append(f"{wire.SESSION_HEADER}: {self.session_token or wire.SESSION_NEW}")
+                    if self.collector.sampler is not None:
+                        header.append(f"{wire.SAMPLING_HEADER}: {wire.SAMPLING_ADAPTIVE}")
+                ws.connect(self.url, subprotocols=self.subprotocols, header=header)
+                headers = ws.getheaders() or {}
+                # الصيغة الثنائية فقط إذا أكدها الخادم، وإلا JSON
+                use_binary = self.binary_wire and headers.get(
+                    wire.WIRE_HEADER.lower()) == wire.WIRE_VERSION
+                resumed = use_binary and self.start_session(headers)
+                # جلسة تشفير واحدة لكل اتصال، أو نفس الجلسة عند الاستئناف بنفس الخوارزمية
+                if not (resumed and self.encryptor and self.encryptor.mode == ws.getsubprotocol()):
+                    self.encryptor = CipherSession(self.keyring, ws.getsubprotocol())
+                if not use_binary:
+                    self.encoder.reset()
+                    self.in_flight.clear()
+                # إعادة إرسال كل ما لم يُؤكد
+                self.send_seq = self.spool.first_seq
                 self.connection_status.emit(True)
+                if resumed:
+                    self.message_received.emit(f"استئناف الجلسة بعد #{self.send_seq - 1}")
                 while self.running:
                     try:
-                        # جمع بيانات الرامات
-                        memory = psutil.virtual_memory()
-                        ram_data = {
-                            "total": round(memory.total / (1024 ** 3), 2),  # GB
-                            "used": round(memory.used / (1024 ** 3), 2),    # GB
-                            "percent": memory.percent
-                        }
-                        
-                        # جمع بيانات الشبكة
-                        net_connections = psutil.net_connections()
-                        net_data = [
-                            {
-                                "local_addr": f"{conn.laddr.ip}:{conn.laddr.port}",
-                                "remote_addr": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A",
-                                "status": conn.status
-                            } for conn in net_connections if conn.status == "ESTABLISHED"
-                        ]
-                        
-                        # تجميع البيانات
-                        data = {
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "ram": ram_data,
-                            "network": net_data[:5]  # الحد الأقصى 5 اتصالات
-                        }
-                        data_str = json.dumps(data)
-                        
-                        logging.info(f"البيانات قبل التشفير: {data_str}")
-                        print(f"البيانات قبل التشفير: {data_str}")
-                        encrypted_data = self.encryptor.encrypt_data(data_str)
-                        print(f"إرسال مشفر: {encrypted_data}")
-                        ws.send(encrypted_data)
-                        message = ws.recv()
-                        decrypted = self.encryptor.decrypt_data(message)
-                        print(f"استقبال: {decrypted}")
-                        self.message_received.emit(f"رسالة من الخادم: {decrypted}")
-                        time.sleep(2)  # تأخير لمنع [WinError 10054]
+                        if use_binary:
+                            replay_wait = self.send_batches(ws)
+                            timeout = self.wait_time()
+                            if replay_wait is not None:
+                                timeout = min(timeout, replay_wait)
+                            self.receive_acks(ws, timeout)
+                        else:
+                            latest = self.spool.latest
+                            if latest and latest[0] > self.spool.acked:
+                                self.send_json(ws, latest)
+                            time.sleep(self.wait_time())  # تأخير لمنع [WinError 10054]
                     except Exception as e:
                         error_msg = f"خطأ في الإرسال أو الاستقبال: {str(e)}"
                         logging.error(error_msg)
                         print(error_msg)
                         self.message_received.emit(error_msg)
-                        if "10054" in str(e):
-                            self.connection_status.emit(False)
-                            time.sleep(5)  # إعادة المحاولة
-                            break
-                        else:
-                            self.connection_status.emit(False)
-                            break
+                        self.connection_status.emit(False)
+                        break
             except Exception as e:
                 error_msg = f"لا يمكن الاتصال: {str(e)}"
                 logging.error(error_msg)
                 print(error_msg)
                 self.message_received.emit(error_msg)
                 self.connection_status.emit(False)
-                time.sleep(5)
             finally:
+                self.ws = None
                 ws.close()
+            if self.running:
+                self.wait_reconnect()
 
 def main():
     try:
         app = QApplication(sys.argv)
-        window = MainWindow()
+        # جامع واحد للواجهة ولمرسل البيانات؛ الفترة تتكيف مع تقلب القياسات
+        collector = MetricsCollector.shared(interval=2, sampler=AdaptiveSampler()).start()
+        app.aboutToQuit.connect(collector.stop)
+        window = MainWindow(collector)
         window.show()
 
         # WebSocket
-        ws_client = WebSocketClient("ws://localhost:12345")
+        ws_client = WebSocketClient("ws://localhost:12345", collector=collector)
         ws_client.message_received.connect(window.log_message)
         ws_client.connection_status.connect(window.update_connection_status)
-        ws_thread = threading.Thread(target=ws_client.run)
-        ws_thread.daemon = True
-        ws_thread.start()
+        window.set_websocket_client(ws_client)
+        app.aboutToQuit.connect(ws_client.stop)
+        app.aboutToQuit.connect(ws_client.spool.close)
+        ws_client.start()
 
         sys.exit(app.exec_())
     except Exception as e:
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+from utils.metrics import AdaptiveSampler, MetricsSnapshot
+
+def snapshot(ram, cpu=10.0, ports=()):
+    connections = tuple(SimpleNamespace(laddr=("10.0.0.2", port), raddr=("10.0.0.1", 443), pid=1)
+                        for port in ports)
+    return MetricsSnapshot(0.0, SimpleNamespace(percent=ram), cpu, connections)
+
+def test_interval_grows_when_quiet_and_drops_on_change():
+    sampler = AdaptiveSampler(min_interval=0.5, max_interval=10.0, growth=2.0)
+    assert sampler.next(snapshot(50.0)) == 0.5
+    intervals = [sampler.next(snapshot(50.0)) for _ in range(6)]
+    assert intervals == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    # تغير متوسط يقسم الفترة، وكبير يعيدها للحد الأدنى
+    assert sampler.next(snapshot(51.2)) == 5.0
+    assert sampler.next(snapshot(51.2, cpu=40.0)) == 0.5
+    assert sampler.volatility == 1.5
+
+def test_connection_churn_counts_as_volatility():
+    sampler = AdaptiveSampler(conn_step=4, growth=2.0)
+    sampler.next(snapshot(50.0, ports=(1, 2, 3)))
+    sampler.next(snapshot(50.0, ports=(1, 2, 3)))
+    assert sampler.next(snapshot(50.0, ports=(1, 4, 5))) == sampler.min_interval
+    assert sampler.volatility == 1.0
+
+def test_server_bounds_clamp_and_reset():
+    sampler = AdaptiveSampler(min_interval=0.5, max_interval=10.0, growth=2.0)
+    sampler.next(snapshot(50.0))
+    sampler.set_bounds(2.0, 3.0)
+    assert sampler.interval == 2.0
+    assert [sampler.next(snapshot(50.0)) for _ in range(3)] == [3.0, 3.0, 3.0]
+    sampler.set_bounds(0, 0)
+    assert (sampler.min_interval, sampler.max_interval) == (0.5, 10.0)
+    # حد أعلى أصغر من الأدنى يُرفع إليه
+    sampler.set_bounds(5.0, 1.0)
+    assert sampler.max_interval == 5.0 and sampler.interval == 5.0
@@ -0,0 +1,31 @@
+import random
+from utils.reconnect import Backoff
+
+def test_delays_grow_within_bounds():
+    backoff = Backoff(base=1.0, cap=30.0, rng=random.Random(3))
+    previous = backoff.base
+    for _ in range(200):
+        delay = backoff.next()
+        assert backoff.base <= delay <= min(backoff.cap, previous * 3)
+        previous = delay
+    assert backoff.attempts == 200
+
+def test_reset_starts_from_base():
+    backoff = Backoff(base=0.5, cap=60.0, rng=random.Random(4))
+    for _ in range(20):
+        backoff.next()
+    backoff.reset()
+    assert backoff.attempts == 0
+    assert backoff.next() <= 1.5
+
+def test_devices_spread_after_restart():
+    # ألف جهاز انقطعت في نفس اللحظة: المحاولة الخامسة لا تتكدس في نفس الثانية
+    totals = []
+    for seed in range(1000):
+        backoff = Backoff(base=1.0, cap=60.0, rng=random.Random(seed))
+        totals.append(sum(backoff.next() for _ in range(5)))
+    per_second = {}
+    for total in totals:
+        per_second[int(total)] = per_second.get(int(total), 0) + 1
+    assert max(per_second.values()) < 100
+    assert max(totals) - min(totals) > 30
@@ -0,0 +1,49 @@
+import numpy as np
+from utils.ring_buffer import MetricHistory, decimate
+
+def test_window_after_wraparound():
+    history = MetricHistory(("ram", "cpu"), capacity=8)
+    assert history.latest_ts() is None
+    for i in range(13):
+        history.append(float(i), (i, 100 - i))
+    assert history.count == 8 and history.version == 13
+    assert history.latest_ts() == 12.0
+    ts, values = history.window(7.5)
+    assert ts.tolist() == [8.0, 9.0, 10.0, 11.0, 12.0]
+    assert values[0].tolist() == [8, 9, 10, 11, 12]
+    assert values[1].tolist() == [92, 91, 90, 89, 88]
+    # بداية النافذة في الجزء الأقدم من الحلقة
+    assert history.window(5.0)[0].tolist() == [5.0, 6.0, 7.0, 8.0, 9.0, 10.0, 11.0, 12.0]
+    assert history.window(100.0)[0].tolist() == []
+
+def test_window_before_wraparound():
+    history = MetricHistory(("ram",), capacity=8)
+    for i in range(5):
+        history.append(float(i), (i,))
+    assert history.window(2.0)[0].tolist() == [2.0, 3.0, 4.0]
+
+def test_decimate_matches_reference_min_max():
+    rng = np.random.default_rng(5)
+    ts = np.sort(rng.uniform(0, 100, 5000))
+    values = rng.normal(size=(2, 5000)).astype(np.float32)
+    # فجوة بلا بيانات تنتج أعمدة فارغة لا تظهر في الناتج
+    keep = (ts < 40) | (ts > 60)
+    ts, values = ts[keep], values[:, keep]
+    centers, lows, highs = decimate(ts, values, 0.0, 100.0, 50)
+    edges = np.linspace(0.0, 100.0, 51)
+    expected = [(column, values[:, (ts >= edges[column]) & (ts < edges[column + 1])])
+                for column in range(50)]
+    expected = [(column, chunk) for column, chunk in expected if chunk.shape[1]]
+    assert len(centers) == len(expected) < 50
+    for index, (column, chunk) in enumerate(expected):
+        assert centers[index] == (edges[column] + edges[column + 1]) / 2
+        assert np.array_equal(lows[:, index], chunk.min(axis=1))
+        assert np.array_equal(highs[:, index], chunk.max(axis=1))
+
+def test_decimate_includes_end_and_handles_empty():
+    ts = np.array([0.0, 5.0, 10.0])
+    values = np.array([[1.0, 2.0, 3.0]])
+    centers, lows, highs = decimate(ts, values, 0.0, 10.0, 2)
+    assert lows.tolist() == [[1.0, 2.0]] and highs.tolist() == [[1.0, 3.0]]
+    centers, lows, highs = decimate(ts, values, 20.0, 30.0, 4)
+    assert len(centers) == 0 and lows.shape == (1, 0)
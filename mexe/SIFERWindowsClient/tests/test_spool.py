@@ -0,0 +1,99 @@
+import os
+from utils.spool import Spool, FSYNC_NEVER
+
+def sample(i):
+    return [1760000000 + i, {"total": 16.0, "used": 8.0, "percent": 50.0}, []]
+
+def test_append_read_ack(tmp_path):
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    seqs = [spool.append(sample(i)) for i in range(10)]
+    assert seqs == list(range(1, 11))
+    assert [seq for seq, _ in spool.read(1, 4)] == [1, 2, 3, 4]
+    # القراءة المتتالية تكمل من المؤشر
+    assert [seq for seq, _ in spool.read(5, 100)] == list(range(5, 11))
+    assert spool.read(3, 1) == [(3, sample(2))]
+    spool.ack(6)
+    assert spool.first_seq == 7
+    assert spool.backlog() == 4
+    # تأكيد قديم لا يرجع نقطة التحقق
+    spool.ack(2)
+    assert spool.first_seq == 7
+    spool.close()
+
+def test_reopen_keeps_unacked(tmp_path):
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    for i in range(10):
+        spool.append(sample(i))
+    spool.ack(4)
+    spool.close()
+
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    assert spool.first_seq == 5
+    assert spool.append(sample(10)) == 11
+    assert [seq for seq, _ in spool.read(spool.first_seq, 100)] == list(range(5, 12))
+    spool.close()
+
+def test_reopen_after_truncated_record(tmp_path):
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    for i in range(5):
+        spool.append(sample(i))
+    spool.close()
+    # انقطاع أثناء كتابة آخر سجل
+    path = spool.segments[-1].path
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    assert spool.stats()["truncated"] == 1
+    assert [record for _, record in spool.read(1, 100)] == [sample(i) for i in range(4)]
+    # السجل المقطوع يُعاد استخدام تسلسله
+    assert spool.append(sample(99)) == 5
+    assert spool.read(5, 1) == [(5, sample(99))]
+    spool.close()
+
+def test_ack_drops_segments(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=256, fsync=FSYNC_NEVER)
+    for i in range(40):
+        spool.append(sample(i))
+    segments = len(spool.segments)
+    assert segments > 2
+    spool.ack(40)
+    assert len(spool.segments) == 1
+    assert spool.backlog() == 0
+    spool.close()
+
+def test_evicts_oldest_when_full(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=256, max_bytes=1024, fsync=FSYNC_NEVER)
+    for i in range(100):
+        spool.append(sample(i))
+    stats = spool.stats()
+    assert stats["bytes"] <= 1024 + 256
+    assert stats["evicted"] > 0
+    records = spool.read(spool.first_seq, 1000)
+    # الأحدث باقٍ والتسلسل متصل
+    assert records[-1] == (100, sample(99))
+    assert [seq for seq, _ in records] == list(range(records[0][0], 101))
+    assert stats["evicted"] == records[0][0] - 1
+    spool.close()
+
+def test_reopen_when_ack_is_ahead_of_lost_tail(tmp_path):
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    sizes = []
+    for i in range(5):
+        spool.append(sample(i))
+        sizes.append(spool.segments[-1].size)
+    spool.ack(5)
+    spool.close()
+    # التأكيد وصل للقرص لكن آخر سجلين لم يصلا
+    with open(spool.segments[-1].path, "r+b") as f:
+        f.truncate(sizes[2])
+
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    assert spool.first_seq == 6
+    assert [spool.append(sample(i)) for i in range(5, 8)] == [6, 7, 8]
+    spool.close()
+
+    spool = Spool(str(tmp_path), fsync=FSYNC_NEVER)
+    assert spool.stats()["truncated"] == 0
+    assert spool.read(spool.first_seq, 100) == [(6, sample(5)), (7, sample(6)), (8, sample(7))]
+    spool.close()
\ No newline at end of file
@@ -0,0 +1,93 @@
+import logging
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF, QFont
+from utils.ring_buffer import decimate
+
+class HistoryChart(QWidget):
+    """رسم تاريخ مقياس أو أكثر من MetricHistory
+
+    البيانات تُختزل إلى عرض الرسم (الأدنى والأقصى لكل عمود بكسل) فقط عندما يتغير
+    التاريخ أو الحجم أو النافذة؛ الرسم نفسه يعيد استخدام المضلعات المحسوبة فتبقى
+    كلفته ثابتة مهما طالت النافذة. series قائمة (اسم المقياس، اللون)."""
+
+    MARGIN = 6
+
+    def __init__(self, history, series, window_seconds=3600, y_range=None, unit="", parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.series = [(history.index[name], QColor(color)) for name, color in series]
+        self.window_seconds = window_seconds
+        # None: المحور الرأسي يتبع أعلى قيمة في النافذة
+        self.y_range = y_range
+        self.unit = unit
+        self._polygons = []
+        self._scale = (0.0, 1.0)
+        self._key = None
+        self.setMinimumHeight(120)
+        # عدادات
+        self.rebuilds = 0
+
+    def set_window(self, seconds):
+        self.window_seconds = seconds
+        self.update()
+
+    def refresh(self):
+        """يُستدعى بعد إضافة عينة؛ Qt يدمج الطلبات ولا يرسم الودجت المخفي"""
+        self.update()
+
+    def _rebuild(self, area):
+        self.rebuilds += 1
+        self._polygons = []
+        end = self.history.latest_ts()
+        if end is None:
+            return
+        start = end - self.window_seconds
+        ts, values = self.history.window(start)
+        rows = [row for row, _ in self.series]
+        centers, lows, highs = decimate(ts, values[rows], start, end, max(1, int(area.width())))
+        if self.y_range is not None:
+            low, high = self.y_range
+        else:
+            low, high = 0.0, max(1.0, float(highs.max()) if highs.size else 1.0) * 1.1
+        self._scale = (low, high)
+        if not len(centers):
+            return
+        x = area.left() + (centers - start) / self.window_seconds * area.width()
+        y_scale = area.height() / (high - low)
+        for index, (_, color) in enumerate(self.series):
+            top = area.bottom() - (highs[index] - low) * y_scale
+            bottom = area.bottom() - (lows[index] - low) * y_scale
+            # غلاف الأقصى ذهاباً ثم الأدنى إياباً: شريط يظهر القمم التي يخفيها المتوسط
+            points = [QPointF(px, py) for px, py in zip(x.tolist(), top.tolist())]
+            points += [QPointF(px, py) for px, py in zip(x[::-1].tolist(), bottom[::-1].tolist())]
+            self._polygons.append((color, QPolygonF(points)))
+
+    def paintEvent(self, event):
+        try:
+            area = QRectF(self.rect()).adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+            key = (self.history.version, self.window_seconds, area.width(), area.height())
+            if key != self._key:
+                self._rebuild(area)
+                self._key = key
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.fillRect(self.rect(), QColor(20, 20, 20, 200))
+            painter.setPen(QPen(QColor(255, 0, 51, 90), 1))
+            painter.drawRect(area)
+            for color, polygon in self._polygons:
+                painter.setPen(QPen(color, 1))
+                fill = QColor(color)
+                fill.setAlpha(70)
+                painter.setBrush(fill)
+                painter.drawPolygon(polygon)
+            painter.setPen(QColor("#E5E5E5"))
+            painter.setFont(QFont("Consolas", 8))
+            low, high = self._scale
+            painter.drawText(area.adjusted(4, 2, -4, -2), Qt.AlignTop | Qt.AlignLeft,
+                             f"{high:.0f}{self.unit}")
+            painter.drawText(area.adjusted(4, 2, -4, -2), Qt.AlignBottom | Qt.AlignLeft,
+                             f"{low:.0f}{self.unit}")
+            painter.end()
+        except Exception as e:
+            logging.error(f"خطأ في رسم التاريخ: {str(e)}")
\ No newline at end of file
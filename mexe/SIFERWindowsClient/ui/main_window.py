@@ -3,73 +3,31 @@ from PyQt5.QtWidgets import (QMainWindow, QTextEdit, QVBoxLayout, QHBoxLayout,
                              QTableWidget, QTableWidgetItem, QPushButton, QComboBox,
                              QFrame, QSplitter, QTabWidget, QMessageBox, QFileDialog,
                              QGroupBox, QScrollArea)
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QPropertyAnimation, QEasingCurve
+from PyQt5.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QFont, QPixmap, QPalette, QColor, QIcon, QMovie
 from datetime import datetime
 import logging
 import psutil
-import socket
-import subprocess
 import json
 import os
 import time
+from utils.net_monitor import NetworkMonitor, DISCONNECTED
+from utils.metrics import MetricsCollector
+from utils.ring_buffer import MetricHistory
+from ui.history_chart import HistoryChart
 
 logging.basicConfig(filename="main_window.log", level=logging.INFO,
                     format="%(asctime)s - %(levelname)s - %(message)s")
 
-class SystemMonitorThread(QThread):
-    """خيط مراقبة النظام"""
-    ram_updated = pyqtSignal(dict)
-    network_updated = pyqtSignal(list)
-    cpu_updated = pyqtSignal(float)
-   
-    def run(self):
-        while True:
-            try:
-                # مراقبة الرامات
-                memory = psutil.virtual_memory()
-                ram_data = {
-                    'percent': memory.percent,
-                    'used': memory.used // (1024**3),  # GB
-                    'total': memory.total // (1024**3),  # GB
-                    'available': memory.available // (1024**3)  # GB
-                }
-                self.ram_updated.emit(ram_data)
-               
-                # مراقبة المعالج
-                cpu_percent = psutil.cpu_percent(interval=1)
-                self.cpu_updated.emit(cpu_percent)
-               
-                # مراقبة الشبكة
-                connections = []
-                try:
-                    for conn in psutil.net_connections(kind='inet'):
-                        if conn.status == 'ESTABLISHED':
-                            local_addr = f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else "N/A"
-                            remote_addr = f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A"
-                            connections.append({
-                                'local': local_addr,
-                                'remote': remote_addr,
-                                'status': conn.status,
-                                'pid': conn.pid or 'N/A'
-                            })
-                except:
-                    pass
-               
-                self.network_updated.emit(connections)
-                self.msleep(2000)  # تحديث كل ثانيتين
-               
-            except Exception as e:
-                logging.error(f"خطأ في SystemMonitorThread: {str(e)}")
-                self.msleep(5000)
-
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, collector=None):
         super().__init__()
         try:
+            self.collector = collector or MetricsCollector.shared()
             self.connection_status = False
-            self.ram_history = []
-            self.cpu_history = []
+            # تاريخ ثابت الحجم لكل المقاييس (ساعات بحسب فترة أخذ العينات)
+            self.history = MetricHistory(("ram", "cpu", "connections"))
+            self.history_charts = []
             self.log_messages = []
             self.ws_client = None
             self.last_ram_warning = 0  # وقت آخر تحذير للرامات
@@ -328,8 +286,32 @@ class MainWindow(QMainWindow):
             value_widget.setObjectName("statsValue")
             self.stats_labels[key] = value_widget
             stats_layout.addWidget(value_widget, row, col + 1)
-       
+
+        # الرسوم: نافذة قابلة للاختيار من نفس التاريخ دون إعادة جمع
+        row = (len(stats_items) + 1) // 2
+        self.history_window = QComboBox()
+        self.history_window.setObjectName("historyWindow")
+        for title, seconds in (("10 دقائق", 600), ("ساعة", 3600), ("6 ساعات", 21600), ("24 ساعة", 86400)):
+            self.history_window.addItem(title, seconds)
+        self.history_window.setCurrentIndex(1)
+        self.history_window.currentIndexChanged.connect(self.set_history_window)
+        stats_layout.addWidget(QLabel("نافذة الرسم:"), row, 0)
+        stats_layout.addWidget(self.history_window, row, 1)
+
+        usage_chart = HistoryChart(self.history, [("ram", "#00FF88"), ("cpu", "#00FFFF")],
+                                   y_range=(0, 100), unit="%")
+        connections_chart = HistoryChart(self.history, [("connections", "#FFB300")])
+        self.history_charts = [usage_chart, connections_chart]
+        stats_layout.addWidget(QLabel("الرامات والمعالج:"), row + 1, 0, 1, 4)
+        stats_layout.addWidget(usage_chart, row + 2, 0, 1, 4)
+        stats_layout.addWidget(QLabel("الاتصالات:"), row + 3, 0, 1, 4)
+        stats_layout.addWidget(connections_chart, row + 4, 0, 1, 4)
+
         return stats_widget
+
+    def set_history_window(self, index):
+        for chart in self.history_charts:
+            chart.set_window(self.history_window.itemData(index))
    
     def setup_status_bar(self):
         """إعداد شريط الحالة"""
@@ -348,12 +330,32 @@ class MainWindow(QMainWindow):
         self.statusBar.showMessage("جاري تهيئة النظام...")
    
     def setup_system_monitor(self):
-        """إعداد مراقب النظام"""
-        self.system_thread = SystemMonitorThread()
-        self.system_thread.ram_updated.connect(self.update_ram_info)
-        self.system_thread.network_updated.connect(self.update_network_table)
-        self.system_thread.cpu_updated.connect(self.update_cpu_info)
-        self.system_thread.start()
+        """الاشتراك في لقطات الجامع المشترك بدل خيط قياس خاص بالواجهة"""
+        self.collector.snapshot_ready.connect(self.update_metrics)
+        self.collector.start()
+
+    def update_metrics(self, snapshot):
+        """توزيع لقطة واحدة على لوحات الرامات والمعالج والشبكة"""
+        memory = snapshot.memory
+        self.update_ram_info({
+            'percent': memory.percent,
+            'used': memory.used // (1024**3),  # GB
+            'total': memory.total // (1024**3),  # GB
+            'available': memory.available // (1024**3)  # GB
+        })
+        self.update_cpu_info(snapshot.cpu_percent)
+        self.update_network_table([
+            {
+                'local': f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else "N/A",
+                'remote': f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A",
+                'status': conn.status,
+                'pid': conn.pid or 'N/A'
+            } for conn in snapshot.connections
+        ])
+        self.history.append(snapshot.ts, (memory.percent, snapshot.cpu_percent,
+                                          len(snapshot.connections)))
+        for chart in self.history_charts:
+            chart.refresh()
    
     def setup_timers(self):
         """إعداد المؤقتات"""
@@ -362,10 +364,10 @@ class MainWindow(QMainWindow):
         self.time_timer.timeout.connect(self.update_time)
         self.time_timer.start(1000)
        
-        # مؤقت تحديث معلومات الشبكة
-        self.network_info_timer = QTimer()
-        self.network_info_timer.timeout.connect(self.update_network_info)
-        self.network_info_timer.start(5000)
+        # معلومات الشبكة: لقطة مشتركة تُحدّث عند تغير الحالة بدل فحص دوري في خيط الواجهة
+        self.network_monitor = NetworkMonitor.shared(interval=5).start()
+        self.network_monitor.state_changed.connect(self.update_network_info)
+        self.update_network_info(self.network_monitor.snapshot())
        
         # مؤقت تحديث الإحصائيات
         self.stats_timer = QTimer()
@@ -586,11 +588,8 @@ class MainWindow(QMainWindow):
         """إعادة الاتصال بالخادم"""
         try:
             if self.ws_client:
-                self.ws_client.running = False
-                self.log_message("إيقاف الاتصال الحالي...")
-                self.msleep(1000)  # انتظار لإغلاق الخيط
-                self.ws_client.running = True
-                threading.Thread(target=self.ws_client.run, daemon=True).start()
+                # نفس خيط الاتصال: يُغلق الاتصال الحالي ويُعاد فوراً دون انتظار التأخير
+                self.ws_client.reconnect()
                 self.log_message("محاولة إعادة الاتصال بالخادم...")
         except Exception as e:
             error_msg = f"خطأ في إعادة الاتصال: {str(e)}"
@@ -664,11 +663,6 @@ class MainWindow(QMainWindow):
                 self.ram_progress.setStyleSheet("""
                     QProgressBar::chunk { background-color: #00FF88; }
                 """)
-               
-            # حفظ التاريخ للرسم البياني
-            if len(self.ram_history) > 60:  # الاحتفاظ بآخر 60 قراءة (دقيقتين)
-                self.ram_history.pop(0)
-            self.ram_history.append(percent)
            
         except Exception as e:
             logging.error(f"خطأ في تحديث معلومات RAM: {str(e)}")
@@ -701,11 +695,6 @@ class MainWindow(QMainWindow):
                     QProgressBar::chunk { background-color: #00FFFF; }
                 """)
            
-            # حفظ التاريخ
-            if len(self.cpu_history) > 60:
-                self.cpu_history.pop(0)
-            self.cpu_history.append(cpu_percent)
-           
         except Exception as e:
             logging.error(f"خطأ في تحديث معلومات CPU: {str(e)}")
             self.log_message(f"خطأ في تحديث معلومات CPU: {str(e)}", "الأخطاء")
@@ -732,36 +721,14 @@ class MainWindow(QMainWindow):
             logging.error(f"خطأ في تحديث جدول الشبكة: {str(e)}")
             self.log_message(f"خطأ في تحديث جدول الشبكة: {str(e)}", "الأخطاء")
 
-    def update_network_info(self):
-        """تحديث معلومات الشبكة"""
+    def update_network_info(self, state):
+        """تحديث معلومات الشبكة من لقطة NetworkMonitor عند تغيرها"""
         try:
-            # الحصول على IP
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                sock.connect(("8.8.8.8", 80))
-                ip = sock.getsockname()[0]
-                sock.close()
-                self.ip_label.setText(f"IP: {ip}")
-            except:
-                self.ip_label.setText("IP: غير متاح")
-           
-            # الحصول على معلومات Wi-Fi (Windows)
-            try:
-                result = subprocess.run(['netsh', 'wlan', 'show', 'interfaces'],
-                                      capture_output=True, text=True, encoding='cp1256')
-                if result.returncode == 0:
-                    for line in result.stdout.split('\n'):
-                        if 'SSID' in line and ':' in line:
-                            ssid = line.split(':')[-1].strip()
-                            if ssid and ssid != "":
-                                self.wifi_label.setText(f"شبكة Wi-Fi: {ssid}")
-                                break
-                    else:
-                        self.wifi_label.setText("شبكة Wi-Fi: غير متصل")
-                else:
-                    self.wifi_label.setText("شبكة Wi-Fi: خطأ في الوصول")
-            except:
-                self.wifi_label.setText("شبكة Wi-Fi: غير متاح")
+            self.ip_label.setText(f"IP: {state.ip or 'غير متاح'}")
+            if state.status == DISCONNECTED:
+                self.wifi_label.setText("شبكة Wi-Fi: غير متصل")
+            else:
+                self.wifi_label.setText(f"شبكة Wi-Fi: {state.ssid}")
                
         except Exception as e:
             logging.error(f"خطأ في تحديث معلومات الشبكة: {str(e)}")
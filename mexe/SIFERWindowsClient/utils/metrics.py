@@ -0,0 +1,171 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+import psutil
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# لقطة واحدة للنظام في كل نبضة؛ غير قابلة للتعديل فتُمرر لكل المشتركين بلا نسخ
+# connections: اتصالات ESTABLISHED فقط كما يعيدها psutil
+MetricsSnapshot = namedtuple("MetricsSnapshot", "ts memory cpu_percent connections")
+
+class AdaptiveSampler:
+    """فترة أخذ العينات حسب تقلب القياسات
+
+    التقلب أكبر نسبة من: تغير الرامات / ram_step، تغير المعالج / cpu_step، عدد
+    الاتصالات المفتوحة والمغلقة / conn_step. عند 1 أو أكثر تنزل الفترة فوراً إلى
+    min_interval، وعند النصف تُقسم على 2، وما دون ذلك تطول بمعامل growth حتى
+    max_interval. الخادم يستطيع فرض الحدود لكل جهاز (set_bounds)."""
+
+    def __init__(self, min_interval=0.5, max_interval=10.0, ram_step=2.0, cpu_step=20.0,
+                 conn_step=4, growth=1.5):
+        self.defaults = (min_interval, max_interval)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.ram_step = ram_step
+        self.cpu_step = cpu_step
+        self.conn_step = conn_step
+        self.growth = growth
+        self.interval = min_interval
+        self.volatility = 0.0
+        self._previous = None
+        self._keys = frozenset()
+
+    def set_bounds(self, min_interval, max_interval):
+        """حدود من الخادم؛ (0, 0) تعيد الحدود الافتراضية"""
+        if not min_interval and not max_interval:
+            min_interval, max_interval = self.defaults
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+    def next(self, snapshot):
+        """الفترة حتى العينة التالية بعد snapshot"""
+        keys = frozenset((conn.laddr, conn.raddr, conn.pid) for conn in snapshot.connections)
+        previous = self._previous
+        if previous is None:
+            volatility = 1.0
+        else:
+            volatility = max(abs(snapshot.memory.percent - previous.memory.percent) / self.ram_step,
+                             abs(snapshot.cpu_percent - previous.cpu_percent) / self.cpu_step,
+                             len(keys ^ self._keys) / self.conn_step)
+        self._previous = snapshot
+        self._keys = keys
+        self.volatility = volatility
+        if volatility >= 1.0:
+            interval = self.min_interval
+        elif volatility >= 0.5:
+            interval = self.interval / 2
+        else:
+            interval = self.interval * self.growth
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval
+
+class MetricsCollector(QObject):
+    """جامع القياسات الوحيد في العميل
+
+    يقرأ الذاكرة والمعالج والاتصالات مرة واحدة كل interval ثانية في خيط مستقل
+    وينشر اللقطة نفسها للواجهة (snapshot_ready) ولمرسل البيانات (subscribe).
+    المعالج يُقاس بـ cpu_percent(None) بين نبضتين بدل حجب ثانية كاملة.
+    مع sampler (AdaptiveSampler) تتغير الفترة بعد كل لقطة حسب تقلب القياسات."""
+
+    snapshot_ready = pyqtSignal(object)
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, interval=2.0, sampler=None):
+        super().__init__()
+        self.interval = interval
+        self.sampler = sampler
+        self.latest = None
+        self.next_due = time.time()
+        self.subscribers = []
+        self._stop = threading.Event()
+        # يوقظ الخيط قبل موعده عند تغير السياسة أو الإيقاف
+        self._wake = threading.Event()
+        self.thread = None
+        # عدادات
+        self.collected = 0
+        self.collect_seconds = 0.0
+
+    @classmethod
+    def shared(cls, **options):
+        """الجامع المشترك في العملية؛ يُنشأ عند أول طلب"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(**options)
+            return cls._shared
+
+    def subscribe(self, callback):
+        """callback(snapshot) يُستدعى من خيط الجامع؛ يجب ألا يحجب"""
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def collect(self):
+        started = time.perf_counter()
+        try:
+            connections = tuple(conn for conn in psutil.net_connections(kind="inet")
+                                if conn.status == psutil.CONN_ESTABLISHED)
+        except (psutil.AccessDenied, OSError) as e:
+            logging.error(f"خطأ في قراءة اتصالات الشبكة: {str(e)}")
+            connections = ()
+        snapshot = MetricsSnapshot(time.time(), psutil.virtual_memory(),
+                                   psutil.cpu_percent(interval=None), connections)
+        self.collected += 1
+        self.collect_seconds += time.perf_counter() - started
+        return snapshot
+
+    def publish(self, snapshot):
+        self.latest = snapshot
+        for callback in list(self.subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                error_msg = f"خطأ في مشترك القياسات: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
+        self.snapshot_ready.emit(snapshot)
+
+    def set_policy(self, min_interval, max_interval):
+        """حدود الفترة من الخادم؛ تُطبق فوراً دون انتظار العينة المجدولة"""
+        if self.sampler is None:
+            return
+        self.sampler.set_bounds(min_interval, max_interval)
+        self.interval = self.sampler.interval
+        self.next_due = min(self.next_due, time.time() + self.interval)
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                snapshot = self.collect()
+                if self.sampler is not None:
+                    self.interval = self.sampler.next(snapshot)
+                self.publish(snapshot)
+            except Exception as e:
+                logging.error(f"خطأ في MetricsCollector: {str(e)}")
+            self.next_due += self.interval
+            # بعد توقف طويل (سبات الجهاز) لا تُجمع النبضات الفائتة دفعة واحدة
+            self.next_due = max(self.next_due, time.time())
+            while not self._stop.is_set() and self._wake.wait(max(0.0, self.next_due - time.time())):
+                # set_policy قد قدّم الموعد
+                self._wake.clear()
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        # أول استدعاء يضبط نقطة البداية ويرجع 0.0؛ القراءة التالية هي متوسط النبضة
+        psutil.cpu_percent(interval=None)
+        self.next_due = time.time() + min(self.interval, 0.5)
+        self.thread = threading.Thread(target=self.run, name="metrics", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
\ No newline at end of file
@@ -0,0 +1,25 @@
+import random
+
+class Backoff:
+    """تأخير إعادة الاتصال: أسي مع تشتيت مترابط (decorrelated jitter)
+
+    كل تأخير عشوائي بين base وثلاثة أضعاف السابق، بحد أقصى cap. بعد إعادة تشغيل
+    الخادم تتوزع محاولات الأجهزة على النافذة بدل أن تصل كلها في نفس اللحظة."""
+
+    def __init__(self, base=1.0, cap=60.0, rng=None):
+        self.base = base
+        self.cap = cap
+        self.rng = rng or random.Random()
+        self.delay = base
+        self.attempts = 0
+
+    def next(self):
+        """مدة الانتظار قبل المحاولة التالية بالثواني"""
+        self.attempts += 1
+        self.delay = min(self.cap, self.rng.uniform(self.base, self.delay * 3))
+        return self.delay
+
+    def reset(self):
+        """بعد اتصال ناجح؛ الانقطاع التالي يبدأ من base"""
+        self.delay = self.base
+        self.attempts = 0
\ No newline at end of file
@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+
+class MetricHistory:
+    """تاريخ القياسات في حلقات NumPy ثابتة السعة: الذاكرة لا تتغير مهما طال التشغيل
+
+    عمود وقت (float64) ومصفوفة قيم (float32) بصف لكل مقياس في names؛ الإضافة
+    O(1) والأقدم يُستبدل عند الامتلاء. version يزداد مع كل إضافة لتعرف الرسوم متى
+    تعيد الحساب."""
+
+    def __init__(self, names, capacity=43200):
+        self.names = tuple(names)
+        self.index = {name: row for row, name in enumerate(self.names)}
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((len(self.names), capacity), dtype=np.float32)
+        self.head = 0
+        self.count = 0
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def append(self, ts, values):
+        with self._lock:
+            self.ts[self.head] = ts
+            self.values[:, self.head] = values
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.version += 1
+
+    def latest_ts(self):
+        return self.ts[self.head - 1] if self.count else None
+
+    def window(self, since):
+        """(الأوقات، القيم) منذ since بالترتيب الزمني؛ نسخة بحجم النافذة فقط"""
+        with self._lock:
+            start = self.head - self.count
+            # الأوقات مرتبة داخل الحلقة بعد تدويرها؛ البحث الثنائي على الجزأين
+            if start < 0:
+                older, newer = self.ts[start:], self.ts[:self.head]
+                cut = np.searchsorted(older, since)
+                if cut < len(older):
+                    columns = np.r_[np.arange(start + cut, 0) % self.capacity,
+                                    np.arange(self.head)]
+                else:
+                    columns = np.arange(np.searchsorted(newer, since), self.head)
+            else:
+                columns = np.arange(start + np.searchsorted(self.ts[start:self.head], since),
+                                    self.head)
+            return self.ts[columns], self.values[:, columns]
+
+def decimate(ts, values, t0, t1, columns):
+    """اختزال السلسلة إلى عرض الرسم: (مراكز الأعمدة، الأدنى، الأقصى) لكل عمود بكسل فيه بيانات
+
+    values مصفوفة (المقاييس، النقاط)؛ الكلفة O(النقاط) في NumPy والناتج بحجم
+    columns على الأكثر مهما طال التاريخ."""
+    edges = np.linspace(t0, t1, columns + 1)
+    starts = np.searchsorted(ts, edges[:-1])
+    # نقطة على حد بين عمودين تتبع العمود الأيمن؛ الحد الأخير يشمل t1
+    ends = np.searchsorted(ts, edges[1:])
+    ends[-1] = np.searchsorted(ts, t1, side="right")
+    filled = np.nonzero(ends > starts)[0]
+    if len(filled) == 0:
+        empty = np.empty((values.shape[0], 0), dtype=values.dtype)
+        return np.empty(0), empty, empty
+    # reduceat على بدايات الأعمدة غير الفارغة؛ ما بينها أعمدة فارغة فكل مقطع عمود واحد
+    bounds = starts[filled]
+    lows = np.minimum.reduceat(values, bounds, axis=1)
+    highs = np.maximum.reduceat(values, bounds, axis=1)
+    centers = (edges[filled] + edges[filled + 1]) / 2
+    return centers, lows, highs
\ No newline at end of file
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import threading
+
+# سجل: [الطول][CRC32 للتسلسل والحمولة][التسلسل][الحمولة JSON]
+_RECORD = struct.Struct("<IIQ")
+SEGMENT_SUFFIX = ".spool"
+ACK_FILE = "acked"
+
+# سياسات fsync
+FSYNC_ALWAYS = "always"      # بعد كل سجل: لا يضيع شيء حتى مع انقطاع الكهرباء
+FSYNC_INTERVAL = "interval"  # مرة كل fsync_interval ثانية على الأكثر
+FSYNC_NEVER = "never"        # يُترك للنظام؛ يكفي ضد انهيار العملية فقط
+
+class _Segment:
+    __slots__ = ("first_seq", "path", "size")
+
+    def __init__(self, first_seq, path, size=0):
+        self.first_seq = first_seq
+        self.path = path
+        self.size = size
+
+class Spool:
+    """طابور على القرص للعينات غير المؤكدة، مقسم إلى ملفات (segments) للإلحاق فقط
+
+    التسلسل يستمر عبر إعادة التشغيل. آخر تسلسل مؤكد يُحفظ في ملف صغير يُستبدل
+    ذرياً، وذيل الملف النشط يُتحقق منه بـ CRC عند الفتح ويُقص أي سجل مقطوع.
+    عند تجاوز max_bytes تُحذف أقدم الملفات أولاً. آمن بين الخيوط."""
+
+    def __init__(self, directory, segment_bytes=1 << 20, max_bytes=64 << 20,
+                 fsync=FSYNC_INTERVAL, fsync_interval=1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segments = []
+        self.acked = 0
+        self.next_seq = 1
+        self.latest = None
+        self._fd = None
+        self._synced_at = time.monotonic()
+        self._dirty = False
+        # موضع آخر قراءة (الملف، الإزاحة، التسلسل التالي) لتجنب المسح من البداية
+        self._cursor = None
+        self._lock = threading.Lock()
+        # عدادات
+        self.evicted = 0
+        self.truncated = 0
+        self._open()
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f"{first_seq:016d}{SEGMENT_SUFFIX}")
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(os.path.join(self.directory, ACK_FILE), "r") as f:
+                self.acked = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            self.acked = 0
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            self.segments.append(_Segment(int(name[:-len(SEGMENT_SUFFIX)]), path,
+                                          os.path.getsize(path)))
+        self.next_seq = self.acked + 1
+        if self.segments:
+            # الملفات المغلقة سليمة؛ التحقق فقط للملف النشط الذي قد ينقطع أثناء الكتابة
+            last = self.segments[-1]
+            valid_end, next_seq = self._scan(last)
+            if valid_end < last.size:
+                self.truncated += 1
+                logging.warning(f"قص سجل غير مكتمل في {last.path} عند {valid_end}")
+                with open(last.path, "r+b") as f:
+                    f.truncate(valid_end)
+                last.size = valid_end
+            if next_seq <= self.acked:
+                # ملف التأكيد ثابت على القرص وذيل الملف لم يصل إليه (fsync على فترات): كل
+                # ما بقي مؤكد، والإلحاق بعد فجوة في نفس الملف يجعل الفتح التالي يقص ما بعدها
+                for segment in self.segments:
+                    self._remove(segment)
+                self.segments = []
+            else:
+                self.next_seq = next_seq
+        self._drop_acked()
+
+    def _scan(self, segment):
+        """(نهاية آخر سجل سليم، التسلسل التالي)"""
+        offset = 0
+        seq = segment.first_seq
+        with open(segment.path, "rb") as f:
+            data = f.read()
+        while offset + _RECORD.size <= len(data):
+            length, crc, record_seq = _RECORD.unpack_from(data, offset)
+            end = offset + _RECORD.size + length
+            if end > len(data) or record_seq != seq:
+                break
+            if zlib.crc32(data[offset + 8:end]) != crc:
+                break
+            offset = end
+            seq += 1
+        return offset, seq
+
+    def _close_active(self):
+        if self._fd is not None:
+            if self._dirty and self.fsync != FSYNC_NEVER:
+                os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._dirty = False
+
+    def _active_fd(self):
+        active = self.segments[-1] if self.segments else None
+        if active is None or active.size >= self.segment_bytes:
+            self._close_active()
+            active = _Segment(self.next_seq, self._segment_path(self.next_seq))
+            self.segments.append(active)
+        if self._fd is None:
+            self._fd = os.open(active.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND
+                               | getattr(os, "O_BINARY", 0), 0o600)
+        return self._fd, active
+
+    def append(self, sample):
+        """إضافة عينة؛ ترجع تسلسلها"""
+        payload = json.dumps(sample, separators=(",", ":")).encode()
+        with self._lock:
+            seq = self.next_seq
+            body = struct.pack("<Q", seq) + payload
+            record = struct.pack("<II", len(payload), zlib.crc32(body)) + body
+            fd, active = self._active_fd()
+            os.write(fd, record)
+            active.size += len(record)
+            self.next_seq += 1
+            self.latest = (seq, sample)
+            self._dirty = True
+            self._maybe_sync()
+            self._evict()
+            return seq
+
+    def _maybe_sync(self):
+        if self.fsync == FSYNC_ALWAYS or (
+                self.fsync == FSYNC_INTERVAL
+                and time.monotonic() - self._synced_at >= self.fsync_interval):
+            os.fsync(self._fd)
+            self._synced_at = time.monotonic()
+            self._dirty = False
+
+    def _evict(self):
+        total = sum(segment.size for segment in self.segments)
+        lost = 0
+        while total > self.max_bytes and len(self.segments) > 1:
+            oldest = self.segments.pop(0)
+            total -= oldest.size
+            lost += max(0, self.segments[0].first_seq - max(oldest.first_seq, self.acked + 1))
+            self._remove(oldest)
+        if lost:
+            self.evicted += lost
+            logging.warning(f"امتلاء الطابور المحلي: حذف {lost} عينة قديمة غير مرسلة")
+
+    def _remove(self, segment):
+        if self._cursor and self._cursor[0] is segment:
+            self._cursor = None
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            logging.error(f"تعذر حذف {segment.path}: {str(e)}")
+
+    def _drop_acked(self):
+        # ملف مغلق كل سجلاته مؤكدة: التسلسل التالي بعده <= آخر مؤكد + 1
+        while len(self.segments) > 1 and self.segments[1].first_seq <= self.acked + 1:
+            self._remove(self.segments.pop(0))
+
+    @property
+    def first_seq(self):
+        """أقدم تسلسل متاح للإرسال"""
+        with self._lock:
+            first = self.segments[0].first_seq if self.segments else self.next_seq
+            return max(first, self.acked + 1)
+
+    def backlog(self):
+        return self.next_seq - self.first_seq
+
+    def read(self, seq, limit):
+        """حتى limit عينة بدءاً من seq: قائمة (التسلسل، العينة)"""
+        # os.write بلا مخزن وسيط، فالقراءة ترى كل ما أُلحق دون انتظار fsync
+        with self._lock:
+            records = []
+            for index, segment in enumerate(self.segments):
+                end_seq = (self.segments[index + 1].first_seq if index + 1 < len(self.segments)
+                           else self.next_seq)
+                if seq >= end_seq:
+                    continue
+                records += self._read_segment(segment, max(seq, segment.first_seq),
+                                              limit - len(records))
+                seq = end_seq
+                if len(records) >= limit:
+                    break
+            return records
+
+    def _read_segment(self, segment, seq, limit):
+        cursor = self._cursor
+        if cursor and cursor[0] is segment and cursor[2] <= seq:
+            offset, current = cursor[1], cursor[2]
+        else:
+            offset, current = 0, segment.first_seq
+        records = []
+        with open(segment.path, "rb") as f:
+            f.seek(offset)
+            while len(records) < limit:
+                header = f.read(_RECORD.size)
+                if len(header) < _RECORD.size:
+                    break
+                length, _, record_seq = _RECORD.unpack(header)
+                if current >= seq:
+                    records.append((record_seq, json.loads(f.read(length))))
+                else:
+                    f.seek(length, os.SEEK_CUR)
+                offset += _RECORD.size + length
+                current = record_seq + 1
+        self._cursor = (segment, offset, current)
+        return records
+
+    def ack(self, seq):
+        """تأكيد كل العينات حتى seq؛ يُحفظ ذرياً ويحذف الملفات المؤكدة بالكامل"""
+        with self._lock:
+            if seq <= self.acked:
+                return
+            self.acked = min(seq, self.next_seq - 1)
+            path = os.path.join(self.directory, ACK_FILE)
+            with open(path + ".tmp", "w") as f:
+                f.write(str(self.acked))
+                if self.fsync != FSYNC_NEVER:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self._drop_acked()
+
+    def close(self):
+        with self._lock:
+            self._close_active()
+
+    def stats(self):
+        with self._lock:
+            return {"segments": len(self.segments),
+                    "bytes": sum(segment.size for segment in self.segments),
+                    "acked": self.acked, "next_seq": self.next_seq,
+                    "evicted": self.evicted, "truncated": self.truncated}
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import base64
+import threading
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+# طبقة التشفير المشتركة بين الخادم والعميل؛ نسخة واحدة في mexe/shared/utils
+# يستوردها البرنامجان كجزء من حزمة utils (انظر main.py)
+
+DEFAULT_KEY = b'uJnmGjIDuQnR_GYZ5uFPGYW5xYAi-JpMO_gwoTqg0EM='
+
+# أنماط التشفير تُختار عند فتح الاتصال عبر WebSocket subprotocol
+MODE_FERNET = "sifer.fernet"
+MODE_AESGCM = "sifer.aesgcm"
+MODE_CHACHA = "sifer.chacha20"
+SUBPROTOCOLS = (MODE_AESGCM, MODE_CHACHA, MODE_FERNET)
+
+_AEAD_CLASSES = {MODE_AESGCM: AESGCM, MODE_CHACHA: ChaCha20Poly1305}
+NONCE_SIZE = 12
+
+class Keyring:
+    """مجموعة مفاتيح مرقمة مع مفتاح نشط؛ تدوير المفتاح لا يتطلب إعادة الاتصال"""
+
+    def __init__(self, keys=None, active=None):
+        self._lock = threading.Lock()
+        self.keys = dict(keys or {0: DEFAULT_KEY})
+        self.active = active if active is not None else max(self.keys)
+        # يزداد مع كل تعديل لتعرف الجلسات متى تعيد بناء ما خزنته
+        self.version = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """بناء الحلقة من settings.json: {"keys": {"1": "..."}, "active_key": 1}"""
+        keys = {int(key_id): key.encode() for key_id, key in config.get("keys", {}).items()}
+        if not keys:
+            return cls()
+        return cls(keys, config.get("active_key"))
+
+    def rotate(self, key_id, key, activate=True):
+        """إضافة مفتاح جديد وتفعيله اختيارياً"""
+        if not 0 <= key_id <= 255:
+            raise ValueError("معرف المفتاح يجب أن يكون بين 0 و 255")
+        with self._lock:
+            self.keys[key_id] = key
+            if activate:
+                self.active = key_id
+            self.version += 1
+
+    def retire(self, key_id):
+        """إزالة مفتاح قديم بعد انتهاء فترة التدوير"""
+        with self._lock:
+            if key_id == self.active:
+                raise ValueError("لا يمكن إزالة المفتاح النشط")
+            self.keys.pop(key_id, None)
+            self.version += 1
+
+    def aead_key(self, key_id):
+        """اشتقاق مفتاح AEAD من مفتاح Fernet حتى لا يُستخدم نفس المفتاح لخوارزميتين"""
+        raw = base64.urlsafe_b64decode(self.keys[key_id])
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                    info=b"sifer-aead-v1").derive(raw)
+
+class CipherSession:
+    """جلسة تشفير لكل اتصال: تُبنى الخوارزمية مرة واحدة ويُعاد استخدامها لكل رسالة"""
+
+    def __init__(self, keyring=None, mode=None):
+        self.keyring = keyring or Keyring()
+        self.mode = mode if mode in SUBPROTOCOLS else MODE_FERNET
+        self.is_aead = self.mode in _AEAD_CLASSES
+        self._version = None
+        self._fernet = None
+        self._aead = {}
+
+    def _refresh(self):
+        # يُستدعى فقط عند تغير الحلقة وليس مع كل رسالة
+        keyring = self.keyring
+        self._version = keyring.version
+        self._aead = {}
+        if not self.is_aead:
+            ordered = [keyring.keys[keyring.active]] + [
+                key for key_id, key in keyring.keys.items() if key_id != keyring.active]
+            self._fernet = MultiFernet([Fernet(key) for key in ordered])
+
+    def _aead_for(self, key_id):
+        cipher = self._aead.get(key_id)
+        if cipher is None:
+            if key_id not in self.keyring.keys:
+                raise ValueError(f"معرف مفتاح غير معروف: {key_id}")
+            cipher = _AEAD_CLASSES[self.mode](self.keyring.aead_key(key_id))
+            self._aead[key_id] = cipher
+        return cipher
+
+    def encrypt_bytes(self, data):
+        if self._version != self.keyring.version:
+            self._refresh()
+        if not self.is_aead:
+            return self._fernet.encrypt(data)
+        # الإطار: [معرف المفتاح 1 بايت][nonce 12 بايت][النص المشفر + الوسم]
+        key_id = self.keyring.active
+        nonce = os.urandom(NONCE_SIZE)
+        return bytes((key_id,)) + nonce + self._aead_for(key_id).encrypt(nonce, data, None)
+
+    def decrypt_bytes(self, token):
+        if self._version != self.keyring.version:
+            self._refresh()
+        if not self.is_aead:
+            return self._fernet.decrypt(token)
+        if isinstance(token, str):
+            token = token.encode()
+        if len(token) < 1 + NONCE_SIZE:
+            raise ValueError("إطار مشفر قصير")
+        nonce = token[1:1 + NONCE_SIZE]
+        return self._aead_for(token[0]).decrypt(nonce, token[1 + NONCE_SIZE:], None)
+
+    def encrypt_data(self, data):
+        return self.encrypt_bytes(data.encode())
+
+    def decrypt_data(self, encrypted_data):
+        return self.decrypt_bytes(encrypted_data).decode()
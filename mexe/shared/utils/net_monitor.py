@@ -0,0 +1,277 @@
+import os
+import time
+import array
+import socket
+import struct
+import select
+import logging
+import threading
+import subprocess
+from collections import namedtuple
+import psutil
+from PyQt5.QtCore import QObject, pyqtSignal
+
+if os.name != "nt":
+    import fcntl
+
+# خدمة حالة الشبكة المشتركة بين الخادم والعميل؛ نسخة واحدة في mexe/shared/utils
+# يستوردها البرنامجان كجزء من حزمة utils (انظر main.py)
+
+UNKNOWN = "غير معروف"
+
+# قيم status كما يعرضها HUDOverlay
+ENCRYPTED = "encrypted"
+CONNECTED = "connected"
+DISCONNECTED = "disconnected"
+
+NetworkState = namedtuple("NetworkState", "interface ip ssid status")
+OFFLINE_STATE = NetworkState(None, None, UNKNOWN, DISCONNECTED)
+
+# netlink: تغيّر الروابط والعناوين
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+# wireless extensions
+SIOCGIWESSID = 0x8B1B
+SIOCGIWENCODE = 0x8B2B
+IW_ENCODE_DISABLED = 0x8000
+IW_ESSID_MAX_SIZE = 32
+
+def _interface_ip(interface):
+    for address in psutil.net_if_addrs().get(interface, ()):
+        if address.family == socket.AF_INET:
+            return address.address
+    return None
+
+class LinuxBackend:
+    """قراءة الحالة من /proc/net/route و /sys/class/net و ioctl بلا أي عملية فرعية"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.spawns = 0
+
+    def _default_interface(self):
+        with open("/proc/net/route", "r") as f:
+            next(f, None)
+            for line in f:
+                fields = line.split()
+                # الوجهة 0.0.0.0 مع RTF_UP
+                if len(fields) > 3 and fields[1] == "00000000" and int(fields[3], 16) & 0x1:
+                    return fields[0]
+        return None
+
+    def _wireless_ioctl(self, interface, request, size):
+        buffer = array.array("B", bytes(size))
+        address, _ = buffer.buffer_info()
+        # struct iwreq: اسم الواجهة ثم iw_point (المؤشر، الطول، الأعلام)
+        result = fcntl.ioctl(self.sock.fileno(), request,
+                             struct.pack("16sPHH", interface.encode()[:15], address, size, 0))
+        _, _, length, flags = struct.unpack("16sPHH", result[:16 + struct.calcsize("PHH")])
+        return buffer.tobytes()[:length], flags
+
+    def _wireless(self, interface):
+        """(SSID، مشفرة؟) أو None إذا لم تكن الواجهة لاسلكية"""
+        if not os.path.exists(f"/sys/class/net/{interface}/wireless"):
+            return None
+        try:
+            essid, _ = self._wireless_ioctl(interface, SIOCGIWESSID, IW_ESSID_MAX_SIZE + 1)
+            ssid = essid.rstrip(b"\0").decode("utf-8", "replace") or UNKNOWN
+        except OSError:
+            return UNKNOWN, False
+        try:
+            _, flags = self._wireless_ioctl(interface, SIOCGIWENCODE, 64)
+            encrypted = not flags & IW_ENCODE_DISABLED
+        except OSError:
+            encrypted = False
+        return ssid, encrypted
+
+    def read(self, previous):
+        interface = self._default_interface()
+        if interface is None:
+            return OFFLINE_STATE
+        try:
+            with open(f"/sys/class/net/{interface}/operstate", "r") as f:
+                operstate = f.read().strip()
+        except OSError:
+            operstate = "unknown"
+        if operstate == "down":
+            return NetworkState(interface, None, UNKNOWN, DISCONNECTED)
+        wireless = self._wireless(interface)
+        if wireless is None:
+            # واجهة سلكية: لا SSID
+            return NetworkState(interface, _interface_ip(interface), interface, CONNECTED)
+        ssid, encrypted = wireless
+        return NetworkState(interface, _interface_ip(interface), ssid,
+                            ENCRYPTED if encrypted else CONNECTED)
+
+    def events(self):
+        """مقبس netlink يصبح قابلاً للقراءة عند تغير الروابط أو العناوين"""
+        try:
+            nl = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            nl.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+            nl.setblocking(False)
+            return nl
+        except OSError as e:
+            logging.warning(f"netlink غير متاح، الاعتماد على الفحص الدوري: {str(e)}")
+            return None
+
+class NetshBackend:
+    """Windows: العنوان من psutil و netsh فقط عند تغير الواجهة أو انتهاء ssid_ttl"""
+
+    def __init__(self, ssid_ttl=60.0):
+        self.ssid_ttl = ssid_ttl
+        self._wifi = (UNKNOWN, False)
+        self._wifi_at = 0.0
+        self.spawns = 0
+
+    def _local_ip(self):
+        # connect على UDP لا يرسل شيئاً؛ يختار النظام الواجهة والعنوان فقط
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.connect(("8.8.8.8", 80))
+            return sock.getsockname()[0]
+        except OSError:
+            return None
+        finally:
+            sock.close()
+
+    def _netsh(self):
+        self.spawns += 1
+        result = subprocess.run(["netsh", "wlan", "show", "interfaces"], capture_output=True,
+                                text=True, encoding="cp1256", errors="replace",
+                                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        ssid, encrypted = UNKNOWN, False
+        if result.returncode == 0:
+            for line in result.stdout.split("\n"):
+                key, _, value = line.partition(":")
+                key, value = key.strip(), value.strip()
+                if key == "SSID" and value:
+                    ssid = value
+                elif key == "Authentication":
+                    encrypted = value.lower() != "open"
+        return ssid, encrypted
+
+    def read(self, previous):
+        ip = self._local_ip()
+        if ip is None:
+            return OFFLINE_STATE
+        interface = next((name for name, addresses in psutil.net_if_addrs().items()
+                          if any(address.address == ip for address in addresses)), None)
+        now = time.monotonic()
+        if (previous.interface, previous.ip) != (interface, ip) or now - self._wifi_at >= self.ssid_ttl:
+            try:
+                self._wifi = self._netsh()
+            except (OSError, subprocess.SubprocessError):
+                self._wifi = (UNKNOWN, False)
+            self._wifi_at = now
+        ssid, encrypted = self._wifi
+        return NetworkState(interface, ip, ssid, ENCRYPTED if encrypted else CONNECTED)
+
+    def events(self):
+        return None
+
+def make_backend():
+    if os.name == "nt":
+        return NetshBackend()
+    return LinuxBackend()
+
+class NetworkMonitor(QObject):
+    """لقطة واحدة لحالة الشبكة يتشاركها كل المستهلكين
+
+    snapshot() ترجع الحالة المخزنة ما دامت أحدث من ttl. خيط المراقبة يحدّثها عند
+    أحداث netlink (Linux) أو كل interval ثانية، والإشارات تُطلق عند التغير فقط
+    وتصل إلى المستقبلين في خيط الواجهة عبر Qt."""
+
+    status_changed = pyqtSignal(str, str)    # (ssid, status)
+    state_changed = pyqtSignal(object)       # NetworkState
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, interval=5.0, ttl=2.0, backend=None):
+        super().__init__()
+        self.interval = interval
+        self.ttl = ttl
+        self.backend = backend or make_backend()
+        self.state = OFFLINE_STATE
+        self._checked = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+        # عدادات
+        self.refreshes = 0
+        self.changes = 0
+
+    @classmethod
+    def shared(cls, **options):
+        """المراقب المشترك في العملية؛ يُنشأ عند أول طلب"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(**options)
+            return cls._shared
+
+    def snapshot(self):
+        """الحالة الحالية؛ تُقرأ من النظام فقط إذا انتهت صلاحية المخزنة"""
+        with self._lock:
+            fresh = self._checked is not None and time.monotonic() - self._checked < self.ttl
+            if fresh:
+                return self.state
+        return self.refresh()
+
+    def refresh(self):
+        with self._lock:
+            previous = self.state
+            try:
+                state = self.backend.read(previous)
+            except Exception as e:
+                error_msg = f"خطأ في قراءة حالة الشبكة: {str(e)}"
+                logging.error(error_msg)
+                print(error_msg)
+                state = previous
+            self._checked = time.monotonic()
+            self.refreshes += 1
+            self.state = state
+        if state != previous:
+            self.changes += 1
+            self.state_changed.emit(state)
+            if (state.ssid, state.status) != (previous.ssid, previous.status):
+                self.status_changed.emit(state.ssid, state.status)
+        return state
+
+    def run(self):
+        events = self.backend.events()
+        try:
+            while not self._stop.is_set():
+                if events is None:
+                    self._stop.wait(self.interval)
+                else:
+                    readable, _, _ = select.select([events], [], [], self.interval)
+                    if readable:
+                        # تفريغ كل الرسائل المتراكمة ثم قراءة واحدة للحالة
+                        try:
+                            while events.recv(65536):
+                                pass
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                        # عدة أحداث تصل معاً عند تبديل الشبكة
+                        self._stop.wait(0.2)
+                if not self._stop.is_set():
+                    self.refresh()
+        finally:
+            if events is not None:
+                events.close()
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        self.refresh()
+        self.thread = threading.Thread(target=self.run, name="net-monitor", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+def get_ssid():
+    return NetworkMonitor.shared().snapshot().ssid
\ No newline at end of file
@@ -0,0 +1,371 @@
+import struct
+
+# صيغة الإطارات الثنائية المشتركة بين الخادم والعميل؛ نسخة واحدة في mexe/shared/utils
+# يستوردها البرنامجان كجزء من حزمة utils (انظر main.py)
+#
+# كل إطار: [VERSION][نوع الإطار][الجسم]
+# الأعداد تُرمز varint (والفروق zigzag varint)، والعناوين تُستبدل بمعرفات
+# داخل جدول خاص بالجلسة؛ أول ظهور لنص يُرسل حرفياً بعد معرفه الجديد.
+# الاتصالات لها خانات (slots): KEY يرسل الجدول كاملاً بالخانات 0..n-1، و DELTA
+# يرسل فقط خانات الاتصالات المغلقة ثم [خانة + نصوص] للاتصالات الجديدة.
+# إطارات JSON تبدأ بـ "{" لذلك يبقى JSON متاحاً كمسار احتياطي.
+
+VERSION = 0xA1
+FRAME_KEY = 0x01    # عينة كاملة
+FRAME_DELTA = 0x02  # فروق عن العينة السابقة
+FRAME_BATCH = 0x03  # عدة عينات مرقمة: [أول تسلسل][العدد][طول+إطار لكل عينة]
+FRAME_ACK = 0x04    # تأكيد تراكمي: استلام كل العينات حتى التسلسل N
+FRAME_POLICY = 0x05 # (من الخادم) حدود فترة أخذ العينات بالمللي ثانية: [الأدنى][الأقصى]
+
+FLAG_RESET = 0x01       # (KEY) تفريغ جدول النصوص قبل القراءة
+FLAG_NETWORK = 0x01     # (DELTA) فروق جدول الاتصالات تتبع الإطار
+
+# ترويسة HTTP للتفاوض على الصيغة عند فتح الاتصال
+WIRE_HEADER = "X-SIFER-Wire"
+# 3: الطابع الزمني بالمللي ثانية (كان بالثواني في 2)
+WIRE_VERSION = "3"
+# معرف الجهاز الثابت؛ يحدد ملف التخزين وسجل الجهاز في الخادم
+DEVICE_HEADER = "X-SIFER-Device"
+# استئناف الجلسة: العميل يرسل رمزه السابق (أو "new") والخادم يرد برمز الجلسة،
+# ومع RESUME_HEADER آخر تسلسل مؤكد إذا استعاد حالة الجلسة السابقة
+SESSION_HEADER = "X-SIFER-Session"
+RESUME_HEADER = "X-SIFER-Resume"
+SESSION_NEW = "new"
+# العميل يعلن قبوله إطارات FRAME_POLICY لضبط فترة أخذ العينات
+SAMPLING_HEADER = "X-SIFER-Sampling"
+SAMPLING_ADAPTIVE = "adaptive"
+
+MAX_INTERNED = 4096
+_HEADER = struct.Struct("BB")
+
+class WireError(ValueError):
+    """إطار ثنائي غير صالح أو خارج تزامن الجلسة"""
+
+def is_binary(payload):
+    return len(payload) > 0 and payload[0] == VERSION
+
+def frame_kind(payload):
+    return payload[1] if len(payload) > 1 and payload[0] == VERSION else None
+
+def _put_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _put_signed(out, value):
+    _put_varint(out, (value << 1) ^ (value >> 63))
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data, pos):
+        self.data = data
+        self.pos = pos
+
+    def varint(self):
+        data = self.data
+        result = shift = 0
+        try:
+            while True:
+                byte = data[self.pos]
+                self.pos += 1
+                result |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    return result
+                shift += 7
+        except IndexError:
+            raise WireError("إطار مقطوع") from None
+
+    def signed(self):
+        value = self.varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def text(self):
+        length = self.varint()
+        end = self.pos + length
+        if end > len(self.data):
+            raise WireError("إطار مقطوع")
+        value = self.data[self.pos:end].decode()
+        self.pos = end
+        return value
+
+def encode_batch(first_seq, frames):
+    """تجميع إطارات KEY/DELTA متتالية في إطار واحد يبدأ بالتسلسل first_seq"""
+    out = bytearray(_HEADER.pack(VERSION, FRAME_BATCH))
+    out.append(0)
+    _put_varint(out, first_seq)
+    _put_varint(out, len(frames))
+    for frame in frames:
+        _put_varint(out, len(frame))
+        out += frame
+    return bytes(out)
+
+def split_batch(payload):
+    """إرجاع (أول تسلسل، قائمة الإطارات الفرعية)"""
+    if frame_kind(payload) != FRAME_BATCH:
+        raise WireError("ليس إطار دفعة")
+    reader = _Reader(payload, 3)
+    first_seq = reader.varint()
+    frames = []
+    for _ in range(reader.varint()):
+        length = reader.varint()
+        end = reader.pos + length
+        if end > len(payload):
+            raise WireError("إطار مقطوع")
+        frames.append(payload[reader.pos:end])
+        reader.pos = end
+    return first_seq, frames
+
+def encode_ack(seq):
+    out = bytearray(_HEADER.pack(VERSION, FRAME_ACK))
+    out.append(0)
+    _put_varint(out, seq)
+    return bytes(out)
+
+def decode_ack(payload):
+    if frame_kind(payload) != FRAME_ACK:
+        raise WireError("ليس إطار تأكيد")
+    return _Reader(payload, 3).varint()
+
+def encode_policy(min_interval, max_interval):
+    """حدود الفترة بالثواني؛ (0, 0) تعني العودة إلى إعدادات العميل"""
+    out = bytearray(_HEADER.pack(VERSION, FRAME_POLICY))
+    out.append(0)
+    _put_varint(out, round(min_interval * 1000))
+    _put_varint(out, round(max_interval * 1000))
+    return bytes(out)
+
+def decode_policy(payload):
+    """(الأدنى، الأقصى) بالثواني"""
+    if frame_kind(payload) != FRAME_POLICY:
+        raise WireError("ليس إطار سياسة")
+    reader = _Reader(payload, 3)
+    return reader.varint() / 1000, reader.varint() / 1000
+
+def _ram_ints(ram):
+    # GB بدقة منزلتين، والنسبة بدقة منزلة واحدة
+    return round(ram["total"] * 100), round(ram["used"] * 100), round(ram["percent"] * 10)
+
+class ConnectionTable:
+    """جدول الاتصالات الحية بمفتاح (laddr, raddr, pid) وخانة صغيرة لكل اتصال
+
+    diff() يقارن قائمة جديدة بالجدول في O(n) عبر القاموس ويرجع الخانات المغلقة
+    والاتصالات الجديدة بخاناتها؛ الخانات المحررة يُعاد استخدامها فتبقى varint قصيرة."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # المفتاح ← (الخانة، السجل المرسل (local, remote, status))
+        self.entries = {}
+        self.free = []
+        self.next_slot = 0
+
+    def _allocate(self):
+        if self.free:
+            return self.free.pop()
+        slot = self.next_slot
+        self.next_slot += 1
+        return slot
+
+    def checkpoint(self, network):
+        """إعادة بناء الجدول كاملاً بالخانات 0..n-1 (لإطار KEY)"""
+        self.reset()
+        records = []
+        for conn in network:
+            key = (conn["local_addr"], conn["remote_addr"], conn.get("pid"))
+            if key in self.entries:
+                continue
+            record = (conn["local_addr"], conn["remote_addr"], conn["status"])
+            self.entries[key] = (self._allocate(), record)
+            records.append(record)
+        return records
+
+    def diff(self, network):
+        """(الخانات المغلقة، [(خانة، سجل)] للاتصالات الجديدة)"""
+        entries = self.entries
+        current = {}
+        for conn in network:
+            current[(conn["local_addr"], conn["remote_addr"], conn.get("pid"))] = conn
+        closed = []
+        for key, (slot, record) in list(entries.items()):
+            conn = current.get(key)
+            # تغير الحالة لنفس المفتاح يُرسل إغلاقاً ثم فتحاً
+            if conn is None or conn["status"] != record[2]:
+                del entries[key]
+                closed.append(slot)
+        self.free.extend(closed)
+        opened = []
+        for key, conn in current.items():
+            if key not in entries:
+                record = (conn["local_addr"], conn["remote_addr"], conn["status"])
+                slot = self._allocate()
+                entries[key] = (slot, record)
+                opened.append((slot, record))
+        return closed, opened
+
+class WireEncoder:
+    """ترميز العينات لجلسة واحدة (جهة العميل)"""
+
+    def __init__(self, keyframe_interval=30):
+        self.keyframe_interval = keyframe_interval
+        self.connections = ConnectionTable()
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        """يُستدعى مع كل اتصال جديد"""
+        self.strings = {}
+        # يزداد مع كل تفريغ لجدول النصوص؛ نقطة استئناف من جيل سابق غير صالحة
+        self.generation += 1
+        self.previous = None
+        self.connections.reset()
+        self.since_key = 0
+        self._reset_pending = True
+
+    def resume(self, interned):
+        """استئناف جلسة: إبقاء أول interned نصاً كما يعرفها الخادم، والإطار التالي KEY بلا تفريغ"""
+        self.strings = {value: ref for value, ref in self.strings.items() if ref < interned}
+        self.previous = None
+        self.connections.reset()
+        self.since_key = 0
+        self._reset_pending = False
+
+    def _put_string(self, out, value):
+        ref = self.strings.get(value)
+        if ref is not None:
+            _put_varint(out, ref)
+            return
+        ref = len(self.strings)
+        self.strings[value] = ref
+        _put_varint(out, ref)
+        raw = value.encode()
+        _put_varint(out, len(raw))
+        out += raw
+
+    def _put_record(self, out, record):
+        local_addr, remote_addr, status = record
+        self._put_string(out, local_addr)
+        self._put_string(out, remote_addr)
+        self._put_string(out, status)
+
+    def encode(self, timestamp, ram, network):
+        """timestamp بالثواني (epoch، مع الكسور)، ram و network بنفس شكل حمولة JSON (مع pid اختياري)"""
+        # بالمللي ثانية: العينات المتقاربة (أخذ العينات التكيفي) لا تتساوى طوابعها
+        values = (round(timestamp * 1000),) + _ram_ints(ram)
+        if len(self.strings) + 3 * len(network) > MAX_INTERNED:
+            self.strings = {}
+            self.generation += 1
+            self._reset_pending = True
+
+        out = bytearray()
+        if self.previous is None or self._reset_pending or self.since_key >= self.keyframe_interval:
+            # نقطة تحقق: الجدول كاملاً
+            out += _HEADER.pack(VERSION, FRAME_KEY)
+            out.append(FLAG_RESET if self._reset_pending else 0)
+            for value in values:
+                _put_varint(out, value)
+            records = self.connections.checkpoint(network)
+            _put_varint(out, len(records))
+            for record in records:
+                self._put_record(out, record)
+            self.since_key = 0
+            self._reset_pending = False
+        else:
+            closed, opened = self.connections.diff(network)
+            changed = bool(closed or opened)
+            out += _HEADER.pack(VERSION, FRAME_DELTA)
+            out.append(FLAG_NETWORK if changed else 0)
+            for value, prev in zip(values, self.previous):
+                _put_signed(out, value - prev)
+            if changed:
+                _put_varint(out, len(closed))
+                for slot in closed:
+                    _put_varint(out, slot)
+                _put_varint(out, len(opened))
+                for slot, record in opened:
+                    _put_varint(out, slot)
+                    self._put_record(out, record)
+            self.since_key += 1
+
+        self.previous = values
+        return bytes(out)
+
+class WireDecoder:
+    """فك ترميز العينات لجلسة واحدة (جهة الخادم)"""
+
+    def __init__(self, conn_factory=tuple):
+        # conn_factory يبني سجل الاتصال مرة واحدة؛ القائمة غير المتغيرة يُعاد استخدامها كما هي
+        self.conn_factory = conn_factory
+        self.strings = []
+        self.previous = None
+        self.previous_network = None
+        # الخانة ← سجل الاتصال؛ جدول الاتصالات الحية للجهاز
+        self.live = {}
+
+    def resume(self, strings):
+        """استئناف جلسة بجدول النصوص المتفق عليه؛ الفروق مرفوضة حتى أول KEY"""
+        self.strings = strings
+        self.previous = None
+        self.previous_network = None
+        self.live = {}
+
+    def _get_string(self, reader):
+        ref = reader.varint()
+        if ref < len(self.strings):
+            return self.strings[ref]
+        if ref != len(self.strings):
+            raise WireError(f"معرف نص خارج التسلسل: {ref}")
+        value = reader.text()
+        self.strings.append(value)
+        return value
+
+    def _get_record(self, reader):
+        get = self._get_string
+        return self.conn_factory((get(reader), get(reader), get(reader)))
+
+    def _apply_diff(self, reader):
+        live = self.live
+        for _ in range(reader.varint()):
+            if live.pop(reader.varint(), None) is None:
+                raise WireError("إغلاق اتصال غير موجود في الجدول")
+        for _ in range(reader.varint()):
+            slot = reader.varint()
+            if slot in live:
+                raise WireError(f"خانة اتصال مستخدمة: {slot}")
+            live[slot] = self._get_record(reader)
+        return list(live.values())
+
+    def decode(self, payload):
+        """إرجاع (ts_ms, ram_total, ram_used, ram_percent, network)"""
+        if len(payload) < 3 or payload[0] != VERSION:
+            raise WireError("إصدار إطار غير مدعوم")
+        kind = payload[1]
+        flags = payload[2]
+        reader = _Reader(payload, 3)
+        try:
+            if kind == FRAME_KEY:
+                if flags & FLAG_RESET:
+                    self.strings = []
+                values = (reader.varint(), reader.varint(), reader.varint(), reader.varint())
+                self.live = {slot: self._get_record(reader) for slot in range(reader.varint())}
+                network = list(self.live.values())
+            elif kind == FRAME_DELTA:
+                if self.previous is None:
+                    raise WireError("إطار فروق قبل أي إطار كامل")
+                timestamp, total, used, percent = self.previous
+                values = (timestamp + reader.signed(), total + reader.signed(),
+                          used + reader.signed(), percent + reader.signed())
+                # بلا تغيير تُعاد نفس القائمة؛ المستهلكون يكتشفون التغير بالهوية
+                network = self._apply_diff(reader) if flags & FLAG_NETWORK else self.previous_network
+            else:
+                raise WireError(f"نوع إطار غير معروف: {kind}")
+        except WireError:
+            # فقدان التزامن: نرفض الفروق حتى يصل إطار كامل
+            self.previous = None
+            raise
+        self.previous = values
+        self.previous_network = network
+        timestamp, total, used, percent = values
+        return (timestamp, total / 100, used / 100, percent / 10, network)